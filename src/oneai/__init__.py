@@ -3,11 +3,31 @@ __package__ = "oneai"
 
 import logging
 import oneai.logger
+from typing import Optional
 from typing_extensions import Final
 import oneai.skills as skills
 from oneai.classes import *
 from oneai.pipeline import Pipeline
+from oneai.client import Client
+from oneai.concurrency import ConcurrencyLimiter
+from oneai.retry import RetryPolicy
+from oneai.rate_limit import RateLimiter
+from oneai.cache import ResponseCache
+from oneai.journal import Journal
+from oneai.dead_letter import DeadLetter, DeadLetterStore
+from oneai.process_scheduler import TaskPoller
+from oneai.hedging import HedgePolicy
+from oneai.key_pool import KeyPool
+from oneai.circuit_breaker import CircuitBreaker
+from oneai.scheduling import (
+    Scheduler,
+    FIFOScheduler,
+    PriorityScheduler,
+    DeadlineScheduler,
+    ShortestFirstScheduler,
+)
 import oneai.clustering as clustering
+import oneai.runtime as runtime
 import oneai.parsing as parsing
 import oneai.util as util
 import oneai.exceptions as exceptions
@@ -30,7 +50,26 @@ Whether to allow multilingual inputs by default. You can use different values fo
 MAX_CONCURRENT_REQUESTS: Final[int] = 2
 """
 Max number of allowed concurrent requests to be made by the SDK.
-Currently only enforced on `pipeline.run_batch`, other calls may be limited by the API
+Currently only enforced on `pipeline.run_batch`, other calls may be limited by the API.
+Used as the default for the `concurrency` parameter of `pipeline.run_batch`, pass a `ConcurrencyLimiter` to adapt it dynamically.
+"""
+ASYNC_FILE_THRESHOLD: Optional[int] = None
+"""
+Set to route each input to the async file endpoint (uploaded and polled) or inline (sent base64-encoded) by its content type and size, e.g. `10 * 2**20`.
+Binary files (e.g. audio files opened with `"rb"`) are always uploaded. Text files of at least this many bytes, and texts of at least this many characters, are uploaded too, smaller ones are sent inline.
+If `None` (default), `Pipeline.run_async` uploads all files, `Pipeline.run` sends them inline, and `Pipeline.run_batch` uploads them only with `async_files`.
+"""
+rate_limiter: RateLimiter = None
+"""
+Rate limit applied to all API requests made by the SDK. See `RateLimiter`.
+"""
+cache: ResponseCache = None
+"""
+Cache of pipeline API responses, used to skip requests for duplicate inputs. See `ResponseCache`.
+"""
+circuit_breaker: CircuitBreaker = None
+"""
+Circuit breaker applied to all pipeline requests made by the SDK, failing requests without sending them during API outages. See `CircuitBreaker`.
 """
 DEBUG_RAW_RESPONSES = False
 """
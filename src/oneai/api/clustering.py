@@ -5,6 +5,7 @@ import urllib.parse
 from typing import Union, Callable, Any
 from typing_extensions import Literal
 import oneai, oneai.api
+from oneai.rate_limit import throttle_sync
 
 
 API_DATE_FORMAT = "%Y-%m-%d"
@@ -77,6 +78,7 @@ def get_clustering(path: str, api_key: str = None):
     api_key = api_key or oneai.api_key
     if not api_key:
         raise Exception("API key is required")
+    throttle_sync(api_key)
     headers = {
         "api-key": api_key,
         "Content-Type": "application/json",
@@ -96,6 +98,12 @@ def post_clustering(path: str, data: dict, api_key: str = None):
     api_key = api_key or oneai.api_key
     if not api_key:
         raise Exception("API key is required")
+    throttle_sync(
+        api_key,
+        sum(len(item.get("text") or "") for item in data)
+        if isinstance(data, list)
+        else 0,
+    )
     headers = {
         "api-key": api_key,
         "Content-Type": "application/json",
@@ -2,7 +2,7 @@ from dataclasses import replace
 from typing import List
 
 import oneai
-from oneai.classes import Label, Labels, Output, Skill, Utterance, TextContent
+from oneai.classes import Input, Label, Labels, Output, Skill, Utterance, TextContent
 
 
 def build_output(
@@ -71,3 +71,37 @@ def build_output(
             skills=list(skills),
             data=[Labels()] * generator + [build_internal(0, next_skills)],
         )
+
+
+def generated_input(raw_output: dict) -> Input:
+    # the text generated by the last step of a pipeline, as an input for the following steps
+    contents = raw_output["output"][-1]["contents"]
+    if len(contents) > 1 or (contents and "speaker" in contents[0]):
+        return Input(
+            [Utterance.from_dict(u) for u in contents],
+            type="conversation",
+            content_type="application/json",
+        )
+    return Input(
+        contents[0]["utterance"] if contents else "",
+        type="article",
+        content_type="text/plain",
+    )
+
+
+def join_outputs(prefix: dict, suffix: dict, offset: int) -> dict:
+    # join the raw outputs of a pipeline prefix ending with a generator, and of the following steps run on the generated text
+    stages = list(prefix["output"])
+    for stage in suffix["output"]:
+        if "text_generated_by_step_id" in stage:
+            stages.append(
+                {
+                    **stage,
+                    "text_generated_by_step_id": stage["text_generated_by_step_id"]
+                    + offset,
+                }
+            )
+        else:  # labels of the generated text, i.e. the last stage of the prefix
+            labels = stages[-1]["labels"] + stage["labels"]
+            stages[-1] = {**stages[-1], "labels": labels}
+    return {**prefix, "output": stages}
@@ -1,18 +1,29 @@
+from base64 import b64encode
+import contextlib
+import copy
 from datetime import timedelta
+import hashlib
+import io
 import json
 import urllib.parse
-from typing import Awaitable, List
+from typing import AsyncIterator, Awaitable, Iterator, List, Optional
 
 import aiohttp
 import oneai, oneai.api
-from oneai.api.output import build_output
+from oneai.api.output import build_output, generated_input, join_outputs
 from oneai.classes import Input, Output, Skill
 from oneai.exceptions import handle_unsuccessful_response, validate_api_key
+from oneai.rate_limit import text_length, throttle
 
 endpoint_default = "api/v0/pipeline"
 endpoint_async_file = "api/v0/pipeline/async/file"
 endpoint_async_tasks = "api/v0/pipeline/async/tasks"
 
+# bytes of a file encoded per chunk of a streamed request, a multiple of 3 so chunks encode without padding
+STREAM_CHUNK_SIZE = 3 * 2**20
+# stands in for the text of file inputs in the request JSON, replaced by the encoded file when streamed
+STREAM_PLACEHOLDER = "\x00oneai-file\x00"
+
 
 def build_request(
     input: Input, steps: List[Skill], multilingual: bool, include_text: bool
@@ -37,7 +48,7 @@ def build_request(
         "multilingual": multilingual,
     }
     if include_text:
-        request["text"] = input.text
+        request["text"] = STREAM_PLACEHOLDER if is_stream(input) else input.text
     if isinstance(input, Input):
         if input.type:
             request["input_type"] = input.type
@@ -48,33 +59,204 @@ def build_request(
     return json.dumps(request, default=json_default)
 
 
+def is_stream(input: Input) -> bool:
+    # binary files wrapped for the sync endpoint, sent base64-encoded in a streamed request
+    return (
+        isinstance(input, Input)
+        and isinstance(input.text, io.IOBase)
+        and input.encoding == "base64"
+    )
+
+
+def iter_request(request: str, file: io.IOBase) -> Iterator[bytes]:
+    """
+    Yields the body of a request built for a file input in chunks, base64-encoding the file as it's read,
+    so that memory use doesn't depend on the file size. Seekable files are read from the start.
+    """
+    prefix, suffix = request.split(json.dumps(STREAM_PLACEHOLDER), 1)
+    yield (prefix + '"').encode()
+    if file.seekable():
+        file.seek(0)
+    rest = b""
+    while True:
+        data = file.read(STREAM_CHUNK_SIZE)
+        if not data:
+            break
+        data = rest + data
+        cut = len(data) - len(data) % 3  # reads may be short, keep the remainder
+        rest = data[cut:]
+        if cut:
+            yield b64encode(data[:cut])
+    if rest:
+        yield b64encode(rest)
+    yield ('"' + suffix).encode()
+
+
+async def stream_request(request: str, file: io.IOBase) -> AsyncIterator[bytes]:
+    for chunk in iter_request(request, file):
+        yield chunk
+
+
+def file_size(file: io.IOBase) -> Optional[int]:
+    # size of a binary file, None if it's not seekable (e.g. pipes)
+    if not file.seekable():
+        return None
+    position = file.tell()
+    size = file.seek(0, io.SEEK_END)
+    file.seek(position)
+    return size
+
+
+def request_length(request: str, file: io.IOBase) -> Optional[int]:
+    # length of the streamed body, None if the file size is unknown
+    size = file_size(file)
+    if size is None:
+        return None
+    placeholder = len(json.dumps(STREAM_PLACEHOLDER))
+    return len(request.encode()) - placeholder + 2 + (size + 2) // 3 * 4
+
+
+def request_digest(request: str, input: Input = None) -> Optional[str]:
+    # sha256 of a request body, reading streamed files in chunks.
+    # None for files that can't be read again to be sent (e.g. pipes), which are not cached, coalesced or journaled
+    if input is None or not is_stream(input):
+        return hashlib.sha256(request.encode()).hexdigest()
+    if not input.text.seekable():
+        return None
+    digest = hashlib.sha256()
+    for chunk in iter_request(request, input.text):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def request_options(timeout: aiohttp.ClientTimeout = None) -> dict:
+    # per-request options, the session's defaults apply to those not set
+    return {"timeout": timeout} if timeout is not None else {}
+
+
+def request_fingerprint(
+    input: Input, steps: List[Skill], multilingual: bool
+) -> Optional[str]:
+    # stable hash of the request sent for an input, None if the input can't be serialized (e.g. files for the async endpoint)
+    # or read again (e.g. pipes)
+    try:
+        request = build_request(input, steps, multilingual, True)
+    except (TypeError, AttributeError, ValueError):
+        return None
+    return request_digest(request, input)
+
+
 async def post_pipeline(
     session: aiohttp.ClientSession,
     input: Input,
     steps: List[Skill],
     api_key: str,
     multilingual: bool,
+    idempotency_key: str = None,
+    raw_output: bool = False,
+    timeout: aiohttp.ClientTimeout = None,
 ) -> Awaitable[Output]:
     validate_api_key(api_key)
+    # with prefix caching, split the pipeline after its first generator, so the generated text is cached separately
+    generator = next((i for i, skill in enumerate(steps) if skill.text_attr), None)
+    if (
+        oneai.cache is not None
+        and oneai.cache.prefixes
+        and generator is not None
+        and generator < len(steps) - 1
+    ):
+        prefix = await _post(
+            session,
+            input,
+            steps[: generator + 1],
+            api_key,
+            multilingual,
+            idempotency_key and f"{idempotency_key}-prefix",
+            timeout,
+        )
+        suffix = await _post(
+            session,
+            generated_input(prefix),
+            steps[generator + 1 :],
+            api_key,
+            multilingual,
+            idempotency_key and f"{idempotency_key}-suffix",
+            timeout,
+        )
+        raw = join_outputs(prefix, suffix, generator + 1)
+    else:
+        raw = await _post(
+            session, input, steps, api_key, multilingual, idempotency_key, timeout
+        )
+    return raw if raw_output else build_output(steps, raw)
+
 
+async def _post(
+    session: aiohttp.ClientSession,
+    input: Input,
+    steps: List[Skill],
+    api_key: str,
+    multilingual: bool,
+    idempotency_key: str = None,
+    timeout: aiohttp.ClientTimeout = None,
+) -> Awaitable[dict]:
+    # send a pipeline request, or get its raw output from the cache
     request = build_request(input, steps, multilingual, True)
+    cache_key = None
+    if oneai.cache is not None:
+        cache_key = request_digest(request, input)
+    if cache_key is not None:
+        cached = await oneai.cache.get_async(cache_key)
+        if cached is not None:
+            return cached
+
+    breaker = oneai.circuit_breaker
+    with breaker.request() if breaker is not None else contextlib.nullcontext():
+        return await _send(
+            session, input, request, api_key, cache_key, idempotency_key, timeout
+        )
+
+
+async def _send(
+    session: aiohttp.ClientSession,
+    input: Input,
+    request: str,
+    api_key: str,
+    cache_key: Optional[str],
+    idempotency_key: str = None,
+    timeout: aiohttp.ClientTimeout = None,
+) -> Awaitable[dict]:
+    await throttle(api_key, text_length(input.text))
     url = f"{oneai.URL}/{endpoint_default}"
     headers = {
         "api-key": api_key,
         "Content-Type": "application/json",
         "User-Agent": f"python-sdk/{oneai.__version__}/{oneai.api.uuid}",
     }
+    if idempotency_key:
+        headers["Idempotency-Key"] = idempotency_key
 
     if oneai.DEBUG_LOG_REQUESTS:
         oneai.logger.debug(f"POST {url}\n")
         oneai.logger.debug(f"headers={json.dumps(headers, indent=4)}\n")
         oneai.logger.debug(f"data={json.dumps(json.loads(request), indent=4)}\n")
 
-    async with session.post(url, headers=headers, data=request) as response:
+    data = request
+    if is_stream(input):
+        data = stream_request(request, input.text)
+        length = request_length(request, input.text)
+        if length is not None:
+            headers["Content-Length"] = str(length)
+
+    async with session.post(
+        url, headers=headers, data=data, **request_options(timeout)
+    ) as response:
         if response.status != 200:
             await handle_unsuccessful_response(response)
-        else:
-            return build_output(steps, await response.json())
+        raw = await response.json()
+        if cache_key is not None:
+            await oneai.cache.put_async(cache_key, raw)
+        return raw
 
 
 async def post_pipeline_async_file(
@@ -83,9 +265,14 @@ async def post_pipeline_async_file(
     steps: List[Skill],
     api_key: str,
     multilingual: bool,
+    timeout: aiohttp.ClientTimeout = None,
 ) -> Awaitable[str]:
     validate_api_key(api_key)
+    await throttle(api_key, text_length(input.text))
 
+    if is_stream(input):  # wrapped for the sync endpoint, but uploaded as raw bytes
+        input = copy.copy(input)
+        input.encoding = None
     request = build_request(input, steps, multilingual, False)
     url = f"{oneai.URL}/{endpoint_async_file}?pipeline=" + urllib.parse.quote(request)
     headers = {
@@ -99,11 +286,18 @@ async def post_pipeline_async_file(
         oneai.logger.debug(f"headers={json.dumps(headers, indent=4)}\n")
         oneai.logger.debug(f"data={json.dumps(json.loads(request), indent=4)}\n")
 
-    async with session.post(url, headers=headers, data=input.text) as response:
-        if response.status != 200:
-            await handle_unsuccessful_response(response)
-        else:
-            return await response.json()
+    # read from the start, also if the file was sent before
+    if isinstance(input.text, io.IOBase) and input.text.seekable():
+        input.text.seek(0)
+    breaker = oneai.circuit_breaker
+    with breaker.request() if breaker is not None else contextlib.nullcontext():
+        async with session.post(
+            url, headers=headers, data=input.text, **request_options(timeout)
+        ) as response:
+            if response.status != 200:
+                await handle_unsuccessful_response(response)
+            else:
+                return await response.json()
 
 
 async def get_task_status(
@@ -112,6 +306,7 @@ async def get_task_status(
     api_key: str,
 ):
     validate_api_key(api_key)
+    await throttle(api_key)
 
     url = f"{oneai.URL}/{endpoint_async_tasks}/{task_id}"
     headers = {
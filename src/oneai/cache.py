@@ -0,0 +1,268 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# memory entry: encoded raw output, expiration time
+Entry = Tuple[bytes, float]
+
+# max number of disk hits whose access time is kept in memory before it's written
+ACCESS_FLUSH_SIZE = 256
+
+
+class ResponseCache:
+    """
+    A cache of pipeline API responses, keyed by a hash of the request body (steps, params, multilingual flag and input text), so duplicate inputs aren't sent to the API again.
+    Set `oneai.cache` to apply it to all pipeline requests.
+
+    Responses are kept in an in-memory LRU, and optionally in a persistent sqlite database (in WAL mode) that can be shared by multiple processes.
+    Raw response JSON is stored, and the `Output` objects are rebuilt on every hit.
+    The access times of disk hits, used to evict the least recently used responses, are written in batches along with new responses.
+    Pipeline requests use `get_async` and `put_async`, which run disk reads and writes in the default executor, off the event loop.
+
+    ## Attributes
+
+    `max_entries: int`
+        Max number of responses kept in memory. The least recently used responses are evicted first.
+    `path: str, optional`
+        Path of the sqlite database for the persistent tier. If not provided, responses are only cached in memory.
+    `ttl: float, optional`
+        Seconds after which cached responses expire. `None` to never expire.
+    `max_bytes: int, optional`
+        Max total size of the responses in the persistent tier. The least recently used responses are evicted first.
+    `prefixes: bool`
+        Whether to also cache the text produced by generator Skills. When enabled, pipelines are split after their first generator (e.g. `Transcribe`), and the rest of the steps are sent with the cached generated text.
+        Pipelines sharing the same prefix, like `[Transcribe(), Summarize()]` and `[Transcribe(), Topics()]`, then pay for the generator once per input. Uncached inputs take two requests.
+
+    ## Properties
+
+    `hits: int`
+        Number of requests served from the cache.
+    `misses: int`
+        Number of requests not found in the cache.
+    `evictions: int`
+        Number of responses evicted from either tier, due to size limits or expiration.
+
+    ## Example
+
+    >>> oneai.cache = oneai.ResponseCache(max_entries=10_000, path="responses.db", ttl=7 * 24 * 3600)
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        path: str = None,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        prefixes: bool = False,
+    ):
+        self.max_entries = max_entries
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.prefixes = prefixes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._memory: "OrderedDict[str, Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection = None
+        self._pid = os.getpid()
+        self._disk_bytes = 0
+        # access times of disk hits, not yet written
+        self._accessed: Dict[str, float] = {}
+        if path:
+            self._open()
+
+    @staticmethod
+    def key(request: str) -> str:
+        """The cache key of a request body, as produced by `build_request`."""
+        return hashlib.sha256(request.encode()).hexdigest()
+
+    def _open(self):
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value BLOB, size INTEGER, expires REAL, accessed REAL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+        )
+        self._db.commit()
+        self._disk_bytes = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    def get(self, key: str) -> Optional[dict]:
+        """Returns the raw response cached for `key`, or `None`."""
+        now = time.time()
+        with self._lock:
+            value = self._get_memory(key, now)
+            if value is None and self._connected():
+                value = self._get_disk(key, now)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(value)
+
+    async def get_async(self, key: str) -> Optional[dict]:
+        """Like `get`, reading the persistent tier in the default executor, so the event loop isn't blocked."""
+        if self._db is not None:
+            with self._lock:
+                value = self._get_memory(key, time.time())
+                if value is not None:
+                    self.hits += 1
+            if value is None:
+                return await asyncio.get_running_loop().run_in_executor(
+                    None, self.get, key
+                )
+            return json.loads(value)
+        return self.get(key)
+
+    async def put_async(self, key: str, raw_output: dict):
+        """Like `put`, writing the persistent tier in the default executor, so the event loop isn't blocked."""
+        if self._db is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.put, key, raw_output
+            )
+        else:
+            self.put(key, raw_output)
+
+    def put(self, key: str, raw_output: dict):
+        """Caches the raw response of a request."""
+        value = json.dumps(raw_output, separators=(",", ":")).encode()
+        expires = time.time() + self.ttl if self.ttl else float("inf")
+        with self._lock:
+            self._put_memory(key, value, expires)
+            if self._connected():
+                self._put_disk(key, value, expires)
+
+    def _connected(self) -> bool:
+        # sqlite connections can't be used across fork, e.g. in batch worker processes
+        if self._db is not None and self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._accessed.clear()
+            self._open()
+        return self._db is not None
+
+    def _get_memory(self, key: str, now: float) -> Optional[bytes]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= now:
+            del self._memory[key]
+            self.evictions += 1
+            return None
+        self._memory.move_to_end(key)
+        return entry[0]
+
+    def _put_memory(self, key: str, value: bytes, expires: float):
+        self._memory[key] = (value, expires)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _get_disk(self, key: str, now: float) -> Optional[bytes]:
+        row = self._db.execute(
+            "SELECT value, expires FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires = row
+        if expires is not None and expires <= now:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db.commit()
+            self._disk_bytes -= len(value)
+            self.evictions += 1
+            return None
+        # written with the next response, or when enough hits are pending
+        self._accessed[key] = now
+        if len(self._accessed) >= ACCESS_FLUSH_SIZE:
+            self._flush_accessed()
+            self._db.commit()
+        # promote to memory, so repeated hits don't go to disk
+        self._put_memory(
+            key, value, expires if expires is not None else float("inf")
+        )
+        return value
+
+    def _flush_accessed(self):
+        # write the pending access times, committed by the caller
+        if self._accessed:
+            self._db.executemany(
+                "UPDATE responses SET accessed = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._accessed.items()],
+            )
+            self._accessed.clear()
+
+    def _put_disk(self, key: str, value: bytes, expires: float):
+        self._accessed.pop(key, None)
+        self._flush_accessed()
+        # a replaced response no longer counts towards the size limit
+        replaced = self._db.execute(
+            "SELECT size FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+            (
+                key,
+                value,
+                len(value),
+                None if expires == float("inf") else expires,
+                time.time(),
+            ),
+        )
+        self._db.commit()
+        self._disk_bytes += len(value) - (replaced[0] if replaced else 0)
+        if self.max_bytes is not None and self._disk_bytes > self.max_bytes:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        # the database may be shared by other processes, so recount before evicting
+        expired = self._db.execute(
+            "DELETE FROM responses WHERE expires <= ?", (time.time(),)
+        )
+        self.evictions += expired.rowcount
+        self._disk_bytes = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        rows = self._db.execute("SELECT key, size FROM responses ORDER BY accessed")
+        evicted = []
+        for key, size in rows:
+            if self._disk_bytes <= self.max_bytes:
+                break
+            evicted.append((key,))
+            self._disk_bytes -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self._db.commit()
+        self.evictions += len(evicted)
+
+    def clear(self):
+        """Removes all cached responses."""
+        with self._lock:
+            self._memory.clear()
+            self._accessed.clear()
+            if self._connected():
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+                self._disk_bytes = 0
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._flush_accessed()
+                self._db.commit()
+                self._db.close()
+                self._db = None
+
+    def __repr__(self) -> str:
+        return f"oneai.ResponseCache(hits={self.hits}, misses={self.misses}, evictions={self.evictions}, path={self.path})"
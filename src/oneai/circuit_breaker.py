@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Iterator, Optional
+
+import aiohttp
+
+from oneai.exceptions import CircuitOpenError, RateLimitError, ServerError
+
+logger = logging.getLogger("oneai")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def is_failure(error: Exception) -> bool:
+    # errors signaling an outage of the API. throttling and invalid inputs or keys don't count
+    if isinstance(error, RateLimitError):
+        return False
+    return isinstance(
+        error, (ServerError, aiohttp.ClientConnectionError, asyncio.TimeoutError)
+    )
+
+
+class CircuitBreaker:
+    """
+    A circuit breaker around the pipeline endpoint. Set `oneai.circuit_breaker` to apply it to all pipeline requests made by the SDK.
+
+    While closed, the breaker tracks the outcome of recent requests. When the share of failures (server errors, connection errors and timeouts) reaches `failure_rate`, it opens,
+    and requests fail immediately with `CircuitOpenError` without being sent. After `cooldown` seconds it is half-open: up to `probes` requests are sent,
+    and the breaker closes once they all succeed, or opens again if one of them fails.
+
+    ## Attributes
+
+    `failure_rate: float`
+        Share of failed requests in the window that opens the breaker.
+    `window: int`
+        Number of recent requests tracked.
+    `min_requests: int`
+        Min number of tracked requests before the breaker can open.
+    `cooldown: float`
+        Seconds to wait while open before sending probe requests.
+    `probes: int`
+        Number of successful probe requests required to close the breaker.
+    `on_state_change: Callable[[str], None], optional`
+        Hook called with the new state (`"closed"`, `"open"` or `"half_open"`) whenever it changes.
+
+    ## Properties
+
+    `state: str`
+        The current state of the breaker.
+    `opened: int`
+        Number of times the breaker opened.
+    `rejected: int`
+        Number of requests failed without being sent.
+
+    ## Example
+
+    >>> oneai.circuit_breaker = oneai.CircuitBreaker(failure_rate=0.5, cooldown=30)
+    >>> pipeline.run_batch(inputs, dead_letter="failed.jsonl")
+    """
+
+    def __init__(
+        self,
+        failure_rate: float = 0.5,
+        window: int = 20,
+        min_requests: int = 10,
+        cooldown: float = 30.0,
+        probes: int = 1,
+        on_state_change: Optional[Callable[[str], None]] = None,
+    ):
+        if not 0 < failure_rate <= 1:
+            raise ValueError("failure_rate must be between 0 and 1")
+        self.failure_rate = failure_rate
+        self.window = window
+        self.min_requests = min_requests
+        self.cooldown = cooldown
+        self.probes = probes
+        self.on_state_change = on_state_change
+        self.opened = 0
+        self.rejected = 0
+        self._state = CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window)  # True for failures
+        self._opened_at = 0.0
+        self._probing = 0  # probes in flight
+        self._probe_successes = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            return HALF_OPEN
+        return self._state
+
+    @contextmanager
+    def request(self) -> Iterator[None]:
+        """
+        Counts the outcome of a request sent in the context. Raises `CircuitOpenError` if the request can't be sent.
+        """
+        probe = self._enter()
+        try:
+            yield
+        except asyncio.CancelledError:
+            self._exit(probe, None, sent=False)
+            raise
+        except BaseException as e:
+            self._exit(probe, e if isinstance(e, Exception) else None)
+            raise
+        self._exit(probe, None)
+
+    def _enter(self) -> bool:
+        # returns whether the request is a probe
+        state = self.state
+        if state != self._state:
+            self._set_state(state)
+        if state == CLOSED:
+            return False
+        if state == HALF_OPEN and self._probing < self.probes:
+            self._probing += 1
+            return True
+        self.rejected += 1
+        raise CircuitOpenError(
+            message="Circuit breaker is open, the request was not sent",
+            retry_after=max(self._opened_at + self.cooldown - time.monotonic(), 0.0),
+        )
+
+    def _exit(self, probe: bool, error: Optional[Exception], sent: bool = True):
+        failed = error is not None and is_failure(error)
+        if probe:
+            self._probing -= 1
+            if not sent:
+                return
+            if failed:
+                self._open()
+            else:
+                self._probe_successes += 1
+                if self._probe_successes >= self.probes:
+                    self._outcomes.clear()
+                    self._set_state(CLOSED)
+            return
+        if not sent or self._state != CLOSED:
+            return  # sent before the breaker opened
+        self._outcomes.append(failed)
+        if (
+            len(self._outcomes) >= self.min_requests
+            and sum(self._outcomes) >= self.failure_rate * len(self._outcomes)
+        ):
+            self._open()
+
+    def _open(self):
+        self.opened += 1
+        self._opened_at = time.monotonic()
+        self._set_state(OPEN)
+        logger.warning(f"Circuit breaker opened, retrying in {self.cooldown}s")
+
+    def _set_state(self, state: str):
+        if state == HALF_OPEN:
+            self._probing = self._probe_successes = 0
+        previous, self._state = self._state, state
+        if state != previous and self.on_state_change:
+            self.on_state_change(state)
+
+    def __repr__(self) -> str:
+        return f"oneai.CircuitBreaker(state={self.state}, failure_rate={self.failure_rate}, opened={self.opened}, rejected={self.rejected})"
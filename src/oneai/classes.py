@@ -2,7 +2,6 @@ from datetime import datetime, timedelta
 from dateutil import parser as dateutil
 import io
 import os
-from base64 import b64encode
 import validators
 from dataclasses import dataclass, field
 from typing import (
@@ -27,6 +26,7 @@ from warnings import warn
 from oneai.exceptions import InputError
 
 if TYPE_CHECKING:
+    from oneai.process_scheduler import BatchStats
     from oneai.skills import OutputAttrs
 
 
@@ -164,7 +164,11 @@ def skillclass(
                     setattr(self, k, v)
 
         def __getattr__(self, name):
-            return self.params[name]
+            # look up params without recursing into __getattr__, e.g. when unpickling
+            params = self.__dict__.get("params")
+            if params is None or name not in params:
+                raise AttributeError(name)
+            return params[name]
 
         def __setattr__(self, name, value):
             if "params" not in self.__dict__:
@@ -186,7 +190,7 @@ class Input(Generic[TextContent]):
     ## Attributes
 
     `text: TextContent`
-        Input text. Either `str` or `list[Utterance]` (conversation).
+        Input text. Either `str`, `list[Utterance]` (conversation), or a binary file, which is encoded while it is sent.
     `type: str`
         A type hint for the API, suggesting which models to use when processing the input.
     `content_type: str`
@@ -247,9 +251,9 @@ class Input(Generic[TextContent]):
             if "b" not in mode:
                 return cls(text.read(), type=input_type, content_type=content_type)
             elif sync:
-                data = b64encode(text.read()).decode("ascii")
+                # encoded while the request is streamed, see `oneai.api.pipeline.iter_request`
                 return cls(
-                    data, type=input_type, content_type=content_type, encoding="base64"
+                    text, type=input_type, content_type=content_type, encoding="base64"
                 )
             else:
                 return cls(text, type=input_type, content_type=content_type)
@@ -458,6 +462,8 @@ class Output(Input[TextContent], OutputAttrs if TYPE_CHECKING else object):
 class BatchResponse:
     def __init__(self):
         self._data: Dict[Input, Output] = {}
+        self.unprocessed: List[Input] = []  # inputs not processed before the batch deadline
+        self.stats: "BatchStats" = None  # counters and timings of the batch
 
     def __setitem__(self, key: Input, value: Output):
         self._data[key] = value
@@ -0,0 +1,128 @@
+from typing import Optional
+
+import aiohttp
+
+from oneai.single_flight import SingleFlight
+
+
+class Client:
+    """
+    A long-lived HTTP client, owning a pooled connection to the API. Pass it to `Pipeline.run_async` and `Pipeline.run_batch_async` to reuse connections across calls, instead of opening a new session (and TCP+TLS handshake) for every call.
+
+    ## Attributes
+
+    `limit: int`
+        Max number of open connections in the pool.
+    `limit_per_host: int`
+        Max number of open connections per host, 0 for no limit.
+    `keepalive_timeout: float`
+        Seconds to keep idle connections open for reuse.
+    `ttl_dns_cache: int`
+        Seconds to cache DNS lookups, `None` to cache forever.
+    `timeout: aiohttp.ClientTimeout`
+        Default timeout for requests made through the client.
+    `single_flight: SingleFlight`
+        Coalesces identical pipeline requests in flight through the client, `None` if disabled with `coalesce=False`.
+
+    ## Properties
+
+    `connections_created: int`
+        Number of new connections opened by the client.
+    `connections_reused: int`
+        Number of requests that were sent over an already open connection.
+    `requests: int`
+        Total number of requests sent through the client.
+    `requests_saved: int`
+        Number of pipeline requests that were not sent, since an identical request was already in flight.
+
+    ## Example
+
+    >>> async with oneai.Client(limit=20) as client:
+    ...     outputs = await pipeline.run_batch_async(inputs, client=client)
+    ...     output = await pipeline.run_async(my_text, client=client)
+    >>> client.connections_reused
+    42
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 0,
+        keepalive_timeout: float = 30.0,
+        ttl_dns_cache: Optional[int] = 300,
+        timeout: aiohttp.ClientTimeout = None,
+        coalesce: bool = True,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        self.timeout = timeout or aiohttp.ClientTimeout(total=6000)
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.requests = 0
+        self.single_flight = SingleFlight() if coalesce else None
+        self._session: aiohttp.ClientSession = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            raise RuntimeError(
+                "oneai.Client is not open, use `async with oneai.Client() as client`"
+            )
+        return self._session
+
+    @property
+    def requests_saved(self) -> int:
+        return self.single_flight.saved if self.single_flight else 0
+
+    @property
+    def closed(self) -> bool:
+        return self._session is None or self._session.closed
+
+    async def open(self) -> "Client":
+        if not self.closed:
+            return self
+
+        async def on_create(session, context, params):
+            self.connections_created += 1
+
+        async def on_reuse(session, context, params):
+            self.connections_reused += 1
+
+        async def on_request(session, context, params):
+            self.requests += 1
+
+        trace = aiohttp.TraceConfig()
+        trace.on_connection_create_end.append(on_create)
+        trace.on_connection_reuseconn.append(on_reuse)
+        trace.on_request_start.append(on_request)
+
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.ttl_dns_cache,
+            use_dns_cache=self.ttl_dns_cache != 0,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector, timeout=self.timeout, trace_configs=[trace]
+        )
+        return self
+
+    async def close(self):
+        if not self.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self) -> "Client":
+        return await self.open()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def __repr__(self) -> str:
+        return (
+            f"oneai.Client(limit={self.limit}, requests={self.requests}, "
+            f"connections_created={self.connections_created}, connections_reused={self.connections_reused})"
+        )
@@ -0,0 +1,169 @@
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Deque, Optional
+
+from oneai.exceptions import RateLimitError, ServerError
+
+
+def is_overload(error: Exception) -> bool:
+    # errors signaling that the API is overloaded or throttling our requests
+    return isinstance(error, RateLimitError) or (
+        isinstance(error, ServerError) and str(error.status_code)[:3] == "503"
+    )
+
+
+class ConcurrencyLimiter:
+    """
+    An adaptive limit on the number of concurrent requests made by `Pipeline.run_batch`.
+
+    The limit grows additively while request latency stays flat, and shrinks multiplicatively (AIMD) when the API responds with 429/503 errors or latency inflates beyond `tolerance` times the baseline latency.
+    When the API provides a `Retry-After` header, new requests are paused for the given time.
+
+    ## Attributes
+
+    `min_limit: int`
+        The lowest allowed number of concurrent requests.
+    `max_limit: int`
+        The highest allowed number of concurrent requests.
+    `backoff: float`
+        Factor to multiply the limit by on overload.
+    `tolerance: float`
+        Ratio of smoothed latency to baseline latency considered as latency inflation.
+    `on_limit_change: Callable[[int], None], optional`
+        Hook called with the new limit whenever it changes.
+
+    ## Properties
+
+    `limit: int`
+        The current number of allowed concurrent requests.
+    `in_flight: int`
+        The number of requests currently in flight.
+
+    ## Example
+
+    >>> limiter = oneai.ConcurrencyLimiter(min_limit=2, max_limit=32, on_limit_change=print)
+    >>> pipeline.run_batch(inputs, concurrency=limiter)
+    """
+
+    def __init__(
+        self,
+        min_limit: int = 1,
+        max_limit: int = 16,
+        initial_limit: int = None,
+        backoff: float = 0.7,
+        tolerance: float = 2.0,
+        smoothing: float = 0.2,
+        on_limit_change: Optional[Callable[[int], None]] = None,
+    ):
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError("expected 1 <= min_limit <= max_limit")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.on_limit_change = on_limit_change
+        self.in_flight = 0
+        self._limit = float(
+            min(max(initial_limit or min_limit, min_limit), max_limit)
+        )
+        self._latency: float = None  # smoothed latency
+        self._baseline: float = None  # latency under no load
+        self._last_decrease = 0.0
+        self._paused_until = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @classmethod
+    def fixed(cls, limit: int) -> "ConcurrencyLimiter":
+        """Creates a limiter with a constant limit."""
+        return cls(min_limit=limit, max_limit=limit)
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    async def acquire(self) -> float:
+        """
+        Waits for a free request slot. Returns the start time, to be passed to `release`.
+        """
+        while True:
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            elif self.in_flight < self.limit:
+                self.in_flight += 1
+                return time.monotonic()
+            else:
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.append(waiter)
+                try:
+                    await waiter
+                except asyncio.CancelledError:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+                    else:  # pass on the wake-up we received
+                        self._wake()
+                    raise
+
+    def release(self, start: float, error: Exception = None):
+        """
+        Frees a request slot, adjusting the limit based on the request's latency and error.
+        """
+        self.in_flight -= 1
+        now = time.monotonic()
+        if error is not None:
+            self.report(error)
+        else:
+            self._observe(now - start, now)
+        self._wake()
+
+    def report(self, error: Exception):
+        """
+        Adjusts the limit based on an error, without releasing a slot (e.g. for failed attempts that are retried).
+        """
+        if is_overload(error):
+            now = time.monotonic()
+            if getattr(error, "retry_after", None):
+                self._paused_until = max(self._paused_until, now + error.retry_after)
+            self._decrease(now)
+
+    def _observe(self, latency: float, now: float):
+        if self._latency is None:
+            self._latency = self._baseline = latency
+        else:
+            self._latency += self.smoothing * (latency - self._latency)
+            # baseline follows drops immediately and rises slowly
+            if latency < self._baseline:
+                self._baseline = latency
+            else:
+                self._baseline += 0.01 * (latency - self._baseline)
+
+        if self._latency > self.tolerance * self._baseline:
+            self._decrease(now)
+        else:
+            self._set_limit(self._limit + 1 / max(self._limit, 1))
+
+    def _decrease(self, now: float):
+        # decrease at most once per round-trip, so a burst of errors counts once
+        if now - self._last_decrease < (self._latency or 0):
+            return
+        self._last_decrease = now
+        self._set_limit(self._limit * self.backoff)
+
+    def _set_limit(self, limit: float):
+        previous = self.limit
+        self._limit = min(max(limit, self.min_limit), self.max_limit)
+        if self.limit != previous and self.on_limit_change:
+            self.on_limit_change(self.limit)
+
+    def _wake(self):
+        free = self.limit - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def __repr__(self) -> str:
+        return f"oneai.ConcurrencyLimiter(limit={self.limit}, min_limit={self.min_limit}, max_limit={self.max_limit})"
@@ -0,0 +1,233 @@
+import inspect
+import io
+import json
+import logging
+import os
+from base64 import b64encode
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Iterator, Tuple, Union
+
+from oneai.classes import Input, Utterance, timestamp_to_timedelta
+
+logger = logging.getLogger("oneai")
+
+
+@dataclass
+class DeadLetter:
+    """
+    A batch input that failed, as recorded in a `DeadLetterStore`.
+
+    ## Attributes
+
+    `input: Input`
+        The failed input.
+    `error: str`
+        The type name of the raised exception.
+    `status_code: int`
+        The API status code of the error, 0 for non-API errors.
+    `message: str`
+        The error message.
+    `request_id: str`
+        The ID of the failed request, if provided by the API.
+    `attempts: int`
+        Number of attempts made for the input.
+    `time: datetime`
+        When the input failed.
+    """
+
+    input: Input
+    error: str
+    status_code: int = 0
+    message: str = ""
+    request_id: str = ""
+    attempts: int = 1
+    time: datetime = field(default_factory=datetime.now)
+
+    @classmethod
+    def from_error(cls, input: Input, error: Exception) -> "DeadLetter":
+        return cls(
+            input,
+            type(error).__name__,
+            getattr(error, "status_code", 0),
+            getattr(error, "message", "") or str(error),
+            getattr(error, "request_id", ""),
+            len(getattr(error, "attempts", [])) or 1,
+        )
+
+    def asdict(self) -> dict:
+        text, encoding = self.input.text, self.input.encoding
+        if isinstance(text, io.IOBase):
+            text, encoding = _record_file(text, encoding)
+        elif isinstance(text, list):
+            text = [
+                {
+                    "speaker": u.speaker,
+                    "utterance": u.utterance,
+                    "timestamp": str(u.timestamp) if u.timestamp else None,
+                }
+                for u in text
+            ]
+        return {
+            "input": {
+                "text": text,
+                "type": self.input.type,
+                "content_type": self.input.content_type,
+                "encoding": encoding,
+                "metadata": self.input.metadata,
+                "datetime": self.input.datetime.isoformat()
+                if self.input.datetime
+                else None,
+                "text_index": self.input.text_index,
+            },
+            "error": self.error,
+            "status_code": self.status_code,
+            "message": self.message,
+            "request_id": self.request_id,
+            "attempts": self.attempts,
+            "time": self.time.isoformat(),
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "DeadLetter":
+        input = dict(d["input"])
+        text = input.pop("text")
+        if isinstance(text, dict):
+            text = open(text["file"], text["mode"])
+        elif isinstance(text, list):
+            text = [
+                Utterance(
+                    u["speaker"],
+                    u["utterance"],
+                    timestamp_to_timedelta(u.get("timestamp")),
+                )
+                for u in text
+            ]
+        if input.get("datetime"):
+            input["datetime"] = datetime.fromisoformat(input["datetime"])
+        return cls(
+            Input(text, **input),
+            d["error"],
+            d["status_code"],
+            d["message"],
+            d["request_id"],
+            d["attempts"],
+            datetime.fromisoformat(d["time"]),
+        )
+
+
+def _record_file(file: io.IOBase, encoding: str) -> Tuple[Union[dict, str], str]:
+    # files with a path are recorded by path and reopened by `from_dict`, other seekable files by their encoded content
+    name = getattr(file, "name", None)
+    if isinstance(name, str) and hasattr(file, "mode"):
+        return {"file": name, "mode": file.mode}, encoding
+    if not file.seekable():
+        raise ValueError("the file has no path and can't be read again")
+    file.seek(0)
+    data = file.read()
+    return b64encode(data.encode() if isinstance(data, str) else data).decode(
+        "ascii"
+    ), "base64"
+
+
+class DeadLetterStore:
+    """
+    A JSON lines file recording the inputs that failed in `Pipeline.run_batch`, with their error type, status code, request ID and number of attempts.
+    Failed inputs can be re-run with `Pipeline.redrive`, without rescanning the whole batch source.
+
+    ## Attributes
+
+    `path: str`
+        Path of the dead-letter file. Created if missing, new records are appended.
+
+    ## Example
+
+    >>> pipeline.run_batch(inputs, dead_letter="failed.jsonl")
+    >>> pipeline.redrive("failed.jsonl", concurrency=2)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0  # records added by this store
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, input: Input, error: Exception):
+        """Appends a failed input. Inputs that can't be recorded, e.g. pipes, are skipped with a warning."""
+        try:
+            record = DeadLetter.from_error(input, error).asdict()
+        except ValueError as e:
+            logger.warning(f"Failed input not recorded in {self.path}: {e}")
+            return
+        line = json.dumps(record, default=str)
+        self._file.write(line + "\n")
+        self._file.flush()
+        self.count += 1
+
+    def __iter__(self) -> Iterator[DeadLetter]:
+        self._file.flush()
+        return read_dead_letters(self.path)
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def __enter__(self) -> "DeadLetterStore":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"oneai.DeadLetterStore(path={self.path})"
+
+
+def read_dead_letters(path: str) -> Iterator[DeadLetter]:
+    """
+    Reads the records of a dead-letter file, skipping a partial last record left by a crash.
+    File inputs are reopened as their records are read, records of files that can't be opened anymore are skipped with a warning.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if not line.endswith("\n"):
+                continue
+            try:
+                letter = DeadLetter.from_dict(json.loads(line))
+            except OSError as e:
+                logger.warning(f"Dead letter skipped, its file can't be opened: {e}")
+                continue
+            yield letter
+
+
+def closing_files(callback: Callable) -> Callable:
+    """
+    Wraps a batch callback to close the reopened file of a dead letter once its result is delivered.
+    """
+
+    def close(input: Input):
+        if isinstance(input.text, io.IOBase):
+            input.text.close()
+
+    if inspect.iscoroutinefunction(callback):
+
+        async def wrapper(input: Input, result):
+            try:
+                await callback(input, result)
+            finally:
+                close(input)
+
+    else:
+
+        def wrapper(input: Input, result):
+            try:
+                return callback(input, result)
+            finally:
+                close(input)
+
+    return wrapper
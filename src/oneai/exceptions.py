@@ -1,5 +1,7 @@
 import json
-from typing import Dict, Union
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Union
 from aiohttp import ClientResponse
 
 # todo: input type validation errors
@@ -17,6 +19,12 @@ class OneAIError(Exception):
         A human-readable message describing the error.
     `details: str`
         A string containing details about the error.
+    `request_id: str`
+        The ID of the failed request.
+    `retry_after: float, optional`
+        Seconds to wait before sending more requests, if provided by the API.
+    `attempts: list[Exception]`
+        The errors of all failed attempts of the request, including this one, when sent with a `RetryPolicy`.
     """
 
     def __init__(
@@ -25,11 +33,14 @@ class OneAIError(Exception):
         message: str = "",
         details: str = "",
         request_id: str = "",
+        retry_after: Optional[float] = None,
     ):
         self.status_code = status_code
         self.message = message
         self.details = details
         self.request_id = request_id
+        self.retry_after = retry_after
+        self.attempts: List[Exception] = []
 
     def __str__(self) -> str:
         return (
@@ -55,20 +66,47 @@ class ServerError(OneAIError):
     """An error raised when the an internal server error occured."""
 
 
+class RateLimitError(ServerError):
+    """An error raised when requests are throttled by the API."""
+
+
+class CircuitOpenError(OneAIError):
+    """An error raised without sending a request, while `oneai.circuit_breaker` is open after too many failures."""
+
+
 errors = {  # map http status codes to OneAIError subclasses
     400: InputError,
     401: APIKeyError,
     403: APIKeyError,
+    429: RateLimitError,
     500: ServerError,
     503: ServerError,
 }
 
 
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # Retry-After is either a number of seconds or an HTTP date
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max((date - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
 async def handle_unsuccessful_response(response: Union[ClientResponse, Dict]):
-    status, reason = 0, ""
+    status, reason, retry_after = 0, "", None
     if isinstance(response, ClientResponse):
         try:
             status, reason = response.status, response.reason
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
             response = json.loads(await response.content.read())
         except:
             response = {}
@@ -79,6 +117,7 @@ async def handle_unsuccessful_response(response: Union[ClientResponse, Dict]):
         response.get("message", reason),
         response.get("details", ""),
         response.get("request_id", ""),
+        retry_after,
     )
 
 
@@ -0,0 +1,117 @@
+import asyncio
+import math
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class HedgePolicy:
+    """
+    Hedged requests for latency-sensitive `Pipeline.run` calls. When a request hasn't completed within the `percentile` latency of recent requests,
+    a duplicate request is sent, the first successful response is used, and the other request is cancelled.
+    The `budget` caps hedged requests to a fraction of all requests, trading a little quota for a shorter latency tail.
+
+    Latencies are tracked per policy, so give each pipeline its own policy. File inputs are never hedged.
+
+    ## Attributes
+
+    `percentile: float`
+        Percentile (0-100) of recent latencies after which a request is hedged.
+    `budget: float`
+        Max ratio of hedged requests to requests, e.g. `0.05` for at most 5% extra requests.
+    `min_delay: float`
+        Min seconds to wait before hedging a request.
+    `window: int`
+        Number of recent latencies tracked.
+    `min_samples: int`
+        Number of latencies to observe before hedging.
+
+    ## Properties
+
+    `requests: int`
+        Number of requests sent through the policy, not counting hedges.
+    `hedged: int`
+        Number of duplicate requests sent.
+    `wins: int`
+        Number of hedged requests whose duplicate responded first.
+
+    ## Example
+
+    >>> pipeline = oneai.Pipeline(steps, hedge=oneai.HedgePolicy(percentile=95, budget=0.05))
+    >>> output = await pipeline.run_async(text)
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95,
+        budget: float = 0.05,
+        min_delay: float = 0.05,
+        window: int = 1000,
+        min_samples: int = 20,
+    ):
+        if not 0 < percentile < 100:
+            raise ValueError("percentile must be between 0 and 100")
+        self.percentile = percentile
+        self.budget = budget
+        self.min_delay = min_delay
+        self.window = window
+        self.min_samples = min_samples
+        self.requests = 0
+        self.hedged = 0
+        self.wins = 0
+        self._latencies: Deque[float] = deque(maxlen=window)
+
+    def delay(self) -> Optional[float]:
+        """Seconds after which a request is hedged, `None` while there are too few samples."""
+        if len(self._latencies) < max(self.min_samples, 1):
+            return None
+        latencies = sorted(self._latencies)
+        index = math.ceil(len(latencies) * self.percentile / 100) - 1
+        return max(latencies[index], self.min_delay)
+
+    def record(self, latency: float):
+        self._latencies.append(latency)
+
+    async def run(self, call: Callable[[bool], Awaitable[T]]) -> T:
+        """
+        Runs `call(False)`, and `call(True)` as a hedge if it's slow. Returns the first successful result.
+        Raises the error of the first request if both fail.
+        """
+        loop = asyncio.get_running_loop()
+        self.requests += 1
+        delay = self.delay()
+        start = loop.time()
+        primary = asyncio.ensure_future(call(False))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait([primary], timeout=delay)
+            if done or self.hedged + 1 > self.budget * self.requests:
+                result = await primary
+                self.record(loop.time() - start)
+                return result
+
+            self.hedged += 1
+            hedge_start = loop.time()
+            hedge = asyncio.ensure_future(call(True))
+            tasks.append(hedge)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in tasks:  # the primary first, if both completed
+                    if task in done and task.exception() is None:
+                        self.record(
+                            loop.time() - (start if task is primary else hedge_start)
+                        )
+                        self.wins += task is hedge
+                        return task.result()
+            return primary.result()  # both failed
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def __repr__(self) -> str:
+        return f"oneai.HedgePolicy(percentile={self.percentile}, budget={self.budget}, requests={self.requests}, hedged={self.hedged}, wins={self.wins})"
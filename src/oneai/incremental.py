@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import re
+import zlib
+from typing import List, Tuple, Union
+
+import aiohttp
+
+import oneai
+from oneai.api.output import build_output
+from oneai.api.pipeline import build_request
+from oneai.cache import ResponseCache
+from oneai.classes import Input, Output, Skill
+from oneai.client import Client
+from oneai.key_pool import KeyPool
+from oneai.process_scheduler import _run_internal, client_session
+from oneai.retry import RetryPolicy
+
+logger = logging.getLogger("oneai")
+
+# sentence ends (punctuation followed by whitespace) and line breaks, candidate chunk boundaries
+SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s+|\n\s*")
+# on average, one in BOUNDARY_RATIO candidate boundaries past the min chunk size is cut
+BOUNDARY_RATIO = 4
+
+_default_cache = ResponseCache(max_entries=10_000)
+
+
+def chunk_text(text: str, chunk_size: int = 2000) -> List[Tuple[int, str]]:
+    """
+    Splits a text into content-defined chunks, returning `(offset, chunk)` pairs.
+    Chunks are cut at sentence boundaries chosen by a hash of the preceding sentence, so an edit only changes the chunks around it, and the following chunks keep their boundaries.
+    Chunks are at least `chunk_size / 2` characters (except the last one), and cut at the first boundary after `2 * chunk_size` characters.
+    """
+    chunks = []
+    start = sentence_start = 0
+    for match in SENTENCE_END.finditer(text):
+        end = match.end()
+        sentence = text[sentence_start:end]
+        sentence_start = end
+        size = end - start
+        if size >= chunk_size // 2 and (
+            zlib.crc32(sentence.encode()) % BOUNDARY_RATIO == 0
+            or size >= 2 * chunk_size
+        ):
+            chunks.append((start, text[start:end]))
+            start = end
+    if start < len(text):
+        chunks.append((start, text[start:]))
+    return chunks
+
+
+def shift_labels(raw_output: dict, offset: int) -> List[dict]:
+    # labels of a chunk, with spans moved to the chunk's position in the whole document
+    labels = raw_output["output"][0]["labels"] if raw_output["output"] else []
+    for label in labels:
+        for key in ("output_spans", "input_spans"):
+            for span in label.get(key) or []:
+                if span.get("start") is not None:
+                    span["start"] += offset
+                if span.get("end") is not None:
+                    span["end"] += offset
+        if label.get("span"):
+            label["span"] = [i + offset for i in label["span"]]
+    return labels
+
+
+def merge_labels(chunks: List[List[dict]]) -> List[dict]:
+    # span labels are kept per occurrence, document-level labels (without spans) are deduplicated
+    merged, seen = [], set()
+    for labels in chunks:
+        for label in labels:
+            if not label.get("output_spans"):
+                key = (label.get("skill"), label.get("name"), str(label.get("value")))
+                if key in seen:
+                    continue
+                seen.add(key)
+            merged.append(label)
+    return merged
+
+
+async def process_incremental(
+    text: str,
+    steps: List[Skill],
+    api_key: Union[str, KeyPool],
+    multilingual: bool = False,
+    client: Client = None,
+    retry: RetryPolicy = None,
+    cache: ResponseCache = None,
+    chunk_size: int = 2000,
+    concurrency: int = None,
+    timeout: aiohttp.ClientTimeout = None,
+) -> Output:
+    if any(skill.text_attr for skill in steps):
+        raise ValueError("incremental mode only supports analyzer Skills")
+    if isinstance(text, Input):
+        text = text.text
+    if not isinstance(text, str):
+        raise ValueError("incremental mode only supports str inputs")
+
+    cache = cache or _default_cache
+    chunks = chunk_text(text, chunk_size)
+    semaphore = asyncio.Semaphore(concurrency or oneai.MAX_CONCURRENT_REQUESTS)
+    sent = 0
+
+    async def process_chunk(session, chunk: str) -> dict:
+        nonlocal sent
+        input = Input(chunk, type="article", content_type="text/plain")
+        key = cache.key(build_request(input, steps, multilingual, True))
+        raw = await cache.get_async(key)
+        if raw is None:
+            async with semaphore:
+                raw = await _run_internal(
+                    session,
+                    input,
+                    steps,
+                    api_key,
+                    multilingual,
+                    retry,
+                    raw_output=True,
+                    timeout=timeout,
+                )
+            sent += 1
+            await cache.put_async(key, raw)
+        return raw
+
+    async with client_session(client) as session:
+        raws = await asyncio.gather(
+            *[process_chunk(session, chunk) for _, chunk in chunks]
+        )
+    logger.debug(f"Incremental run: sent {sent} of {len(chunks)} chunks")
+
+    labels = merge_labels(
+        [shift_labels(raw, offset) for (offset, _), raw in zip(chunks, raws)]
+    )
+    contents = [{"utterance": text}]
+    return build_output(
+        steps, {"input": contents, "output": [{"contents": contents, "labels": labels}]}
+    )
@@ -0,0 +1,123 @@
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+from oneai.api.pipeline import request_fingerprint
+from oneai.classes import Input, Skill
+
+KEY_PREFIX = b'{"key":'
+decoder = json.JSONDecoder()
+
+
+class Journal:
+    """
+    An append-only checkpoint file for long-running `Pipeline.run_batch` jobs.
+    Each successful request is recorded with its raw API response, keyed by a hash of the request (input text, type and steps) or by a user key function.
+    When a batch is run again with the same journal, inputs already recorded are not sent to the API; their outputs are replayed to `on_output` instead.
+
+    Records are appended as JSON lines and fsync'ed in batches, every `sync_interval` seconds and when the batch ends, so a crash loses at most the last interval of records, which are then requested again.
+    Only offsets are kept in memory, replayed outputs are read from the file.
+
+    ## Attributes
+
+    `path: str`
+        Path of the journal file. Created if missing.
+    `key: Callable[[Input], str], optional`
+        Function computing a stable key for an input, e.g. a row ID. Defaults to a hash of the request.
+    `sync_interval: float`
+        Max seconds between fsyncs of new records.
+
+    ## Example
+
+    >>> with oneai.Journal("batch.journal") as journal:
+    ...     pipeline.run_batch(inputs, on_output=save, journal=journal)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        key: Callable[[Input], str] = None,
+        sync_interval: float = 1.0,
+    ):
+        self.path = path
+        self.key = key
+        self.sync_interval = sync_interval
+        self._offsets: Dict[str, int] = {}
+        self._size = 0  # logical end of the file, including buffered records
+        self._flushed = 0  # end of the data written to the OS
+        self._last_sync = time.monotonic()
+        self._load()
+        self._file = open(path, "ab")
+
+    def _load(self):
+        # index existing records, dropping a partial last record left by a crash
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as file:
+            offset = 0
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                if line.startswith(KEY_PREFIX):
+                    key, _ = decoder.raw_decode(line.decode(), len(KEY_PREFIX))
+                    self._offsets[key] = offset
+                offset += len(line)
+            file.truncate(offset)
+        self._size = self._flushed = offset
+
+    def key_for(
+        self, input: Input, steps: List[Skill], multilingual: bool
+    ) -> Optional[str]:
+        if self.key:
+            return str(self.key(input))
+        return request_fingerprint(input, steps, multilingual)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def get(self, key: str) -> dict:
+        """Returns the raw API response recorded for `key`."""
+        offset = self._offsets[key]
+        if offset >= self._flushed:
+            self._file.flush()
+            self._flushed = self._size
+        with open(self.path, "rb") as file:
+            file.seek(offset)
+            return json.loads(file.readline())["output"]
+
+    def record(self, key: str, raw_output: dict):
+        """Appends a completed request. Synced to disk within `sync_interval` seconds."""
+        line = (
+            json.dumps({"key": key, "output": raw_output}, separators=(",", ":"))
+            + "\n"
+        ).encode()
+        self._file.write(line)
+        self._offsets[key] = self._size
+        self._size += len(line)
+        if time.monotonic() - self._last_sync >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        """Flushes and fsyncs all recorded requests."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._flushed = self._size
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"oneai.Journal(path={self.path}, records={len(self)})"
@@ -0,0 +1,240 @@
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    TypeVar,
+    Union,
+)
+
+from oneai.exceptions import APIKeyError
+from oneai.rate_limit import RateLimiter
+
+logger = logging.getLogger("oneai")
+
+T = TypeVar("T")
+
+STRATEGIES = ("round_robin", "least_loaded")
+
+
+@dataclass
+class KeyUsage:
+    """
+    Usage counters of an API key in a `KeyPool`.
+
+    ## Attributes
+
+    `requests: int`
+        Number of requests sent with the key.
+    `successful: int`
+        Number of successful requests.
+    `failed: int`
+        Number of failed requests.
+    `chars: int`
+        Number of input characters sent with the key.
+    `in_flight: int`
+        Number of requests currently in flight.
+    `evicted: Exception, optional`
+        The error the key was taken out of rotation for, if any.
+    """
+
+    requests: int = 0
+    successful: int = 0
+    failed: int = 0
+    chars: int = 0
+    in_flight: int = 0
+    evicted: Optional[Exception] = None
+
+
+class KeyPool:
+    """
+    A pool of API keys with separate quotas, to be passed as the `api_key` of a `Pipeline` or of its `run` and `run_batch` calls.
+    Requests are spread across the keys, each with its own concurrency and rate limits.
+    A key whose request fails with an `APIKeyError` (invalid key or missing quota) is taken out of rotation, and the request is sent again with another key.
+
+    ## Attributes
+
+    `keys: list[str]`
+        The API keys of the pool.
+    `strategy: str`
+        `"round_robin"` to rotate between the keys, or `"least_loaded"` to pick the key with the fewest requests in flight relative to its limit.
+    `max_concurrent: int | dict[str, int], optional`
+        Max concurrent requests per key, or a dict mapping keys to their limit. Unlimited by default, the batch `concurrency` still applies to the total.
+    `rate_limiter: RateLimiter, optional`
+        Rate limit applied to each key separately, on top of `oneai.rate_limiter`.
+
+    ## Properties
+
+    `usage: dict[str, KeyUsage]`
+        Usage counters of each key.
+    `active: list[str]`
+        The keys still in rotation.
+
+    ## Example
+
+    >>> pool = oneai.KeyPool(["key-1", "key-2"], strategy="least_loaded", max_concurrent=8)
+    >>> pipeline.run_batch(inputs, api_key=pool)
+    >>> pool.usage["key-1"].requests
+    """
+
+    def __init__(
+        self,
+        keys: Iterable[str],
+        strategy: str = "round_robin",
+        max_concurrent: Union[int, Dict[str, int]] = None,
+        rate_limiter: RateLimiter = None,
+    ):
+        self.keys: List[str] = list(dict.fromkeys(keys))
+        if not self.keys:
+            raise ValueError("KeyPool requires at least one key")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"strategy must be one of {STRATEGIES}")
+        self.strategy = strategy
+        self.max_concurrent = max_concurrent
+        self.rate_limiter = rate_limiter
+        self.usage: Dict[str, KeyUsage] = {key: KeyUsage() for key in self.keys}
+        self._next = 0  # rotation offset
+        self._last_error: Exception = None
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def active(self) -> List[str]:
+        return [key for key in self.keys if self.usage[key].evicted is None]
+
+    def limit(self, key: str) -> Optional[int]:
+        """Max concurrent requests of a key, `None` if unlimited."""
+        if isinstance(self.max_concurrent, dict):
+            return self.max_concurrent.get(key)
+        return self.max_concurrent
+
+    def _choose(self) -> Optional[str]:
+        # the next key with a free slot, in rotation order
+        count = len(self.keys)
+        candidates = []
+        for i in range(count):
+            key = self.keys[(self._next + i) % count]
+            usage, limit = self.usage[key], self.limit(key)
+            if usage.evicted is None and (limit is None or usage.in_flight < limit):
+                candidates.append(key)
+        if not candidates:
+            return None
+        key = candidates[0]
+        if self.strategy == "least_loaded":
+            key = min(
+                candidates,
+                key=lambda key: self.usage[key].in_flight / (self.limit(key) or 1),
+            )
+        self._next = (self.keys.index(key) + 1) % count
+        return key
+
+    async def acquire(self, chars: int = 0) -> str:
+        """
+        Waits for a key with a free slot and returns it, to be passed to `release`.
+        Raises the error of the last evicted key if no key is left in rotation.
+        """
+        while True:
+            if not self.active:
+                raise self._last_error
+            key = self._choose()
+            if key is not None:
+                break
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                else:  # pass on the wake-up we received
+                    self._wake()
+                raise
+
+        usage = self.usage[key]
+        usage.in_flight += 1
+        usage.requests += 1
+        usage.chars += chars
+        if self.rate_limiter is not None:
+            try:
+                await self.rate_limiter.acquire(key, chars)
+            except BaseException:
+                self.release(key, asyncio.CancelledError())
+                raise
+        return key
+
+    def release(self, key: str, error: BaseException = None):
+        """
+        Frees a slot of a key, counting the request's result. A key that failed with an `APIKeyError` is evicted.
+        """
+        usage = self.usage[key]
+        usage.in_flight -= 1
+        if isinstance(error, asyncio.CancelledError):
+            usage.requests -= 1  # not sent
+        elif error is None:
+            usage.successful += 1
+        else:
+            usage.failed += 1
+            if isinstance(error, APIKeyError):
+                self.evict(key, error)
+        self._wake()
+
+    def evict(self, key: str, error: Exception):
+        """Takes a key out of rotation."""
+        if self.usage[key].evicted is not None:
+            return
+        self.usage[key].evicted = error
+        self._last_error = error
+        logger.warning(
+            f"API key ...{key[-4:]} taken out of rotation ({len(self.active)} left): {error!r}"
+        )
+        if not self.active:  # wake everyone up to fail
+            self._wake(all=True)
+
+    @asynccontextmanager
+    async def key(self, chars: int = 0) -> AsyncIterator[str]:
+        """
+        Holds a key of the pool for a request that can't be sent again, e.g. a file upload.
+        """
+        key = await self.acquire(chars)
+        try:
+            yield key
+        except BaseException as e:
+            self.release(key, e)
+            raise
+        self.release(key)
+
+    async def run(self, call: Callable[[str], Awaitable[T]], chars: int = 0) -> T:
+        """
+        Runs `call(key)` with a key of the pool, and again with another key if the key is evicted.
+        """
+        while True:
+            key = await self.acquire(chars)
+            try:
+                result = await call(key)
+            except APIKeyError as e:
+                self.release(key, e)
+                continue  # acquire raises once all keys are evicted
+            except BaseException as e:
+                self.release(key, e)
+                raise
+            self.release(key)
+            return result
+
+    def _wake(self, all: bool = False):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                if not all:
+                    return
+
+    def __repr__(self) -> str:
+        return f"oneai.KeyPool(keys={len(self.keys)}, active={len(self.active)}, strategy={self.strategy})"
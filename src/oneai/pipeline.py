@@ -1,13 +1,38 @@
 import asyncio
 import concurrent.futures
-import io
+import functools
+import inspect
 import os
 import sys
-from typing import Awaitable, Callable, Dict, Iterable, List
+from typing import (
+    AsyncIterable,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Tuple,
+    Type,
+    Union,
+)
+
+import aiohttp
 
 import oneai
+from oneai import runtime
 from oneai.classes import BatchResponse, Output, PipelineInput, Skill, TextContent
+from oneai.client import Client
+from oneai.cache import ResponseCache
+from oneai.concurrency import ConcurrencyLimiter
+from oneai.dead_letter import DeadLetterStore, closing_files, read_dead_letters
+from oneai.exceptions import APIKeyError
+from oneai.hedging import HedgePolicy
+from oneai.incremental import process_incremental
+from oneai.journal import Journal
+from oneai.key_pool import KeyPool
+from oneai.retry import RetryPolicy
 from oneai.process_scheduler import *
+from oneai.sharding import process_batch_sharded
 
 
 class Pipeline:
@@ -18,21 +43,33 @@ class Pipeline:
 
     `steps: list[Skill]`
         A list of Language Skills to process the input text. The order of the skills in the list determines their input.
-    `api_key: str, optional`
-        An API key to be used in this pipelines `run` calls. If not provided, the global `oneai.api_key` is used.
+    `api_key: str | KeyPool, optional`
+        An API key to be used in this pipelines `run` calls, or a `KeyPool` to spread requests across multiple keys. If not provided, the global `oneai.api_key` is used.
     `multilingual: bool, optional`
         Whether the pipeline should be allowed to process multilingual input.
+    `retry: RetryPolicy, optional`
+        Policy for retrying failed requests of this pipeline. If not provided, failed requests are not retried.
+    `timeout: aiohttp.ClientTimeout, optional`
+        Connect, read and total timeouts of each request of this pipeline. If not provided, the timeouts of the session (or `Client`) are used.
+    `hedge: HedgePolicy, optional`
+        Policy for hedging slow requests of `run` and `run_async` calls, tracking the latencies of this pipeline. If not provided, requests are not hedged.
 
     ## Methods
 
     `run(input, api_key=None) -> Output`
         Runs the pipeline on the input text.
-    `run_async(input, api_key=None) -> Awaitable[Output]`
+    `run_async(input, api_key=None, client=None) -> Awaitable[Output]`
         Runs the pipeline on the input text asynchronously.
     `run_batch(batch, api_key=None) -> Dict[Input, Output]`
         Runs the pipeline on a batch of input texts.
-    `run_batch_async(batch, api_key=None) -> Awaitable[Dict[Input, Output]]`
+    `run_batch_async(batch, api_key=None, client=None) -> Awaitable[Dict[Input, Output]]`
         Runs the pipeline on a batch of input texts asynchronously.
+    `stream_batch(batch, api_key=None, max_pending=100) -> AsyncIterator[Tuple[Input, Output | Exception]]`
+        Runs the pipeline on a batch of input texts, yielding results as they complete.
+    `redrive(dead_letter, api_key=None) -> Dict[Input, Output]`
+        Re-runs the pipeline on the failed inputs recorded in a dead-letter file.
+    `run_incremental(input, api_key=None, cache=None) -> Output`
+        Runs an analyzer-only pipeline on a document, only sending the parts that changed since it was last processed.
 
     ## Pipeline Ordering
 
@@ -58,17 +95,29 @@ class Pipeline:
     """
 
     def __init__(
-        self, steps: List[Skill], api_key: str = None, multilingual: bool = False
+        self,
+        steps: List[Skill],
+        api_key: Union[str, KeyPool] = None,
+        multilingual: bool = False,
+        retry: RetryPolicy = None,
+        timeout: aiohttp.ClientTimeout = None,
+        hedge: HedgePolicy = None,
     ) -> None:
         self.steps = tuple(steps)  # todo: validate (based on input_type)
         self.api_key = api_key
         self.multilingual = multilingual
+        self.retry = retry
+        self.timeout = timeout
+        self.hedge = hedge
 
     def run(
         self,
         input: PipelineInput[TextContent],
-        api_key: str = None,
+        api_key: Union[str, KeyPool] = None,
         multilingual: bool = False,
+        retry: RetryPolicy = None,
+        timeout: aiohttp.ClientTimeout = None,
+        hedge: HedgePolicy = None,
     ) -> Output[TextContent]:
         """
         Runs the pipeline on the input text.
@@ -76,9 +125,15 @@ class Pipeline:
         ## Parameters
 
         `input: PipelineInput`
-            The input text to be processed.
-        `api_key: str, optional`
-            An API key to be used in this API call. If not provided, `self.api_key` is used.
+            The input text to be processed. With `oneai.ASYNC_FILE_THRESHOLD`, binary files and large texts are uploaded to the async file endpoint, and their task is polled until it completes.
+        `api_key: str | KeyPool, optional`
+            An API key to be used in this API call, or a `KeyPool` to spread requests across multiple keys. If not provided, `self.api_key` is used.
+        `retry: RetryPolicy, optional`
+            Policy for retrying failed requests in this call. If not provided, `self.retry` is used.
+        `timeout: aiohttp.ClientTimeout, optional`
+            Timeouts of each request in this call, e.g. `aiohttp.ClientTimeout(total=300, sock_connect=10, sock_read=120)`. If not provided, `self.timeout` is used.
+        `hedge: HedgePolicy, optional`
+            Policy for hedging a slow request in this call with a duplicate request. If not provided, `self.hedge` is used.
 
         ## Returns
 
@@ -90,21 +145,38 @@ class Pipeline:
         `APIKeyError` if the API key is invalid, expired, or missing quota.
         `ServerError` if an internal server error occured.
         """
+        input = Input.wrap(input)
         return _async_run_nested(
-            process_single_input(
+            process_file_async(
+                input,
+                self.steps,
+                api_key or self.api_key or oneai.api_key,
+                1,
+                multilingual or self.multilingual or oneai.multilingual,
+                timeout=timeout or self.timeout,
+            )
+            if send_as_file(input)
+            else process_single_input(
                 input,
                 self.steps,
                 api_key or self.api_key or oneai.api_key,
                 multilingual or self.multilingual or oneai.multilingual,
+                retry=retry or self.retry,
+                timeout=timeout or self.timeout,
+                hedge=hedge or self.hedge,
             )
         )
 
     async def run_async(
         self,
         input: PipelineInput[TextContent],
-        api_key: str = None,
+        api_key: Union[str, KeyPool] = None,
         interval: int = 1,
         multilingual: bool = False,
+        client: Client = None,
+        retry: RetryPolicy = None,
+        timeout: aiohttp.ClientTimeout = None,
+        hedge: HedgePolicy = None,
     ) -> Awaitable[Output[TextContent]]:
         """
         Runs the pipeline on the input text asynchronously.
@@ -112,9 +184,17 @@ class Pipeline:
         ## Parameters
 
         `input: PipelineInput`
-            The input text (or multiple input texts) to be processed.
-        `api_key: str, optional`
-            An API key to be used in this API call. If not provided, `self.api_key` is used.
+            The input text (or multiple input texts) to be processed. Files are uploaded to the async file endpoint, and their task is polled every `interval` seconds until it completes. With `oneai.ASYNC_FILE_THRESHOLD`, only binary files and large texts are uploaded, small text files are sent inline.
+        `api_key: str | KeyPool, optional`
+            An API key to be used in this API call, or a `KeyPool` to spread requests across multiple keys. If not provided, `self.api_key` is used.
+        `client: Client, optional`
+            An open `oneai.Client` whose connection pool is used for this call. If not provided, a new connection is opened.
+        `retry: RetryPolicy, optional`
+            Policy for retrying failed requests in this call. If not provided, `self.retry` is used.
+        `timeout: aiohttp.ClientTimeout, optional`
+            Timeouts of each request in this call, e.g. `aiohttp.ClientTimeout(total=300, sock_connect=10, sock_read=120)`. If not provided, `self.timeout` is used.
+        `hedge: HedgePolicy, optional`
+            Policy for hedging a slow request in this call with a duplicate request. If not provided, `self.hedge` is used.
 
         ## Returns
 
@@ -126,6 +206,7 @@ class Pipeline:
         `APIKeyError` if the API key is invalid, expired, or missing quota.
         `ServerError` if an internal server error occured.
         """
+        input = Input.wrap(input)
         return await (
             process_file_async(
                 input,
@@ -133,44 +214,185 @@ class Pipeline:
                 api_key or self.api_key or oneai.api_key,
                 interval,
                 multilingual or self.multilingual or oneai.multilingual,
+                client=client,
+                timeout=timeout or self.timeout,
             )
-            if isinstance(input, io.IOBase)
-            or (isinstance(input, Input) and isinstance(input.text, io.IOBase))
+            if send_as_file(input, default=True)
             else process_single_input(
                 input,
                 self.steps,
                 api_key or self.api_key or oneai.api_key,
                 multilingual or self.multilingual or oneai.multilingual,
+                client=client,
+                retry=retry or self.retry,
+                timeout=timeout or self.timeout,
+                hedge=hedge or self.hedge,
             )
         )
 
+    def run_incremental(
+        self,
+        input: Union[str, Input[str]],
+        api_key: Union[str, KeyPool] = None,
+        multilingual: bool = False,
+        cache: ResponseCache = None,
+        chunk_size: int = 2000,
+        concurrency: int = None,
+        retry: RetryPolicy = None,
+        timeout: aiohttp.ClientTimeout = None,
+    ) -> Output[str]:
+        """
+        Runs an analyzer-only pipeline (e.g. `Keywords`, `Names`, `Emotions`) on a document, only sending the parts that changed since it was last processed.
+        The document is split into content-defined chunks, the labels of each chunk are cached, and only chunks not found in the cache are sent to the API.
+        The labels of all chunks are merged, with their spans remapped to the whole document. Document-level labels without spans are deduplicated.
+
+        ## Parameters
+
+        `input: str | Input[str]`
+            The document to be processed.
+        `api_key: str | KeyPool, optional`
+            An API key to be used in this API call, or a `KeyPool` to spread requests across multiple keys. If not provided, `self.api_key` is used.
+        `cache: ResponseCache, optional`
+            Cache for the chunk labels. Pass a `ResponseCache` with a path to keep them across processes. If not provided, an in-memory cache shared by all pipelines is used.
+        `chunk_size: int`
+            Average chunk size in characters. Smaller chunks send less text per edit, but more requests per new document.
+        `concurrency: int, optional`
+            Number of concurrent chunk requests. Defaults to `oneai.MAX_CONCURRENT_REQUESTS`.
+        `retry: RetryPolicy, optional`
+            Policy for retrying failed requests in this call. If not provided, `self.retry` is used.
+        `timeout: aiohttp.ClientTimeout, optional`
+            Timeouts of each request in this call, e.g. `aiohttp.ClientTimeout(total=300, sock_connect=10, sock_read=120)`. If not provided, `self.timeout` is used.
+
+        ## Returns
+
+        An `Output` object containing the merged results of the Skills in the pipeline.
+
+        ## Raises
+
+        `ValueError` if the pipeline contains generator Skills, or the input is not a `str`.
+        `InputError` if the input is is invalid or is of an incompatible type for the pipeline.
+        `APIKeyError` if the API key is invalid, expired, or missing quota.
+        `ServerError` if an internal server error occured.
+        """
+        return _async_run_nested(
+            self.run_incremental_async(
+                input,
+                api_key,
+                multilingual,
+                cache=cache,
+                chunk_size=chunk_size,
+                concurrency=concurrency,
+                retry=retry,
+                timeout=timeout,
+            )
+        )
+
+    async def run_incremental_async(
+        self,
+        input: Union[str, Input[str]],
+        api_key: Union[str, KeyPool] = None,
+        multilingual: bool = False,
+        client: Client = None,
+        cache: ResponseCache = None,
+        chunk_size: int = 2000,
+        concurrency: int = None,
+        retry: RetryPolicy = None,
+        timeout: aiohttp.ClientTimeout = None,
+    ) -> Awaitable[Output[str]]:
+        """
+        Runs an analyzer-only pipeline on a document asynchronously, only sending the parts that changed since it was last processed. See `run_incremental`.
+        """
+        return await process_incremental(
+            input,
+            self.steps,
+            api_key or self.api_key or oneai.api_key,
+            multilingual or self.multilingual or oneai.multilingual,
+            client=client,
+            retry=retry or self.retry,
+            cache=cache,
+            chunk_size=chunk_size,
+            timeout=timeout or self.timeout,
+            concurrency=concurrency,
+        )
+
     def run_batch(
         self,
-        batch: Iterable[PipelineInput[TextContent]],
-        api_key: str = None,
+        batch: Union[
+            Iterable[PipelineInput[TextContent]],
+            AsyncIterable[PipelineInput[TextContent]],
+            "asyncio.Queue[PipelineInput[TextContent]]",
+        ],
+        api_key: Union[str, KeyPool] = None,
         on_output: Callable[
             [PipelineInput[TextContent], Output[TextContent]], None
         ] = None,
         on_error: Callable[[PipelineInput[TextContent], Exception], None] = None,
         multilingual: bool = False,
+        concurrency: Union[int, ConcurrencyLimiter] = None,
+        retry: RetryPolicy = None,
+        ordered: bool = False,
+        window: int = 100,
+        prefetch: int = 0,
+        sink_executor: concurrent.futures.Executor = None,
+        processes: int = None,
+        journal: Union[str, Journal] = None,
+        dead_letter: Union[str, DeadLetterStore] = None,
+        async_files: Union[bool, TaskPoller] = False,
+        timeout: aiohttp.ClientTimeout = None,
+        deadline: float = None,
+        scheduler: Scheduler = None,
+        abort_on: Tuple[Type[Exception], ...] = (APIKeyError,),
     ) -> BatchResponse:
         """
         Runs the pipeline on a batch of input texts.
 
         ## Parameters
 
-        `batch: Iterable[PipelineInput]`
-            The input texts to be processed.
-        `api_key: str, optional`
-            An API key to be used in this API call. If not provided, `self.api_key` is used.
-        `on_output: Callable[[Input, Output], None]`
-            Action to perform on successful output, by default creates a dict mapping inputs to outputs
-        `on_error: Callable[[Input, Exception], None]`
-            Action to perform on error, by default creates a dict mapping inputs to errors
+        `batch: Iterable[PipelineInput] | AsyncIterable[PipelineInput] | asyncio.Queue`
+            The input texts to be processed. Inputs are pulled lazily as workers become available. When using a queue, put `None` on it to end the batch.
+        `api_key: str | KeyPool, optional`
+            An API key to be used in this API call, or a `KeyPool` to spread requests across multiple keys. If not provided, `self.api_key` is used.
+        `on_output: Callable[[Input, Output], None | Awaitable[None]]`
+            Action to perform on successful output, by default creates a dict mapping inputs to outputs. Can be a coroutine function.
+        `on_error: Callable[[Input, Exception], None | Awaitable[None]]`
+            Action to perform on error, by default creates a dict mapping inputs to errors. Can be a coroutine function.
+        `concurrency: int | ConcurrencyLimiter, optional`
+            Number of concurrent requests, or a `ConcurrencyLimiter` to adapt it to the API latency and errors. Defaults to `oneai.MAX_CONCURRENT_REQUESTS`.
+        `retry: RetryPolicy, optional`
+            Policy for retrying failed requests in this batch. If not provided, `self.retry` is used. The policy's retry budget is shared by all inputs of the batch.
+        `ordered: bool`
+            Whether to deliver results in input order. Completed results are held in a reorder buffer until all preceding inputs are done.
+        `window: int`
+            In ordered mode, max number of dispatched inputs whose results were not delivered yet. When reached, dispatch stalls until the first pending input completes. See `stats.hol_blocking` of the returned response to tune it.
+        `prefetch: int`
+            If set, sync iterables are read on a background thread into a queue of up to `prefetch` inputs, so that blocking reads (files, DB cursors) don't stall the event loop.
+        `sink_executor: concurrent.futures.Executor, optional`
+            Executor to run blocking `on_output`/`on_error` callbacks on, e.g. writes to network storage or a database. Results are handed to a single writer through a bounded queue and flushed in batches, so callbacks are never called concurrently and don't block the workers.
+            Coroutine callbacks are always awaited by a single writer task on the event loop.
+        `processes: int, optional`
+            If set, requests are sent by `processes` worker processes, each with its own event loop and connection pool, for batches whose throughput is bound by response decoding. The concurrency is split between the processes, and results are delivered to the callbacks in the calling process.
+            Inputs, steps and outputs must be picklable. Binary files are read into memory to be sent to the processes.
+            `oneai.rate_limiter` is shared by the processes through files (see `RateLimiter.shared`), while `oneai.cache` and `oneai.circuit_breaker` keep separate state in each process, if inherited at all.
+        `journal: str | Journal, optional`
+            Path of a checkpoint file, or a `Journal`. Successful requests are recorded in the journal, and inputs already recorded by a previous run are skipped, replaying their outputs to `on_output`. Use it to resume long-running batches after a crash. Not supported with `processes`.
+        `dead_letter: str | DeadLetterStore, optional`
+            Path of a dead-letter file, or a `DeadLetterStore`, to record failed inputs in. When set, errors are not added to the returned dictionary by default. Re-run the failed inputs with `redrive`.
+        `async_files: bool | TaskPoller`
+            Whether to upload all binary file inputs (e.g. audio files opened with `"rb"`) to the async file endpoint. Otherwise, inputs are routed by `oneai.ASYNC_FILE_THRESHOLD`: binary files and large texts are uploaded, and other inputs are sent inline in the same batch. Without a threshold, all inputs are sent inline.
+            Uploads count towards `concurrency`, and all pending files are then polled by a single `TaskPoller`. Each file's output is delivered as soon as its task completes. Pass a `TaskPoller` to tune its polling intervals. Not supported with `processes`, which sends all files inline.
+        `timeout: aiohttp.ClientTimeout, optional`
+            Timeouts of each request in this batch, e.g. `aiohttp.ClientTimeout(total=300, sock_connect=10, sock_read=120)`. Timed out requests are retried according to `retry`. If not provided, `self.timeout` is used.
+        `deadline: float, optional`
+            Max seconds to run the batch for. When the deadline passes, no more inputs are dispatched and requests in flight are cancelled. Results completed before the deadline are delivered, and the inputs that were not processed are listed in the returned `unprocessed` attribute. Not supported with `processes`.
+        `scheduler: Scheduler, optional`
+            Policy deciding which input is dispatched next, e.g. `PriorityScheduler`, `DeadlineScheduler` or `ShortestFirstScheduler`, from a lookahead window of inputs read ahead of the workers. Defaults to batch order. Not supported with `ordered`.
+        `abort_on: tuple[type[Exception], ...]`
+            Errors that abort the whole batch, raised by this call, instead of failing a single input. Defaults to `APIKeyError`, add `CircuitOpenError` to also abort while `oneai.circuit_breaker` is open, or pass `()` to never abort.
 
         ## Returns
 
         Unless on_output/on_error are modified, returns a dictionary mapping inputs to the produced `Output` objects, each containing the results of the Skills in the pipeline.
+        Its `unprocessed` attribute lists the inputs that were not processed before the `deadline`, and its `stats` attribute holds the batch's `BatchStats`.
 
         ## Raises
 
@@ -179,36 +401,110 @@ class Pipeline:
         `ServerError` if an internal server error occured.
         """
         return _async_run_nested(
-            self.run_batch_async(batch, api_key, on_output, on_error, multilingual)
+            self.run_batch_async(
+                batch,
+                api_key,
+                on_output,
+                on_error,
+                multilingual,
+                concurrency=concurrency,
+                retry=retry,
+                ordered=ordered,
+                window=window,
+                prefetch=prefetch,
+                sink_executor=sink_executor,
+                processes=processes,
+                journal=journal,
+                dead_letter=dead_letter,
+                async_files=async_files,
+                timeout=timeout,
+                deadline=deadline,
+                scheduler=scheduler,
+                abort_on=abort_on,
+            )
         )
 
     async def run_batch_async(
         self,
-        batch: Iterable[PipelineInput[TextContent]],
-        api_key: str = None,
+        batch: Union[
+            Iterable[PipelineInput[TextContent]],
+            AsyncIterable[PipelineInput[TextContent]],
+            "asyncio.Queue[PipelineInput[TextContent]]",
+        ],
+        api_key: Union[str, KeyPool] = None,
         on_output: Callable[
             [PipelineInput[TextContent], Output[TextContent]], None
         ] = None,
         on_error: Callable[[PipelineInput[TextContent], Exception], None] = None,
         multilingual: bool = False,
+        client: Client = None,
+        concurrency: Union[int, ConcurrencyLimiter] = None,
+        retry: RetryPolicy = None,
+        ordered: bool = False,
+        window: int = 100,
+        prefetch: int = 0,
+        sink_executor: concurrent.futures.Executor = None,
+        processes: int = None,
+        journal: Union[str, Journal] = None,
+        dead_letter: Union[str, DeadLetterStore] = None,
+        async_files: Union[bool, TaskPoller] = False,
+        timeout: aiohttp.ClientTimeout = None,
+        deadline: float = None,
+        scheduler: Scheduler = None,
+        abort_on: Tuple[Type[Exception], ...] = (APIKeyError,),
     ) -> Awaitable[BatchResponse]:
         """
         Runs the pipeline on a batch of input texts asynchronously.
 
         ## Parameters
 
-        `batch: Iterable[str | Input]`
-            The input texts to be processed.
-        `api_key: str, optional`
-            An API key to be used in this API call. If not provided, `self.api_key` is used.
-        `on_output: Callable[[Input, Output], None]`
-            Action to perform on successful output, by default creates a dict mapping inputs to outputs
-        `on_error: Callable[[Input, Exception], None]`
-            Action to perform on error, by default creates a dict mapping inputs to errors
+        `batch: Iterable[PipelineInput] | AsyncIterable[PipelineInput] | asyncio.Queue`
+            The input texts to be processed. Inputs are pulled lazily as workers become available. When using a queue, put `None` on it to end the batch.
+        `api_key: str | KeyPool, optional`
+            An API key to be used in this API call, or a `KeyPool` to spread requests across multiple keys. If not provided, `self.api_key` is used.
+        `on_output: Callable[[Input, Output], None | Awaitable[None]]`
+            Action to perform on successful output, by default creates a dict mapping inputs to outputs. Can be a coroutine function.
+        `on_error: Callable[[Input, Exception], None | Awaitable[None]]`
+            Action to perform on error, by default creates a dict mapping inputs to errors. Can be a coroutine function.
+        `client: Client, optional`
+            An open `oneai.Client` whose connection pool is shared by the batch workers. If not provided, a new connection is opened.
+        `concurrency: int | ConcurrencyLimiter, optional`
+            Number of concurrent requests, or a `ConcurrencyLimiter` to adapt it to the API latency and errors. Defaults to `oneai.MAX_CONCURRENT_REQUESTS`.
+        `retry: RetryPolicy, optional`
+            Policy for retrying failed requests in this batch. If not provided, `self.retry` is used. The policy's retry budget is shared by all inputs of the batch.
+        `ordered: bool`
+            Whether to deliver results in input order. Completed results are held in a reorder buffer until all preceding inputs are done.
+        `window: int`
+            In ordered mode, max number of dispatched inputs whose results were not delivered yet. When reached, dispatch stalls until the first pending input completes. See `stats.hol_blocking` of the returned response to tune it.
+        `prefetch: int`
+            If set, sync iterables are read on a background thread into a queue of up to `prefetch` inputs, so that blocking reads (files, DB cursors) don't stall the event loop.
+        `sink_executor: concurrent.futures.Executor, optional`
+            Executor to run blocking `on_output`/`on_error` callbacks on, e.g. writes to network storage or a database. Results are handed to a single writer through a bounded queue and flushed in batches, so callbacks are never called concurrently and don't block the workers.
+            Coroutine callbacks are always awaited by a single writer task on the event loop.
+        `processes: int, optional`
+            If set, requests are sent by `processes` worker processes, each with its own event loop and connection pool, for batches whose throughput is bound by response decoding. The concurrency is split between the processes, and results are delivered to the callbacks in the calling process.
+            Inputs, steps and outputs must be picklable. Binary files are read into memory to be sent to the processes.
+            `oneai.rate_limiter` is shared by the processes through files (see `RateLimiter.shared`), while `oneai.cache` and `oneai.circuit_breaker` keep separate state in each process, if inherited at all.
+        `journal: str | Journal, optional`
+            Path of a checkpoint file, or a `Journal`. Successful requests are recorded in the journal, and inputs already recorded by a previous run are skipped, replaying their outputs to `on_output`. Use it to resume long-running batches after a crash. Not supported with `processes`.
+        `dead_letter: str | DeadLetterStore, optional`
+            Path of a dead-letter file, or a `DeadLetterStore`, to record failed inputs in. When set, errors are not added to the returned dictionary by default. Re-run the failed inputs with `redrive`.
+        `async_files: bool | TaskPoller`
+            Whether to upload all binary file inputs (e.g. audio files opened with `"rb"`) to the async file endpoint. Otherwise, inputs are routed by `oneai.ASYNC_FILE_THRESHOLD`: binary files and large texts are uploaded, and other inputs are sent inline in the same batch. Without a threshold, all inputs are sent inline.
+            Uploads count towards `concurrency`, and all pending files are then polled by a single `TaskPoller`. Each file's output is delivered as soon as its task completes. Pass a `TaskPoller` to tune its polling intervals. Not supported with `processes`, which sends all files inline.
+        `timeout: aiohttp.ClientTimeout, optional`
+            Timeouts of each request in this batch, e.g. `aiohttp.ClientTimeout(total=300, sock_connect=10, sock_read=120)`. Timed out requests are retried according to `retry`. If not provided, `self.timeout` is used.
+        `deadline: float, optional`
+            Max seconds to run the batch for. When the deadline passes, no more inputs are dispatched and requests in flight are cancelled. Results completed before the deadline are delivered, and the inputs that were not processed are listed in the returned `unprocessed` attribute. Not supported with `processes`.
+        `scheduler: Scheduler, optional`
+            Policy deciding which input is dispatched next, e.g. `PriorityScheduler`, `DeadlineScheduler` or `ShortestFirstScheduler`, from a lookahead window of inputs read ahead of the workers. Defaults to batch order. Not supported with `ordered`.
+        `abort_on: tuple[type[Exception], ...]`
+            Errors that abort the whole batch, raised by this call, instead of failing a single input. Defaults to `APIKeyError`, add `CircuitOpenError` to also abort while `oneai.circuit_breaker` is open, or pass `()` to never abort.
 
         ## Returns
 
         Unless on_output/on_error are modified, returns an Awaitable with a dictionary mapping inputs to the produced `Output` objects, each containing the results of the Skills in the pipeline.
+        Its `unprocessed` attribute lists the inputs that were not processed before the `deadline`, and its `stats` attribute holds the batch's `BatchStats`.
 
         ## Raises
 
@@ -217,16 +513,249 @@ class Pipeline:
         `ServerError` if an internal server error occured.
         """
         outputs = BatchResponse()
-        await process_batch(
-            batch,
-            self.steps,
-            on_output if on_output else outputs.__setitem__,
-            on_error if on_error else outputs.__setitem__,
+        stats = BatchStats()
+        sink = (
+            ResultSink(sink_executor)
+            if sink_executor
+            or inspect.iscoroutinefunction(on_output)
+            or inspect.iscoroutinefunction(on_error)
+            else None
+        )
+        owned_journal = isinstance(journal, str)
+        if owned_journal:
+            journal = Journal(journal)
+        owned_dead_letter = isinstance(dead_letter, str)
+        if owned_dead_letter:
+            dead_letter = DeadLetterStore(dead_letter)
+        if on_error is None and dead_letter is not None:
+            on_error = lambda input, error: None  # errors are in the dead-letter store
+        args = dict(
+            batch=batch,
+            steps=self.steps,
+            on_output=on_output if on_output else outputs.__setitem__,
+            on_error=on_error if on_error else outputs.__setitem__,
             api_key=api_key or self.api_key or oneai.api_key,
             multilingual=multilingual or self.multilingual or oneai.multilingual,
+            concurrency=concurrency,
+            retry=retry or self.retry,
+            ordered=ordered,
+            window=window,
+            prefetch=prefetch,
+            stats=stats,
+            sink=sink,
+            dead_letter=dead_letter,
+            timeout=timeout or self.timeout,
+            scheduler=scheduler,
+            abort_on=abort_on,
         )
+        try:
+            if processes and processes > 1:
+                if journal is not None:
+                    raise ValueError("journal is not supported with processes")
+                if async_files:
+                    raise ValueError("async_files is not supported with processes")
+                if deadline is not None:
+                    raise ValueError("deadline is not supported with processes")
+                if isinstance(args["api_key"], KeyPool):
+                    raise ValueError("KeyPool is not supported with processes")
+                await process_batch_sharded(processes=processes, **args)
+            else:
+                await process_batch(
+                    client=client,
+                    journal=journal,
+                    async_files=async_files,
+                    deadline=deadline,
+                    **args,
+                )
+        finally:
+            if owned_journal:
+                journal.close()
+            if owned_dead_letter:
+                dead_letter.close()
+        outputs.unprocessed = stats.unprocessed
+        outputs.stats = stats
         return outputs
 
+    def redrive(
+        self,
+        dead_letter: str,
+        api_key: Union[str, KeyPool] = None,
+        on_output: Callable[
+            [PipelineInput[TextContent], Output[TextContent]], None
+        ] = None,
+        on_error: Callable[[PipelineInput[TextContent], Exception], None] = None,
+        multilingual: bool = False,
+        concurrency: Union[int, ConcurrencyLimiter] = None,
+        retry: RetryPolicy = None,
+    ) -> BatchResponse:
+        """
+        Re-runs the pipeline on the inputs recorded in a dead-letter file by `run_batch`.
+        Inputs that fail again are written back to the dead-letter file, replacing it once the run completes, so `redrive` can be repeated until the file is empty.
+        File inputs are reopened as they are sent and closed once their result is delivered. Records of files that no longer exist are skipped with a warning, and dropped from the file.
+
+        ## Parameters
+
+        `dead_letter: str`
+            Path of the dead-letter file.
+        `api_key: str | KeyPool, optional`
+            An API key to be used in this API call, or a `KeyPool` to spread requests across multiple keys. If not provided, `self.api_key` is used.
+        `on_output: Callable[[Input, Output], None | Awaitable[None]]`
+            Action to perform on successful output, by default creates a dict mapping inputs to outputs.
+        `on_error: Callable[[Input, Exception], None | Awaitable[None]]`
+            Action to perform on error, in addition to recording the input in the dead-letter file.
+        `concurrency: int | ConcurrencyLimiter, optional`
+            Number of concurrent requests for the re-run, independent of the original batch. Defaults to `oneai.MAX_CONCURRENT_REQUESTS`.
+        `retry: RetryPolicy, optional`
+            Policy for retrying failed requests. If not provided, `self.retry` is used.
+
+        ## Returns
+
+        Unless on_output is modified, returns a dictionary mapping the re-run inputs to the produced `Output` objects.
+        """
+        return _async_run_nested(
+            self.redrive_async(
+                dead_letter,
+                api_key,
+                on_output,
+                on_error,
+                multilingual,
+                concurrency=concurrency,
+                retry=retry,
+            )
+        )
+
+    async def redrive_async(
+        self,
+        dead_letter: str,
+        api_key: Union[str, KeyPool] = None,
+        on_output: Callable[
+            [PipelineInput[TextContent], Output[TextContent]], None
+        ] = None,
+        on_error: Callable[[PipelineInput[TextContent], Exception], None] = None,
+        multilingual: bool = False,
+        client: Client = None,
+        concurrency: Union[int, ConcurrencyLimiter] = None,
+        retry: RetryPolicy = None,
+    ) -> Awaitable[BatchResponse]:
+        """
+        Re-runs the pipeline on the inputs recorded in a dead-letter file by `run_batch`, asynchronously. See `redrive`.
+        """
+        # letters are read lazily, so that only the files in flight are open
+        inputs = (letter.input for letter in read_dead_letters(dead_letter))
+        outputs = BatchResponse()
+        # write failures to a new file, and only replace the old one when done
+        path = dead_letter + ".redrive"
+        if os.path.exists(path):
+            os.remove(path)
+        try:
+            with DeadLetterStore(path) as store:
+                response = await self.run_batch_async(
+                    inputs,
+                    api_key,
+                    closing_files(on_output or outputs.__setitem__),
+                    closing_files(on_error or (lambda input, error: None)),
+                    multilingual,
+                    client=client,
+                    concurrency=concurrency,
+                    retry=retry,
+                    dead_letter=store,
+                )
+        except BaseException:
+            os.remove(path)
+            raise
+        finally:
+            inputs.close()
+        os.replace(path, dead_letter)
+        outputs.unprocessed, outputs.stats = response.unprocessed, response.stats
+        return outputs
+
+    def stream_batch(
+        self,
+        batch: Union[
+            Iterable[PipelineInput[TextContent]],
+            AsyncIterable[PipelineInput[TextContent]],
+            "asyncio.Queue[PipelineInput[TextContent]]",
+        ],
+        api_key: Union[str, KeyPool] = None,
+        max_pending: int = 100,
+        multilingual: bool = False,
+        client: Client = None,
+        concurrency: Union[int, ConcurrencyLimiter] = None,
+        retry: RetryPolicy = None,
+        ordered: bool = False,
+        window: int = 100,
+        prefetch: int = 0,
+        timeout: aiohttp.ClientTimeout = None,
+        deadline: float = None,
+        scheduler: Scheduler = None,
+        abort_on: Tuple[Type[Exception], ...] = (APIKeyError,),
+    ) -> BatchStream:
+        """
+        Runs the pipeline on a batch of input texts, yielding results as they complete (or in input order, with `ordered=True`).
+        Inputs are pulled from `batch` only as results are consumed, so memory use is bounded by the concurrency and `max_pending`, regardless of the size of `batch`.
+
+        ## Parameters
+
+        `batch: Iterable[PipelineInput] | AsyncIterable[PipelineInput] | asyncio.Queue`
+            The input texts to be processed. Inputs are pulled lazily as workers become available. When using a queue, put `None` on it to end the batch.
+        `api_key: str | KeyPool, optional`
+            An API key to be used in this API call, or a `KeyPool` to spread requests across multiple keys. If not provided, `self.api_key` is used.
+        `max_pending: int`
+            Max number of completed results waiting to be consumed. When reached, workers stop pulling new inputs until the consumer catches up.
+        `client: Client, optional`
+            An open `oneai.Client` whose connection pool is shared by the batch workers. If not provided, a new connection is opened.
+        `concurrency: int | ConcurrencyLimiter, optional`
+            Number of concurrent requests, or a `ConcurrencyLimiter` to adapt it to the API latency and errors. Defaults to `oneai.MAX_CONCURRENT_REQUESTS`.
+        `retry: RetryPolicy, optional`
+            Policy for retrying failed requests in this batch. If not provided, `self.retry` is used.
+        `ordered: bool`
+            Whether to deliver results in input order. Completed results are held in a reorder buffer until all preceding inputs are done.
+        `window: int`
+            In ordered mode, max number of dispatched inputs whose results were not delivered yet. When reached, dispatch stalls until the first pending input completes. See `stats.hol_blocking` to tune it.
+        `prefetch: int`
+            If set, sync iterables are read on a background thread into a queue of up to `prefetch` inputs, so that blocking reads (files, DB cursors) don't stall the event loop.
+        `timeout: aiohttp.ClientTimeout, optional`
+            Timeouts of each request in this batch. If not provided, `self.timeout` is used.
+        `deadline: float, optional`
+            Max seconds to run the batch for. When the deadline passes, no more inputs are dispatched, requests in flight are cancelled and the stream ends. The inputs that were not processed are listed in `stats.unprocessed`.
+        `scheduler: Scheduler, optional`
+            Policy deciding which input is dispatched next, e.g. `PriorityScheduler`, `DeadlineScheduler` or `ShortestFirstScheduler`, from a lookahead window of inputs read ahead of the workers. Defaults to batch order. Not supported with `ordered`.
+        `abort_on: tuple[type[Exception], ...]`
+            Errors that abort the whole batch, raised by this call, instead of failing a single input. Defaults to `APIKeyError`, add `CircuitOpenError` to also abort while `oneai.circuit_breaker` is open, or pass `()` to never abort.
+
+        ## Returns
+
+        A `BatchStream`, an async iterator of `(input, result)` pairs, where `result` is either an `Output` object or the exception raised for the input.
+
+        ## Example
+
+        >>> async for input, result in pipeline.stream_batch(inputs, max_pending=50):
+        ...     if isinstance(result, Exception):
+        ...         print(f"{input.text} failed: {result}")
+        ...     else:
+        ...         print(result.summary.text)
+        """
+        return BatchStream(
+            functools.partial(
+                process_batch,
+                batch,
+                self.steps,
+                api_key=api_key or self.api_key or oneai.api_key,
+                multilingual=multilingual or self.multilingual or oneai.multilingual,
+                client=client,
+                concurrency=concurrency,
+                retry=retry or self.retry,
+                ordered=ordered,
+                window=window,
+                prefetch=prefetch,
+                timeout=timeout or self.timeout,
+                deadline=deadline,
+                scheduler=scheduler,
+                abort_on=abort_on,
+            ),
+            max_pending,
+        )
+
     def __repr__(self) -> str:
         return f"oneai.Pipeline({self.steps})"
 
@@ -240,6 +769,10 @@ if os.name == "nt" and not is_36:  # Windows
 
 
 def _async_run_nested(coru):
+    rt = runtime.current()
+    if rt is not None and not rt.in_loop():
+        return rt.run(coru)
+
     if is_36:
         loop = asyncio.get_event_loop()
         return loop.run_until_complete(coru)
@@ -1,15 +1,57 @@
 import asyncio
+import concurrent.futures
+import heapq
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
+import hashlib
+import inspect
+import io
 import logging
-from typing import Awaitable, Callable, Iterable, List
+import queue
+import threading
+import uuid
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
 
 import aiohttp
 
 import oneai
 from oneai.api.output import build_output
-from oneai.api.pipeline import post_pipeline, post_pipeline_async_file, get_task_status
+from oneai.api.pipeline import (
+    file_size,
+    get_task_status,
+    is_stream,
+    post_pipeline,
+    post_pipeline_async_file,
+    request_fingerprint,
+)
 from oneai.classes import Input, Output, PipelineInput, Skill
-from oneai.exceptions import ServerError, handle_unsuccessful_response
+from oneai.client import Client
+from oneai.concurrency import ConcurrencyLimiter
+from oneai.dead_letter import DeadLetterStore
+from oneai.hedging import HedgePolicy
+from oneai.journal import Journal
+from oneai.key_pool import KeyPool
+from oneai.rate_limit import text_length
+from oneai.retry import RetryBudget, RetryPolicy, with_retries
+from oneai.scheduling import ScheduleBuffer, Scheduler
+from oneai.single_flight import SingleFlight
+from oneai import runtime
+from oneai.exceptions import APIKeyError, ServerError, handle_unsuccessful_response
 
 logger = logging.getLogger("oneai")
 
@@ -22,32 +64,706 @@ def time_format(time: timedelta):
 STATUS_COMPLETED = "COMPLETED"
 STATUS_FAILED = "FAILED"
 
+BatchSource = Union[
+    Iterable[PipelineInput], AsyncIterable[PipelineInput], "asyncio.Queue"
+]
+"""
+Inputs of a batch: an iterable, an async iterable, or an `asyncio.Queue` ended by putting `None`.
+"""
+
+
+@dataclass
+class BatchStats:
+    """
+    Progress counters of a batch run.
+
+    ## Attributes
+
+    `successful: int`
+        Number of inputs processed successfully.
+    `failed: int`
+        Number of inputs that failed.
+    `time_total: timedelta`
+        Total time spent on all requests.
+    `hol_blocking: timedelta`
+        In ordered mode, total time workers were stalled because the reorder window was full (head-of-line blocking). If high, increase the window.
+    `replayed: int`
+        Number of successful inputs whose output was replayed from a `Journal` instead of being requested.
+    `coalesced: int`
+        Number of inputs that shared the request of an identical input in flight, instead of sending their own.
+    `unprocessed: list[Input]`
+        Inputs that were not processed because the batch deadline passed: inputs whose requests were cancelled, inputs read ahead with `prefetch`, and the rest of the batch if it's a list or a tuple.
+        Other batch sources are not read past the deadline, so they can be resumed from where they stopped.
+    """
+
+    successful: int = 0
+    failed: int = 0
+    time_total: timedelta = timedelta()
+    hol_blocking: timedelta = timedelta()
+    replayed: int = 0
+    coalesced: int = 0
+    unprocessed: List[Input] = field(default_factory=list)
+
+    @property
+    def processed(self) -> int:
+        return self.successful + self.failed
+
+
+class BatchStream:
+    """
+    An async iterator over `(input, result)` pairs of a batch, in completion order. `result` is either an `Output` or the exception raised for the input.
+    Workers stop pulling new inputs while `max_pending` results are waiting to be consumed.
+    Returned by `Pipeline.stream_batch`.
+
+    ## Attributes
+
+    `stats: BatchStats`
+        Progress counters of the batch, updated while iterating.
+    """
+
+    def __init__(
+        self,
+        run: Callable[..., Awaitable[None]],
+        max_pending: int,
+    ):
+        self._run = run
+        self.max_pending = max_pending
+        self.stats = BatchStats()
+
+    def __aiter__(self) -> AsyncIterator[Tuple[Input, Union[Output, Exception]]]:
+        return self._stream()
+
+    async def _stream(self):
+        queue = asyncio.Queue(maxsize=max(self.max_pending, 1))
+        done = object()
+
+        async def put(input: Input, result: Any):
+            await queue.put((input, result))
+
+        async def run():
+            try:
+                await self._run(on_output=put, on_error=put, stats=self.stats)
+            finally:
+                await queue.put(done)
+
+        task = asyncio.ensure_future(run())
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                yield item
+            await task  # raise batch-level errors
+        finally:
+            if not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+
+class Prefetcher:
+    """
+    An async iterator reading a blocking iterable on a dedicated thread, into a bounded queue of `depth` items.
+    The event loop consumes the queue without blocking, so the iterable's I/O overlaps with network I/O.
+    """
+
+    _END = object()
+
+    def __init__(self, iterable: Iterable, depth: int):
+        self._iterable = iterable
+        self._queue = queue.Queue(maxsize=max(depth, 1))
+        self._stop = threading.Event()
+        self._thread: threading.Thread = None
+        self._ready: asyncio.Event = None
+        self._error: BaseException = None
+        self._unread: List = []  # read after closing, never queued
+
+    def _read(self, loop: asyncio.AbstractEventLoop):
+        def put(item) -> bool:
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(item, timeout=0.1)
+                except queue.Full:
+                    continue
+                try:
+                    loop.call_soon_threadsafe(self._ready.set)
+                except RuntimeError:  # loop closed
+                    return False
+                return True
+            if item is not self._END:
+                self._unread.append(item)
+            return False
+
+        try:
+            for item in self._iterable:
+                if not put(item):
+                    return
+        except BaseException as e:
+            self._error = e
+        put(self._END)
+
+    def __aiter__(self) -> "Prefetcher":
+        return self
+
+    async def __anext__(self):
+        if self._thread is None:
+            self._ready = asyncio.Event()
+            self._thread = threading.Thread(
+                target=self._read,
+                args=(asyncio.get_running_loop(),),
+                name="oneai-prefetch",
+                daemon=True,
+            )
+            self._thread.start()
+
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                self._ready.clear()
+                if self._queue.empty():
+                    await self._ready.wait()
+                continue
+            if item is self._END:
+                if self._error is not None:
+                    raise self._error
+                raise StopAsyncIteration
+            return item
+
+    def close(self):
+        self._stop.set()
+
+    async def drain(self, timeout: float = 0.5) -> List:
+        """
+        Stops reading, and returns the items read from the iterable but not consumed, in order.
+        Waits up to `timeout` seconds for the reading thread to stop, off the event loop, so that the iterable can be resumed after the last returned item.
+        If the iterable is still blocked in a read, the thread is left to finish it, and the item it returns is not included.
+        """
+        self.close()
+        if self._thread is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._thread.join, timeout
+            )
+        items = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not self._END:
+                items.append(item)
+        return items + self._unread
+
+
+class InputSource:
+    """
+    Distributes batch inputs to workers, pulling them lazily from a sync iterable, an async iterable or an `asyncio.Queue`.
+    Async sources are pulled by one worker at a time, so ingestion overlaps with the requests of the other workers.
+    With `prefetch`, sync iterables are read on a background thread (see `Prefetcher`).
+    With `async_files`, binary files are not read into memory, to be uploaded to the async file endpoint.
+    With a `scheduler`, inputs are read into a lookahead buffer and handed out in the scheduler's order.
+    """
+
+    def __init__(
+        self,
+        batch: BatchSource,
+        prefetch: int = 0,
+        async_files: bool = False,
+        scheduler: Scheduler = None,
+    ):
+        self._iterator: Iterable = None
+        self._async_iterator: AsyncIterator = None
+        self._queue: asyncio.Queue = None
+        self._batch = batch
+        if isinstance(batch, asyncio.Queue):
+            self._queue = batch
+        elif hasattr(batch, "__aiter__"):
+            self._async_iterator = batch.__aiter__()
+        elif prefetch:
+            self._async_iterator = Prefetcher(batch, prefetch)
+        else:
+            self._iterator = iter(batch)
+        self.async_files = async_files
+        self._buffer = (
+            ScheduleBuffer(scheduler)
+            if scheduler is not None and scheduler.lookahead > 1
+            else None
+        )
+        self._lock = asyncio.Lock()
+        self._index = 0
+        self.exhausted = False
+
+    async def next(self) -> Optional[Tuple[int, Input]]:
+        # returns the next input with its index in the batch, or None at the end of the batch
+        if self._buffer is None:
+            return await self._pull()
+        while not self._buffer.full and not self.exhausted:
+            # don't wait for queued inputs that didn't arrive yet, unless there's nothing to dispatch
+            if self._queue is not None and self._queue.empty() and len(self._buffer):
+                break
+            next_input = await self._pull()
+            if next_input is not None:
+                self._buffer.push(*next_input)
+        return self._buffer.pop()
+
+    async def _pull(self) -> Optional[Tuple[int, Input]]:
+        if self.exhausted:
+            return None
+        if self._iterator is not None:
+            try:
+                input = next(self._iterator)
+            except StopIteration:
+                self.exhausted = True
+                return None
+        else:
+            async with self._lock:
+                if self.exhausted:
+                    return None
+                if self._queue is not None:
+                    input = await self._queue.get()
+                    self._queue.task_done()
+                    if input is None:
+                        self.exhausted = True
+                        return None
+                else:
+                    try:
+                        input = await self._async_iterator.__anext__()
+                    except StopAsyncIteration:
+                        self.exhausted = True
+                        return None
+
+        index = self._index
+        self._index += 1
+        return index, Input.wrap(input, not self.async_files)
+
+    async def remaining(self) -> List[Input]:
+        # inputs not handed out yet: buffered inputs, and the rest of a list or tuple batch, or the prefetched inputs of other iterables.
+        # other sources are not read further
+        inputs = [input for _, input in self._buffer.drain()] if self._buffer else []
+        if self.exhausted:
+            return inputs
+        if isinstance(self._batch, (list, tuple)):
+            rest = self._batch[self._index :]
+        elif isinstance(self._async_iterator, Prefetcher):
+            rest = await self._async_iterator.drain()
+        else:
+            return inputs
+        return inputs + [Input.wrap(input, not self.async_files) for input in rest]
+
+    def close(self):
+        if isinstance(self._async_iterator, Prefetcher):
+            self._async_iterator.close()
+
+
+async def invoke(callback: Callable, *args):
+    # call a callback, awaiting it if it's a coroutine function
+    result = callback(*args)
+    if inspect.isawaitable(result):
+        await result
+
+
+def direct_delivery(
+    on_output: Callable,
+    on_error: Callable,
+    stats: BatchStats,
+    dead_letter: DeadLetterStore = None,
+) -> Callable[..., Awaitable[None]]:
+    # delivers results on the workers. errors raised by on_output are handed to on_error, failing the input
+    async def deliver(callback: Callable, input: Input, result: Any):
+        try:
+            await invoke(callback, input, result)
+        except Exception as e:
+            if callback is not on_output:
+                raise
+            logger.error(f"Input {stats.processed}: {repr(e)}")
+            stats.successful -= 1
+            stats.failed += 1
+            if dead_letter is not None:
+                dead_letter.record(input, e)
+            await invoke(on_error, input, e)
+
+    return deliver
+
+
+class ResultSink:
+    """
+    Delivers batch results to the `on_output`/`on_error` callbacks from a single writer task, so that slow sinks don't block the workers.
+    Results are handed over through a bounded queue, and flushed in batches of up to `flush_size`, either on the event loop (coroutine callbacks),
+    or on `executor` (blocking callbacks). Batches are flushed one at a time, so callbacks are never called concurrently.
+    """
+
+    def __init__(
+        self,
+        executor: concurrent.futures.Executor = None,
+        max_queue: int = 1000,
+        flush_size: int = 100,
+    ):
+        self.executor = executor
+        self.max_queue = max_queue
+        self.flush_size = flush_size
+        self._queue: asyncio.Queue = None
+        self._task: asyncio.Task = None
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=max(self.max_queue, 1))
+        self._task = asyncio.ensure_future(self._write())
+
+    async def put(self, callback: Callable, input: Input, result: Any):
+        item = (callback, input, result)
+        if not self._task.done() and not self._queue.full():
+            return self._queue.put_nowait(item)
+
+        # wait for room in the queue, unless the writer stopped (due to a callback error)
+        put = asyncio.ensure_future(self._queue.put(item))
+        await asyncio.wait([put, self._task], return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+        if self._task.done():
+            self._task.result()  # raise callback errors
+            raise RuntimeError("result sink is closed")
+
+    async def close(self):
+        # wait for all results to be delivered, raising callback errors
+        if self._task is None:
+            return
+        if not self._task.done():
+            await self._queue.put(None)
+        await self._task
+
+    def cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _write(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            while len(items) < self.flush_size and not self._queue.empty():
+                items.append(self._queue.get_nowait())
+            end = items[-1] is None
+            items = [item for item in items if item is not None]
+
+            if self.executor is not None:
+                await loop.run_in_executor(self.executor, _flush_sync, items)
+            else:
+                for callback, input, result in items:
+                    await invoke(callback, input, result)
+            if end:
+                return
+
+
+def _flush_sync(items: List[Tuple[Callable, Input, Any]]):
+    for callback, input, result in items:
+        callback(input, result)
+
+
+class ReorderWindow:
+    """
+    Releases batch results in input order. Holds at most `window` dispatched but unreleased inputs,
+    stalling dispatch when full, so memory stays bounded even when an early input is slow.
+    """
+
+    def __init__(
+        self,
+        window: int,
+        stats: BatchStats,
+        deliver: Callable[[Callable, Input, Any], Awaitable[None]] = invoke,
+    ):
+        if window < 1:
+            raise ValueError("reorder window must be at least 1")
+        self.window = window
+        self.stats = stats
+        self._outstanding = 0  # dispatched inputs that were not released yet
+        self._next_release = 0
+        self._buffer: Dict[int, Tuple[Callable, Input, Any]] = {}
+        self._deliver = deliver
+        self._space = asyncio.Condition()
+        self._release_lock = asyncio.Lock()
+
+    async def reserve(self):
+        # wait for room in the window before pulling the next input
+        async with self._space:
+            if self._outstanding >= self.window:
+                start = datetime.now()
+                await self._space.wait_for(lambda: self._outstanding < self.window)
+                self.stats.hol_blocking += datetime.now() - start
+            self._outstanding += 1
+
+    async def unreserve(self):
+        # no input was pulled after reserve() (end of batch)
+        async with self._space:
+            self._outstanding -= 1
+            self._space.notify()
+
+    async def complete(self, seq: int, callback: Callable, input: Input, result: Any):
+        self._buffer[seq] = (callback, input, result)
+        async with self._release_lock:
+            while self._next_release in self._buffer:
+                callback, input, result = self._buffer.pop(self._next_release)
+                self._next_release += 1
+                if callback is not None:
+                    await self._deliver(callback, input, result)
+                async with self._space:
+                    self._outstanding -= 1
+                    self._space.notify()
+
+    async def skip(self, seq: int):
+        # an input without a result (e.g. cancelled at the batch deadline), release the results after it
+        await self.complete(seq, None, None, None)
+
+    async def flush(self):
+        # the batch was aborted, release the held results without waiting for the inputs before them
+        async with self._release_lock:
+            for seq in sorted(self._buffer):
+                callback, input, result = self._buffer.pop(seq)
+                if callback is not None:
+                    await self._deliver(callback, input, result)
+
+
+async def deliver_completed(
+    reorder: Optional[ReorderWindow], sink: Optional[ResultSink]
+):
+    # delivers the results completed before a batch was aborted, the abort error is raised by the caller
+    try:
+        if reorder:
+            await reorder.flush()
+        if sink:
+            await sink.close()
+    except Exception as e:
+        logger.error(f"Failed to deliver results of the aborted batch: {e!r}")
+
+
+class TaskPoller:
+    """
+    Polls the status of async file tasks (see `Pipeline.run_batch` with file inputs) from a single task, instead of a polling loop per file.
+    Each task is first polled after `min_interval` seconds, and the interval grows by `backoff` with every poll up to `max_interval`,
+    so short jobs complete quickly while long ones don't flood the API. Each file's result is resolved as soon as its task completes.
+
+    ## Attributes
+
+    `min_interval: float`
+        Seconds before the first poll of a task.
+    `max_interval: float`
+        Max seconds between polls of a task.
+    `backoff: float`
+        Factor to multiply the interval of a task by after every poll.
+    `max_concurrent_polls: int`
+        Max number of status requests in flight.
+
+    ## Properties
+
+    `polls: int`
+        Total number of status requests sent.
+    `pending: int`
+        Number of tasks currently tracked.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = 0.5,
+        max_interval: float = 30.0,
+        backoff: float = 1.5,
+        max_concurrent_polls: int = 10,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_concurrent_polls = max_concurrent_polls
+        self.polls = 0
+        # task_id -> [future, session, api_key, interval]
+        self._tasks: Dict[str, list] = {}
+        # heap of (next poll time, task_id)
+        self._schedule: List[Tuple[float, str]] = []
+        self._wakeup: asyncio.Event = None
+        self._semaphore: asyncio.Semaphore = None
+        self._runner: asyncio.Task = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    async def wait(
+        self, session: aiohttp.ClientSession, task_id: str, api_key: str
+    ) -> dict:
+        """Waits for a task to complete, returning its raw output."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._tasks[task_id] = [future, session, api_key, self.min_interval]
+        heapq.heappush(self._schedule, (loop.time() + self.min_interval, task_id))
+        if self._runner is None:
+            self._wakeup = asyncio.Event()
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_polls)
+            self._runner = asyncio.ensure_future(self._run())
+        self._wakeup.set()
+        try:
+            return await future
+        finally:
+            self._tasks.pop(task_id, None)  # also stops polling cancelled waits
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while self._tasks:
+                now = loop.time()
+                due = []
+                while self._schedule and self._schedule[0][0] <= now:
+                    _, task_id = heapq.heappop(self._schedule)
+                    if task_id in self._tasks:
+                        due.append(task_id)
+                if due:
+                    await asyncio.gather(*[self._poll(task_id) for task_id in due])
+                    continue
+
+                self._wakeup.clear()
+                timeout = self._schedule[0][0] - now if self._schedule else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._runner = None
+
+    async def _poll(self, task_id: str):
+        future, session, api_key, interval = self._tasks[task_id]
+        async with self._semaphore:
+            try:
+                response = await get_task_status(session, task_id, api_key)
+                self.polls += 1
+            except Exception as e:
+                if not RetryPolicy().is_retryable(e):
+                    if not future.done():
+                        future.set_exception(e)
+                    return
+                response = {}  # poll again later
+
+        status = response.get("status")
+        if future.done():
+            return
+        if status == STATUS_COMPLETED:
+            future.set_result(response["result"])
+        elif status == STATUS_FAILED:
+            try:
+                await handle_unsuccessful_response(response["result"])
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            interval = min(interval * self.backoff, self.max_interval)
+            self._tasks[task_id][3] = interval
+            heapq.heappush(
+                self._schedule, (asyncio.get_running_loop().time() + interval, task_id)
+            )
+
+    def __repr__(self) -> str:
+        return f"oneai.TaskPoller(pending={self.pending}, polls={self.polls})"
+
+
+def check_scheduler(scheduler: Scheduler, ordered: bool) -> Scheduler:
+    # ordered delivery waits for inputs held back by the scheduler, and could stall the reorder window
+    if ordered and scheduler is not None and scheduler.lookahead > 1:
+        raise ValueError("scheduler is not supported with ordered=True")
+    return scheduler
+
+
+class _Expired(Exception):
+    # raised in batch workers when the batch deadline passes
+    pass
+
+
+# use the session of a long-lived client if provided (or if running in the runtime loop),
+# otherwise open a new one for this call
+@asynccontextmanager
+async def client_session(client: Client = None) -> AsyncIterator[aiohttp.ClientSession]:
+    client = client or runtime.loop_client()
+    if client is not None:
+        yield client.session
+    else:
+        timeout = aiohttp.ClientTimeout(total=6000)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            yield session
+
+
+# content types of file inputs that are routed by size, other files are binary
+TEXT_CONTENT_TYPES = ("text/plain", "application/json")
+
+
+def send_as_file(input: Input, default: bool = False) -> bool:
+    """
+    Whether an input is uploaded to the async file endpoint, see `oneai.ASYNC_FILE_THRESHOLD`.
+    Without a threshold, files are uploaded only if `default` is set.
+    """
+    is_file = isinstance(input.text, io.IOBase)
+    if is_file and not is_stream(input):  # wrapped for the async endpoint
+        return True
+    threshold = oneai.ASYNC_FILE_THRESHOLD
+    if threshold is None:
+        return is_file and default
+    if not is_file:
+        return (
+            isinstance(input.text, str)
+            and input.content_type == "text/plain"
+            and len(input.text) >= threshold
+        )
+    if input.content_type not in TEXT_CONTENT_TYPES:
+        return True
+    size = file_size(input.text)
+    return size is None or size >= threshold
+
 
 # open a client session and send a request
 async def process_single_input(
-    input: PipelineInput, steps: List[Skill], api_key: str, multilingual: bool = False
+    input: PipelineInput,
+    steps: List[Skill],
+    api_key: Union[str, KeyPool],
+    multilingual: bool = False,
+    client: Client = None,
+    retry: RetryPolicy = None,
+    timeout: aiohttp.ClientTimeout = None,
+    hedge: HedgePolicy = None,
 ) -> Awaitable[Output]:
-    timeout = aiohttp.ClientTimeout(total=6000)
-    async with aiohttp.ClientSession(timeout=timeout) as session:
+    client = client or runtime.loop_client()
+    async with client_session(client) as session:
         return await _run_internal(
-            session, Input.wrap(input), steps, api_key, multilingual
+            session,
+            Input.wrap(input),
+            steps,
+            api_key,
+            multilingual,
+            retry,
+            single_flight=client.single_flight if client else None,
+            timeout=timeout,
+            hedge=hedge,
         )
 
 
+@asynccontextmanager
+async def use_key(api_key: Union[str, KeyPool], chars: int = 0):
+    # a single key for requests that can't be sent again with another one
+    if isinstance(api_key, KeyPool):
+        async with api_key.key(chars) as key:
+            yield key
+    else:
+        yield api_key
+
+
 async def process_file_async(
     input: PipelineInput,
     steps: List[Skill],
-    api_key: str,
+    api_key: Union[str, KeyPool],
     interval: int,
     multilingual: bool = False,
+    client: Client = None,
+    timeout: aiohttp.ClientTimeout = None,
 ) -> Awaitable[Output]:
     input = Input.wrap(input, False)
-    timeout = aiohttp.ClientTimeout(total=6000)
-    async with aiohttp.ClientSession(timeout=timeout) as session:
-        name = input.text.name
+    async with client_session(client) as session, use_key(api_key) as api_key:
+        name = getattr(input.text, "name", "text")
         logger.debug(f"Uploading file '{name}'")
         task_id = (
-            await post_pipeline_async_file(session, input, steps, api_key, multilingual)
+            await post_pipeline_async_file(
+                session, input, steps, api_key, multilingual, timeout
+            )
         )["task_id"]
         logger.debug(f"Upload of file '{name}' complete\n")
 
@@ -70,92 +786,317 @@ async def process_file_async(
 
 # open a client session with multiple workers and send concurrent requests
 async def process_batch(
-    batch: Iterable[PipelineInput],
+    batch: BatchSource,
     steps: List[Skill],
     on_output: Callable[[PipelineInput, Output], None],
     on_error: Callable[[PipelineInput, Exception], None],
-    api_key: str,
+    api_key: Union[str, KeyPool],
     multilingual: bool = False,
+    client: Client = None,
+    concurrency: Union[int, ConcurrencyLimiter] = None,
+    retry: RetryPolicy = None,
+    stats: BatchStats = None,
+    ordered: bool = False,
+    window: int = 100,
+    prefetch: int = 0,
+    sink: ResultSink = None,
+    journal: Journal = None,
+    dead_letter: DeadLetterStore = None,
+    async_files: Union[bool, TaskPoller] = False,
+    timeout: aiohttp.ClientTimeout = None,
+    deadline: float = None,
+    scheduler: Scheduler = None,
+    abort_on: Tuple[Type[Exception], ...] = (APIKeyError,),
 ):
-    iterator = iter(batch)
-    successful = 0  # total successful responses
-    failed = 0  # number of exceptions occurred
-    time_total = timedelta()  # total time spent on all requests
+    stats = stats if stats is not None else BatchStats()
+    if not steps:  # outputs without skills aren't requested, no need to journal them
+        journal = None
+    client = client or runtime.loop_client()
+    single_flight = client.single_flight if client else SingleFlight()
+    budget = RetryBudget(retry) if retry else None
+    deliver = (
+        sink.put
+        if sink
+        else direct_delivery(on_output, on_error, stats, dead_letter)
+    )
+    reorder = ReorderWindow(window, stats, deliver) if ordered else None
+    if not isinstance(concurrency, ConcurrencyLimiter):
+        concurrency = ConcurrencyLimiter.fixed(
+            concurrency or oneai.MAX_CONCURRENT_REQUESTS
+        )
+    poller = async_files if isinstance(async_files, TaskPoller) else TaskPoller()
+    file_tasks: Set[asyncio.Task] = set()
+    file_errors: List[Exception] = []  # errors of polling tasks, i.e. aborts
+    cancelled: List[Tuple[int, Input]] = []  # inputs cancelled at the deadline
+    expired: asyncio.Future = None  # done when the deadline passes
+    aborted: Exception = None  # the error that stopped the batch
+    source = InputSource(
+        batch, prefetch, bool(async_files), check_scheduler(scheduler, ordered)
+    )
     # length = len(batch) if hasattr(batch, "__len__") else 0
 
-    def next_input():  # distribute batch to workers
-        try:
-            return Input.wrap(next(iterator))
-        except StopIteration:
-            return None  # we need to break loop for each worker, so we ignore StopIteration
-
     def log_progress(
         time_delta=timedelta(), start=False, end=False
     ):  # todo progress bar for iterables with __len__
-        nonlocal successful, failed, time_total
-
-        time_total += time_delta
+        stats.time_total += time_delta
         if start:
             logger.debug(
-                f"Starting batch processing with {oneai.MAX_CONCURRENT_REQUESTS} workers"
+                f"Starting batch processing with {concurrency.limit} workers"
+                + (
+                    f" (adaptive, up to {concurrency.max_limit})"
+                    if concurrency.max_limit > concurrency.limit
+                    else ""
+                )
             )
         elif end:
             logger.debug(
-                "Processed %d inputs - %s/input - %s total - %d successful - %d failed\n"
+                "Processed %d inputs - %s/input - %s total - %d successful - %d failed%s%s\n"
                 % (
-                    successful + failed,
+                    stats.processed,
                     time_format(
-                        time_total
-                        / (successful + failed)
-                        / oneai.MAX_CONCURRENT_REQUESTS
+                        stats.time_total / max(stats.processed, 1) / concurrency.limit
+                    ),
+                    time_format(stats.time_total / concurrency.limit),
+                    stats.successful,
+                    stats.failed,
+                    (f" - {stats.replayed} replayed" if journal is not None else "")
+                    + (f" - {stats.coalesced} coalesced" if stats.coalesced else "")
+                    + (
+                        f" - {len(stats.unprocessed)} not processed before the deadline"
+                        if expired is not None and expired.done()
+                        else ""
                     ),
-                    time_format(time_total / oneai.MAX_CONCURRENT_REQUESTS),
-                    successful,
-                    failed,
+                    f" - {time_format(stats.hol_blocking)} blocked on ordering"
+                    if reorder
+                    else "",
                 )
             )
         else:
             logger.debug(
                 "Input %d - %s/input - %s total - %d successful - %d failed"
                 % (
-                    successful + failed,
+                    stats.processed,
                     time_format(time_delta),
-                    time_format(time_total / oneai.MAX_CONCURRENT_REQUESTS),
-                    successful,
-                    failed,
+                    time_format(stats.time_total / concurrency.limit),
+                    stats.successful,
+                    stats.failed,
                 )
             )
 
     async def req_worker(session):  # run requests sequentially
-        nonlocal successful, failed
-
         time_start = datetime.now()
-        input = next_input()
-        while input:
+        while not file_errors:
+            if reorder:
+                await reorder.reserve()
             try:
-                output = await _run_internal(
-                    session, input, steps, api_key, multilingual
-                )
-                on_output(input, output)
-                successful += 1
-            except Exception as e:  # todo: break loop for some error types
-                logger.error(f"Input {successful + failed}: {repr(e)}")
-                on_error(input, e)
-                failed += 1
+                next_input = await before_deadline(source.next())
+            except _Expired:
+                next_input = None
+            if next_input is None:
+                if reorder:
+                    await reorder.unreserve()
+                break
+            seq, input = next_input
+            if send_as_file(input):
+                await upload_file(session, seq, input)
+                time_start = datetime.now()
+                continue
+            key = (
+                journal.key_for(input, steps, multilingual)
+                if journal is not None
+                else None
+            )
+            failed = False
+            if key is not None and key in journal:
+                stats.replayed += 1
+                result = build_output(steps, journal.get(key))
+            else:
+                slot = await concurrency.acquire()
+                try:
+                    result = await before_deadline(
+                        _run_internal(
+                            session,
+                            input,
+                            steps,
+                            api_key,
+                            multilingual,
+                            retry,
+                            budget,
+                            on_retry=concurrency.report,
+                            raw_output=key is not None,
+                            single_flight=single_flight,
+                            stats=stats,
+                            timeout=timeout,
+                        )
+                    )
+                    if key is not None:
+                        journal.record(key, result)
+                        result = build_output(steps, result)
+                except _Expired:
+                    concurrency.release(slot)
+                    await cancel(seq, input)
+                    break
+                except Exception as e:
+                    concurrency.release(slot, e)
+                    failed, result = True, e
+                except BaseException as e:  # cancelled, e.g. when the batch aborts
+                    concurrency.release(slot, e)
+                    raise
+                else:
+                    concurrency.release(slot)
 
+            await complete(seq, input, result, failed)
+            if failed:
+                abort(result)
             time_end = datetime.now()
             log_progress(time_end - time_start)
             time_start = time_end
-            input = next_input()
+
+    async def before_deadline(awaitable: Awaitable) -> Any:
+        # awaits a request, cancelling it if the batch deadline passes first
+        if expired is None:
+            return await awaitable
+        if expired.done():
+            awaitable.close()
+            raise _Expired()
+        task = asyncio.ensure_future(awaitable)
+        try:
+            await asyncio.wait([task, expired], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        if expired.done() and task.cancelled():
+            raise _Expired()
+        return task.result()
+
+    async def cancel(seq: int, input: Input):
+        cancelled.append((seq, input))
+        if reorder:
+            await reorder.skip(seq)
+
+    async def complete(seq: int, input: Input, result: Any, failed: bool):
+        if failed:
+            logger.error(f"Input {stats.processed}: {repr(result)}")
+            if dead_letter is not None:
+                dead_letter.record(input, result)
+            stats.failed += 1
+        else:
+            stats.successful += 1
+        callback = on_error if failed else on_output
+        if reorder:
+            await reorder.complete(seq, callback, input, result)
+        else:
+            await deliver(callback, input, result)
+
+    def abort(error: Exception):
+        # fatal errors stop the whole batch, instead of failing every remaining input
+        nonlocal aborted
+        if abort_on and isinstance(error, abort_on):
+            logger.error(f"Aborting batch after {stats.processed} inputs: {error!r}")
+            aborted = error
+            raise error
+
+    async def upload_file(session, seq: int, input: Input):
+        # uploads hold a slot, processing is tracked by the poller without one
+        slot = await concurrency.acquire()
+        try:
+            # not retried, the file can't be read again
+            async with use_key(api_key) as key:
+                task_id = (
+                    await before_deadline(
+                        post_pipeline_async_file(
+                            session, input, steps, key, multilingual, timeout
+                        )
+                    )
+                )["task_id"]
+        except _Expired:
+            concurrency.release(slot)
+            await cancel(seq, input)
+            return
+        except Exception as e:
+            concurrency.release(slot, e)
+            await complete(seq, input, e, True)
+            abort(e)
+            return
+        except BaseException as e:
+            concurrency.release(slot, e)
+            raise
+        concurrency.release(slot)
+        name = getattr(input.text, "name", "text")
+        logger.debug(f"Uploaded file '{name}' - task {task_id}")
+        task = asyncio.create_task(wait_file(session, seq, input, task_id, key))
+        file_tasks.add(task)
+        task.add_done_callback(file_done)
+
+    def file_done(task: asyncio.Task):
+        # done tasks aren't awaited by the batch, keep their error to raise it after the workers stop
+        file_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            file_errors.append(task.exception())
+
+    async def wait_file(session, seq: int, input: Input, task_id: str, key: str):
+        try:
+            raw = await before_deadline(poller.wait(session, task_id, key))
+            result = build_output(steps, raw)
+        except _Expired:
+            await cancel(seq, input)
+        except Exception as e:
+            await complete(seq, input, e, True)
+            abort(e)
+        else:
+            await complete(seq, input, result, False)
 
     workers = []
-    timeout = aiohttp.ClientTimeout(total=6000)
-    async with aiohttp.ClientSession(timeout=timeout) as session:
-        for _ in range(oneai.MAX_CONCURRENT_REQUESTS):
+    expiry = None
+    if deadline is not None:
+        expired = asyncio.get_running_loop().create_future()
+        expiry = asyncio.get_running_loop().call_later(
+            deadline, expired.set_result, None
+        )
+    async with client_session(client) as session:
+        if sink:
+            sink.start()
+        # start enough workers for the max limit, the limiter decides how many are active
+        for _ in range(concurrency.max_limit):
             worker = asyncio.create_task(req_worker(session))
             workers.append(worker)
         log_progress(start=True)
-        await asyncio.gather(*workers)
+        try:
+            await asyncio.gather(*workers)
+            while file_tasks:
+                await asyncio.gather(*file_tasks)
+            if file_errors:
+                raise file_errors[0]
+            if expired is not None and expired.done():
+                stats.unprocessed.extend(input for _, input in sorted(cancelled))
+                stats.unprocessed.extend(await source.remaining())
+            if sink:
+                await sink.close()
+        except Exception as e:
+            if e is aborted:
+                # stop the other workers first, then deliver what completed before raising
+                tasks = workers + list(file_tasks)
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await deliver_completed(reorder, sink)
+            raise
+        finally:
+            if expiry is not None:
+                expiry.cancel()
+            source.close()
+            # stop the remaining workers if one of them failed, before closing the session
+            tasks = workers + list(file_tasks)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if sink:
+                sink.cancel()
+            if journal is not None:
+                journal.sync()
+            if dead_letter is not None:
+                dead_letter.sync()
         log_progress(end=True)
 
 
@@ -174,13 +1115,84 @@ async def _run_internal(
     session: aiohttp.ClientSession,
     input: Input,
     skills: List[Skill],
-    api_key: str,
+    api_key: Union[str, KeyPool],
     multilingual: bool,
+    retry: RetryPolicy = None,
+    budget: RetryBudget = None,
+    on_retry: Callable[[Exception], None] = None,
+    raw_output: bool = False,
+    single_flight: SingleFlight = None,
+    stats: BatchStats = None,
+    timeout: aiohttp.ClientTimeout = None,
+    hedge: HedgePolicy = None,
 ) -> Awaitable[Output]:
     if not skills:  # no skills
         return Output(input.text)
+    if isinstance(api_key, KeyPool):
+        # the request and its retries use a key of the pool, another one if it's evicted
+        return await api_key.run(
+            lambda key: _run_internal(
+                session,
+                input,
+                skills,
+                key,
+                multilingual,
+                retry,
+                budget,
+                on_retry,
+                raw_output,
+                single_flight,
+                stats,
+                timeout,
+                hedge,
+            ),
+            text_length(input.text),
+        )
+
+    # the same key is sent with every attempt, so the API can detect retried requests
+    idempotency_key = uuid.uuid4().hex
+
+    async def send(raw_output: bool, hedged: bool = False):
+        request_input = input
+        if input.content_type == "text/uri-list":
+            request_input = await fetch_url(session, input.text)
+        return await post_pipeline(
+            session,
+            request_input,
+            skills,
+            api_key,
+            multilingual,
+            # a hedge is a separate request, which must not be deduplicated with the original
+            f"{idempotency_key}-hedge" if hedged else idempotency_key,
+            raw_output,
+            timeout,
+        )
+
+    async def attempt(raw_output: bool = raw_output):
+        # a streamed file can't be read by two requests at once
+        if hedge is None or is_stream(input):
+            return await send(raw_output)
+        return await hedge.run(lambda hedged: send(raw_output, hedged))
+
+    if is_stream(input) and not input.text.seekable():
+        retry = None  # a pipe can't be read again, a retry would send an empty file
 
-    if input.content_type == "text/uri-list":
-        input = await fetch_url(session, input.text)
+    # files aren't coalesced, hashing them would read every file one more time
+    key = (
+        request_fingerprint(input, skills, multilingual)
+        if single_flight is not None and not is_stream(input)
+        else None
+    )
+    if key is None:
+        return await with_retries(attempt, retry, budget, on_retry)
+    # only requests sent with the same API key share a response
+    key = hashlib.sha256((api_key or "").encode()).hexdigest()[:16] + key
 
-    return await post_pipeline(session, input, skills, api_key, multilingual)
+    # identical requests in flight share a single request, with its retries
+    raw, shared = await single_flight.do(
+        key,
+        lambda: with_retries(lambda: attempt(True), retry, budget, on_retry),
+    )
+    if shared and stats is not None:
+        stats.coalesced += 1
+    return raw if raw_output else build_output(skills, raw)
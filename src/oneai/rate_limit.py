@@ -0,0 +1,175 @@
+import asyncio
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import oneai
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+# bucket state: request tokens, char tokens, last refill time
+State = Tuple[float, float, float]
+STATE_FORMAT = "ddd"
+STATE_SIZE = struct.calcsize(STATE_FORMAT)
+
+
+class RateLimiter:
+    """
+    A token-bucket rate limit on requests made by the SDK, keyed by API key. Set `oneai.rate_limiter` to apply it to all API requests, including clustering.
+
+    Buckets are kept in memory by default. Set `shared=True` to keep them in lock-protected files instead, so that all processes on the machine using the same API key share a single rate, with no external service.
+
+    ## Attributes
+
+    `requests_per_second: float, optional`
+        Max sustained request rate per API key.
+    `chars_per_second: float, optional`
+        Max sustained rate of input characters sent per API key.
+    `burst: float`
+        Bucket capacity, in seconds worth of tokens. Allows short bursts above the sustained rate.
+    `shared: bool`
+        Whether to share the buckets across processes.
+    `path: str, optional`
+        Directory for the shared bucket files. Defaults to the system temp directory.
+
+    ## Example
+
+    >>> oneai.rate_limiter = oneai.RateLimiter(requests_per_second=20, chars_per_second=50_000, shared=True)
+    """
+
+    def __init__(
+        self,
+        requests_per_second: Optional[float] = None,
+        chars_per_second: Optional[float] = None,
+        burst: float = 1.0,
+        shared: bool = False,
+        path: str = None,
+    ):
+        self.requests_per_second = requests_per_second
+        self.chars_per_second = chars_per_second
+        self.burst = burst
+        self.shared = shared
+        self.path = path or tempfile.gettempdir()
+        self._lock = threading.Lock()
+        self._local: Dict[str, State] = {}
+        self._files: Dict[str, int] = {}
+
+    async def acquire(self, api_key: str, chars: int = 0):
+        """Waits until a request with `chars` input characters is allowed."""
+        delay = self._reserve(api_key, chars)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def acquire_sync(self, api_key: str, chars: int = 0):
+        """Blocks until a request with `chars` input characters is allowed."""
+        delay = self._reserve(api_key, chars)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _reserve(self, api_key: str, chars: int) -> float:
+        # take tokens for the request, letting the bucket go into debt,
+        # and return how long the caller has to wait for the debt to be repaid
+        with self._lock:
+            if not self.shared:
+                state = self._local.get(api_key)
+                state, delay = self._take(state, chars)
+                self._local[api_key] = state
+                return delay
+
+            fd = self._file(api_key)
+            _lock_file(fd)
+            try:
+                os.lseek(fd, 0, os.SEEK_SET)
+                data = os.read(fd, STATE_SIZE)
+                state = (
+                    struct.unpack(STATE_FORMAT, data)
+                    if len(data) == STATE_SIZE
+                    else None
+                )
+                state, delay = self._take(state, chars)
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.write(fd, struct.pack(STATE_FORMAT, *state))
+                return delay
+            finally:
+                _unlock_file(fd)
+
+    def _take(self, state: Optional[State], chars: int) -> Tuple[State, float]:
+        now = time.time()
+        rates = [self.requests_per_second, self.chars_per_second]
+        costs = [1, chars]
+        tokens: List[float] = (
+            [rate * self.burst if rate else 0 for rate in rates]
+            if state is None
+            else list(state[:2])
+        )
+        elapsed = max(now - state[2], 0) if state else 0
+        delay = 0.0
+        for i, (rate, cost) in enumerate(zip(rates, costs)):
+            if not rate:
+                continue
+            tokens[i] = min(tokens[i] + elapsed * rate, rate * self.burst) - cost
+            if tokens[i] < 0:
+                delay = max(delay, -tokens[i] / rate)
+        return (tokens[0], tokens[1], now), delay
+
+    def _file(self, api_key: str) -> int:
+        if api_key not in self._files:
+            name = hashlib.sha256(api_key.encode()).hexdigest()[:16]
+            self._files[api_key] = os.open(
+                os.path.join(self.path, f"oneai-ratelimit-{name}.bin"),
+                os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0),
+                0o600,
+            )
+        return self._files[api_key]
+
+    def __del__(self):
+        for fd in self._files.values():
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def __repr__(self) -> str:
+        return f"oneai.RateLimiter(requests_per_second={self.requests_per_second}, chars_per_second={self.chars_per_second}, shared={self.shared})"
+
+
+def _lock_file(fd: int):
+    if os.name == "nt":
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_LOCK, STATE_SIZE)
+    else:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+
+def _unlock_file(fd: int):
+    if os.name == "nt":
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, STATE_SIZE)
+    else:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def text_length(text) -> int:
+    # number of characters in an input text, 0 for files
+    if isinstance(text, str):
+        return len(text)
+    if isinstance(text, list):
+        return sum(len(getattr(u, "utterance", "") or "") for u in text)
+    return 0
+
+
+async def throttle(api_key: str, chars: int = 0):
+    if oneai.rate_limiter is not None:
+        await oneai.rate_limiter.acquire(api_key, chars)
+
+
+def throttle_sync(api_key: str, chars: int = 0):
+    if oneai.rate_limiter is not None:
+        oneai.rate_limiter.acquire_sync(api_key, chars)
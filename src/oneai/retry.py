@@ -0,0 +1,125 @@
+import asyncio
+import random
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional, TypeVar
+
+import aiohttp
+
+import oneai
+from oneai.exceptions import APIKeyError, InputError, OneAIError, ServerError
+
+T = TypeVar("T")
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Configures retries of failed requests, with exponential backoff and full jitter.
+
+    Retryable failures are server errors (5xx, throttling), connection errors and timeouts. `InputError` and `APIKeyError` are never retried.
+
+    ## Attributes
+
+    `max_attempts: int`
+        Max number of attempts per request, including the first one.
+    `base_delay: float`
+        Delay in seconds before the first retry. Doubled with every retry, with full jitter.
+    `max_delay: float`
+        Upper bound for the delay between attempts, in seconds.
+    `budget: float, optional`
+        Max ratio of retries to requests in a single batch, on top of `min_budget`. `None` for unlimited retries.
+    `min_budget: int`
+        Number of retries allowed in a batch regardless of `budget`.
+
+    ## Example
+
+    >>> pipeline = oneai.Pipeline(steps, retry=oneai.RetryPolicy(max_attempts=5, budget=0.1))
+    """
+
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    budget: Optional[float] = 0.2
+    min_budget: int = 10
+
+    def is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, (InputError, APIKeyError)):
+            return False
+        return isinstance(
+            error,
+            (
+                ServerError,
+                aiohttp.ClientConnectionError,
+                aiohttp.ClientPayloadError,
+                asyncio.TimeoutError,
+            ),
+        )
+
+    def delay(self, attempt: int, error: Exception = None) -> float:
+        """Seconds to wait before the given retry (starting at 1)."""
+        delay = random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        )
+        retry_after = getattr(error, "retry_after", None)
+        return max(delay, min(retry_after, self.max_delay)) if retry_after else delay
+
+
+NO_RETRY = RetryPolicy(max_attempts=1)
+
+
+class RetryBudget:
+    """
+    Tracks the retries spent in a single batch, so that a failing API doesn't multiply the load of the batch.
+    """
+
+    def __init__(self, policy: RetryPolicy):
+        self.policy = policy
+        self.requests = 0
+        self.retries = 0
+
+    def record_request(self):
+        self.requests += 1
+
+    def try_spend(self) -> bool:
+        if self.policy.budget is not None and self.retries >= (
+            self.policy.min_budget + self.policy.budget * self.requests
+        ):
+            return False
+        self.retries += 1
+        return True
+
+
+async def with_retries(
+    call: Callable[[], Awaitable[T]],
+    policy: RetryPolicy = None,
+    budget: RetryBudget = None,
+    on_retry: Callable[[Exception], None] = None,
+) -> T:
+    # run `call` until it succeeds, fails with a terminal error, or runs out of attempts/budget.
+    # failed attempts are recorded on the raised OneAIError as `attempts`
+    policy = policy or NO_RETRY
+    if budget is not None:
+        budget.record_request()
+
+    attempts: List[Exception] = []
+    while True:
+        try:
+            return await call()
+        except Exception as e:
+            attempts.append(e)
+            if (
+                len(attempts) >= policy.max_attempts
+                or not policy.is_retryable(e)
+                or (budget is not None and not budget.try_spend())
+            ):
+                if isinstance(e, OneAIError):
+                    e.attempts = attempts
+                raise
+
+            if on_retry:
+                on_retry(e)
+            delay = policy.delay(len(attempts), e)
+            oneai.logger.debug(
+                f"Attempt {len(attempts)} failed with {repr(e)}, retrying in {delay:.2f}s"
+            )
+            await asyncio.sleep(delay)
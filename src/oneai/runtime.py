@@ -0,0 +1,147 @@
+import asyncio
+import atexit
+import concurrent.futures
+import threading
+from typing import Awaitable, Optional, TypeVar
+
+from oneai.client import Client
+
+T = TypeVar("T")
+
+
+class Runtime:
+    """
+    A long-lived event loop running on a daemon thread, with a warm `Client` connection pool.
+    Synchronous calls (`Pipeline.run`, `Pipeline.run_batch`) submit their coroutines to the runtime instead of creating a new event loop and session for every call.
+    Safe to use from multiple threads at once.
+
+    Enable the default runtime with `oneai.runtime.enable()`.
+
+    ## Attributes
+
+    `client: Client`
+        The client whose connection pool is shared by all calls running in the runtime.
+
+    ## Methods
+
+    `start() -> Runtime`
+        Starts the background thread, if not already running.
+    `submit(coro) -> concurrent.futures.Future`
+        Schedules a coroutine to run in the runtime.
+    `run(coro) -> T`
+        Runs a coroutine in the runtime and blocks until it completes.
+    `stop()`
+        Closes the client and stops the background thread.
+    """
+
+    def __init__(self, client: Client = None):
+        self.client = client or Client()
+        self.loop: asyncio.AbstractEventLoop = None
+        self._thread: threading.Thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def in_loop(self) -> bool:
+        # whether the caller is running inside the runtime's loop
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def start(self) -> "Runtime":
+        with self._lock:
+            if self.running:
+                return self
+
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def main():
+                asyncio.set_event_loop(loop)
+                loop.run_until_complete(self.client.open())
+                ready.set()
+                try:
+                    loop.run_forever()
+                finally:
+                    loop.run_until_complete(self.client.close())
+                    loop.close()
+
+            self.loop = loop
+            self._thread = threading.Thread(
+                target=main, name="oneai-runtime", daemon=True
+            )
+            self._thread.start()
+            ready.wait()
+        return self
+
+    def submit(self, coro: Awaitable[T]) -> "concurrent.futures.Future[T]":
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable[T]) -> T:
+        if self.in_loop():
+            raise RuntimeError("Runtime.run() cannot be called from the runtime loop")
+        return self.submit(coro).result()
+
+    def stop(self):
+        with self._lock:
+            if not self.running:
+                return
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+            self._thread = None
+
+    def __repr__(self) -> str:
+        return f"oneai.runtime.Runtime(running={self.running}, client={self.client})"
+
+
+_default: Optional[Runtime] = None
+_default_lock = threading.Lock()
+
+
+def enable(client: Client = None) -> Runtime:
+    """
+    Starts the default runtime. Once enabled, all synchronous `Pipeline` calls are executed on its background loop, reusing its connection pool.
+
+    ## Parameters
+
+    `client: Client, optional`
+        A (not yet opened) client to configure the connection pool. If not provided, a `Client` with default settings is used.
+    """
+    global _default
+
+    with _default_lock:
+        if _default is None:
+            _default = Runtime(client)
+        return _default.start()
+
+
+def disable():
+    """
+    Stops the default runtime. Synchronous `Pipeline` calls go back to creating a new event loop for each call.
+    """
+    global _default
+
+    with _default_lock:
+        if _default is not None:
+            _default.stop()
+            _default = None
+
+
+atexit.register(disable)
+
+
+def current() -> Optional[Runtime]:
+    """
+    Returns the default runtime if enabled, otherwise `None`.
+    """
+    return _default
+
+
+def loop_client() -> Optional[Client]:
+    # the runtime client, if called from within the runtime loop
+    runtime = _default
+    return runtime.client if runtime is not None and runtime.in_loop() else None
@@ -0,0 +1,169 @@
+import heapq
+import io
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from oneai.api.pipeline import file_size
+from oneai.classes import Input
+from oneai.rate_limit import text_length
+
+
+class Scheduler:
+    """
+    Decides the order in which `Pipeline.run_batch` dispatches inputs to its workers.
+    The scheduler reads up to `lookahead` inputs ahead of the workers, and dispatches the buffered input with the smallest `key` first (ties in batch order).
+    An input passed over by `lookahead` later inputs is dispatched next regardless of its key, so that no input waits forever.
+
+    Subclass it and override `key` to implement a custom policy. The base class dispatches in batch order (FIFO).
+
+    ## Attributes
+
+    `lookahead: int`
+        Max number of inputs read ahead of the workers. Larger windows reorder more, at the cost of memory and of reading further into the batch.
+
+    ## Example
+
+    >>> pipeline.run_batch(inputs, scheduler=oneai.ShortestFirstScheduler(lookahead=500))
+    """
+
+    def __init__(self, lookahead: int = 100):
+        if lookahead < 1:
+            raise ValueError("lookahead must be at least 1")
+        self.lookahead = lookahead
+
+    def key(self, input: Input) -> Any:
+        """Sort key of an input, smaller keys are dispatched first. `None` to keep batch order."""
+        return None
+
+    def __repr__(self) -> str:
+        return f"oneai.{type(self).__name__}(lookahead={self.lookahead})"
+
+
+class FIFOScheduler(Scheduler):
+    """
+    Dispatches inputs in batch order, without reading ahead. The default.
+    """
+
+    def __init__(self):
+        super().__init__(1)
+
+
+class PriorityScheduler(Scheduler):
+    """
+    Dispatches inputs with a higher priority first. The priority is read from an attribute of the `Input`, or from its `metadata`.
+
+    ## Attributes
+
+    `attr: str`
+        Name of the attribute (or metadata key) holding the priority.
+    `default: float`
+        Priority of inputs without one.
+
+    ## Example
+
+    >>> urgent = oneai.Input(text, metadata={"priority": 10})
+    >>> pipeline.run_batch(inputs, scheduler=oneai.PriorityScheduler())
+    """
+
+    def __init__(
+        self, attr: str = "priority", default: float = 0, lookahead: int = 100
+    ):
+        super().__init__(lookahead)
+        self.attr = attr
+        self.default = default
+
+    def key(self, input: Input) -> Any:
+        return -_attribute(input, self.attr, self.default)
+
+
+class DeadlineScheduler(Scheduler):
+    """
+    Dispatches inputs with the earliest deadline first (EDF). The deadline, a `datetime` or a Unix timestamp, is read from an attribute of the `Input`, or from its `metadata`.
+    Inputs without a deadline are dispatched last.
+
+    ## Attributes
+
+    `attr: str`
+        Name of the attribute (or metadata key) holding the deadline.
+    """
+
+    def __init__(self, attr: str = "deadline", lookahead: int = 100):
+        super().__init__(lookahead)
+        self.attr = attr
+
+    def key(self, input: Input) -> Any:
+        deadline = _attribute(input, self.attr, None)
+        if isinstance(deadline, datetime):
+            return deadline.timestamp()
+        return deadline if deadline is not None else float("inf")
+
+
+class ShortestFirstScheduler(Scheduler):
+    """
+    Dispatches the shortest inputs first: by text length for texts and conversations, and by size in bytes for files.
+    Keeps a large document from delaying the many small inputs behind it. Files of unknown size are dispatched last.
+    """
+
+    def key(self, input: Input) -> Any:
+        if isinstance(input.text, io.IOBase):
+            size = file_size(input.text)
+            return size if size is not None else float("inf")
+        return text_length(input.text)
+
+
+def _attribute(input: Input, attr: str, default: Any) -> Any:
+    value = getattr(input, attr, None)
+    if value is None and input.metadata:
+        value = input.metadata.get(attr)
+    return value if value is not None else default
+
+
+class ScheduleBuffer:
+    """
+    The lookahead buffer of a batch, holding `(index, input)` pairs read from the source and not dispatched yet.
+    """
+
+    def __init__(self, scheduler: Scheduler):
+        self.scheduler = scheduler
+        self._heap: List[Tuple[Any, int]] = []  # (key, index)
+        self._arrivals: Deque[int] = deque()  # indices in batch order
+        # index -> (input, number of inputs dispatched before it was pushed)
+        self._inputs: Dict[int, Tuple[Input, int]] = {}
+        self._pops = 0
+
+    def __len__(self) -> int:
+        return len(self._inputs)
+
+    @property
+    def full(self) -> bool:
+        return len(self._inputs) >= self.scheduler.lookahead
+
+    def push(self, index: int, input: Input):
+        key = self.scheduler.key(input)
+        heapq.heappush(self._heap, (key if key is not None else index, index))
+        self._arrivals.append(index)
+        self._inputs[index] = (input, self._pops)
+
+    def pop(self) -> Optional[Tuple[int, Input]]:
+        if not self._inputs:
+            return None
+        while self._arrivals[0] not in self._inputs:
+            self._arrivals.popleft()
+        oldest = self._arrivals[0]
+        if self._pops - self._inputs[oldest][1] >= self.scheduler.lookahead:
+            index = oldest  # passed over too many times
+        else:
+            while self._heap[0][1] not in self._inputs:
+                heapq.heappop(self._heap)
+            index = heapq.heappop(self._heap)[1]
+        self._pops += 1
+        return index, self._inputs.pop(index)[0]
+
+    def drain(self) -> List[Tuple[int, Input]]:
+        # the buffered inputs in batch order, e.g. when the batch stopped
+        items = sorted((index, input) for index, (input, _) in self._inputs.items())
+        self._inputs.clear()
+        self._heap.clear()
+        self._arrivals.clear()
+        return items
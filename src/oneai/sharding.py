@@ -0,0 +1,339 @@
+import asyncio
+from base64 import b64encode
+import copy
+import io
+import logging
+import multiprocessing
+import pickle
+import queue
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Type, Union
+
+import aiohttp
+
+import oneai
+from oneai.classes import Input, Output, PipelineInput, Skill
+from oneai.concurrency import ConcurrencyLimiter
+from oneai.dead_letter import DeadLetterStore
+from oneai.exceptions import APIKeyError, ServerError
+from oneai.process_scheduler import (
+    BatchSource,
+    BatchStats,
+    InputSource,
+    Prefetcher,
+    ReorderWindow,
+    ResultSink,
+    check_scheduler,
+    deliver_completed,
+    direct_delivery,
+    time_format,
+)
+from oneai.rate_limit import RateLimiter
+from oneai.retry import RetryPolicy
+from oneai.scheduling import Scheduler
+
+logger = logging.getLogger("oneai")
+
+# result message sent by shards: (index, result, failed), or (None, shard, error) when a shard is done
+Message = Tuple[Any, Any, Any]
+
+
+def split_concurrency(
+    concurrency: Union[int, ConcurrencyLimiter, None], processes: int
+) -> List[Union[int, ConcurrencyLimiter]]:
+    # split the global concurrency between shards, so that the total stays the same
+    if isinstance(concurrency, ConcurrencyLimiter):
+        processes = min(processes, concurrency.max_limit)
+        return [
+            ConcurrencyLimiter(
+                min_limit=max(concurrency.min_limit // processes, 1),
+                max_limit=concurrency.max_limit // processes
+                + (i < concurrency.max_limit % processes),
+                backoff=concurrency.backoff,
+                tolerance=concurrency.tolerance,
+                smoothing=concurrency.smoothing,
+            )
+            for i in range(processes)
+        ]
+    total = concurrency or oneai.MAX_CONCURRENT_REQUESTS
+    processes = min(processes, total)
+    return [total // processes + (i < total % processes) for i in range(processes)]
+
+
+def _picklable_input(input: Input) -> Input:
+    # open files can't be sent to the shards, send their encoded content instead
+    if not isinstance(input.text, io.IOBase):
+        return input
+    input = copy.copy(input)
+    if input.text.seekable():
+        input.text.seek(0)
+    input.text = b64encode(input.text.read()).decode("ascii")
+    return input
+
+
+def _picklable(error: Exception) -> Exception:
+    # some exceptions (e.g. aiohttp connection errors) can't be sent between processes
+    try:
+        pickle.loads(pickle.dumps(error))
+        return error
+    except Exception:
+        return ServerError(message=repr(error))
+
+
+def _shard_rate_limit(rate_limiter: RateLimiter) -> Optional[dict]:
+    # settings of the rate limiter used by all shards. an in-memory limiter would apply its rate to each shard,
+    # so the shards share its buckets through files instead
+    if rate_limiter is None:
+        return None
+    return dict(
+        requests_per_second=rate_limiter.requests_per_second,
+        chars_per_second=rate_limiter.chars_per_second,
+        burst=rate_limiter.burst,
+        shared=True,
+        path=rate_limiter.path,
+    )
+
+
+def _shard_main(
+    shard: int,
+    in_queue: "multiprocessing.Queue",
+    out_queue: "multiprocessing.Queue",
+    steps: List[Skill],
+    api_key: str,
+    multilingual: bool,
+    concurrency: Union[int, ConcurrencyLimiter],
+    retry: RetryPolicy,
+    timeout: aiohttp.ClientTimeout,
+    abort_on: Tuple[Type[Exception], ...],
+    rate_limit: Optional[dict],
+):
+    # entry point of shard processes. runs a regular batch over the inputs received from the parent
+    from oneai.process_scheduler import process_batch
+
+    oneai.rate_limiter = RateLimiter(**rate_limit) if rate_limit else None
+
+    # progress and errors are logged by the parent, with indices in the whole batch
+    logger.setLevel(logging.CRITICAL)
+    indices: Dict[int, int] = {}  # id(input) -> index in the parent batch
+
+    def inputs() -> Iterator[Input]:
+        while True:
+            item = in_queue.get()
+            if item is None:
+                return
+            index, input = item
+            indices[id(input)] = index
+            yield input
+
+    def send(failed: bool):
+        def callback(input: Input, result: Any):
+            index = indices.pop(id(input))
+            out_queue.put((index, _picklable(result) if failed else result, failed))
+
+        return callback
+
+    error = None
+    try:
+        asyncio.run(
+            process_batch(
+                inputs(),
+                steps,
+                send(False),
+                send(True),
+                api_key,
+                multilingual,
+                concurrency=concurrency,
+                retry=retry,
+                prefetch=2,
+                timeout=timeout,
+                abort_on=abort_on,
+            )
+        )
+    except BaseException as e:
+        error = _picklable(e)
+    out_queue.put((None, shard, error))
+
+
+def _read_results(
+    out_queue: "multiprocessing.Queue", shards: List[multiprocessing.Process]
+) -> Iterator[Message]:
+    # blocking iterator over shard results, ends when all shards are done
+    remaining = len(shards)
+    while remaining:
+        try:
+            message = out_queue.get(timeout=1)
+        except queue.Empty:
+            dead = [p for p in shards if not p.is_alive() and p.exitcode != 0]
+            if dead:
+                raise RuntimeError(
+                    f"batch shard process exited unexpectedly with code {dead[0].exitcode}"
+                )
+            continue
+        if message[0] is None:
+            remaining -= 1
+            if message[2] is not None:
+                raise message[2]
+        else:
+            yield message
+
+
+async def process_batch_sharded(
+    batch: BatchSource,
+    steps: List[Skill],
+    on_output: Callable[[PipelineInput, Output], None],
+    on_error: Callable[[PipelineInput, Exception], None],
+    api_key: str,
+    multilingual: bool = False,
+    processes: int = 2,
+    concurrency: Union[int, ConcurrencyLimiter] = None,
+    retry: RetryPolicy = None,
+    stats: BatchStats = None,
+    ordered: bool = False,
+    window: int = 100,
+    prefetch: int = 0,
+    sink: ResultSink = None,
+    dead_letter: DeadLetterStore = None,
+    timeout: aiohttp.ClientTimeout = None,
+    scheduler: Scheduler = None,
+    abort_on: Tuple[Type[Exception], ...] = (APIKeyError,),
+):
+    """
+    Runs a batch over multiple worker processes, each with its own event loop and connection pool, so that decoding responses isn't limited by a single GIL.
+    Inputs are read in the parent and distributed to shards through a shared queue; results are sent back and delivered to the callbacks in the parent.
+    The global concurrency is split between the shards, and ordered mode applies across all shards.
+    `oneai.rate_limiter` applies to all shards together, through its shared-file buckets. Other module settings are per process:
+    each shard has its own `oneai.cache` and `oneai.circuit_breaker` state when forked, and none when spawned.
+    """
+    stats = stats if stats is not None else BatchStats()
+    limits = split_concurrency(concurrency, processes)
+    rate_limit = _shard_rate_limit(oneai.rate_limiter)
+    context = multiprocessing.get_context()
+    in_queue = context.Queue(
+        maxsize=sum(
+            limit.max_limit if isinstance(limit, ConcurrencyLimiter) else limit
+            for limit in limits
+        )
+        * 2
+    )
+    out_queue = context.Queue()
+    shards = [
+        context.Process(
+            target=_shard_main,
+            args=(
+                shard,
+                in_queue,
+                out_queue,
+                list(steps),
+                api_key,
+                multilingual,
+                limit,
+                retry,
+                timeout,
+                abort_on,
+                rate_limit,
+            ),
+            name=f"oneai-shard-{shard}",
+            daemon=True,
+        )
+        for shard, limit in enumerate(limits)
+    ]
+    for shard in shards:
+        shard.start()
+    logger.debug(f"Starting batch processing with {len(shards)} processes")
+
+    loop = asyncio.get_running_loop()
+    deliver = (
+        sink.put
+        if sink
+        else direct_delivery(on_output, on_error, stats, dead_letter)
+    )
+    reorder = ReorderWindow(window, stats, deliver) if ordered else None
+    source = InputSource(
+        batch, prefetch, scheduler=check_scheduler(scheduler, ordered)
+    )
+    pending: Dict[int, Input] = {}
+    stopped = threading.Event()
+    results = Prefetcher(_read_results(out_queue, shards), 100)
+    start = datetime.now()
+
+    def put(item):
+        # blocking put that gives up once the batch is stopped, e.g. if shards died
+        while not stopped.is_set():
+            try:
+                return in_queue.put(item, timeout=0.1)
+            except queue.Full:
+                pass
+
+    async def feed():
+        try:
+            while True:
+                if reorder:
+                    await reorder.reserve()
+                next_input = await source.next()
+                if next_input is None:
+                    if reorder:
+                        await reorder.unreserve()
+                    break
+                index, input = next_input
+                pending[index] = input
+                await loop.run_in_executor(
+                    None, lambda: put((index, _picklable_input(input)))
+                )
+        finally:
+            # end the shards, also when reading the batch failed, so that the results loop ends
+            for _ in shards:
+                await loop.run_in_executor(None, put, None)
+
+    if sink:
+        sink.start()
+    feeder = asyncio.ensure_future(feed())
+    try:
+        async for index, result, failed in results:
+            input = pending.pop(index)
+            if failed:
+                stats.failed += 1
+                logger.error(f"Input {index}: {repr(result)}")
+                if dead_letter is not None:
+                    dead_letter.record(input, result)
+            else:
+                stats.successful += 1
+            callback = on_error if failed else on_output
+            if reorder:
+                await reorder.complete(index, callback, input, result)
+            else:
+                await deliver(callback, input, result)
+        await feeder
+        if sink:
+            await sink.close()
+    except Exception as e:
+        if abort_on and isinstance(e, abort_on):
+            # a shard aborted, deliver the results it sent before raising
+            await deliver_completed(reorder, sink)
+        raise
+    finally:
+        stopped.set()
+        feeder.cancel()
+        results.close()
+        source.close()
+        if sink:
+            sink.cancel()
+        if dead_letter is not None:
+            dead_letter.sync()
+        for shard in shards:
+            if shard.is_alive():
+                shard.terminate()
+            shard.join()
+        # don't wait at exit for inputs that no shard will read
+        in_queue.cancel_join_thread()
+
+    stats.time_total = datetime.now() - start
+    logger.debug(
+        "Processed %d inputs - %s total - %d successful - %d failed\n"
+        % (
+            stats.processed,
+            time_format(stats.time_total),
+            stats.successful,
+            stats.failed,
+        )
+    )
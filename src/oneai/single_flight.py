@@ -0,0 +1,72 @@
+import asyncio
+import json
+from typing import Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight requests: concurrent callers with the same request fingerprint await a single shared request.
+    Each caller receives its own copy of the raw response, so the `Output` objects aren't shared.
+
+    Every `oneai.Client` (including the runtime's client) has one, shared by all calls made through it. Batches run without a client coalesce their own requests.
+
+    ## Properties
+
+    `saved: int`
+        Number of requests that were not sent because an identical request was already in flight.
+    """
+
+    def __init__(self):
+        self.saved = 0
+        self._flights: Dict[str, "asyncio.Future[str]"] = {}
+        self._followers: Dict[str, int] = {}
+
+    async def do(
+        self, key: str, call: Callable[[], Awaitable[dict]]
+    ) -> Tuple[dict, bool]:
+        """
+        Runs `call`, unless a call with the same key is in flight, in which case its result is awaited instead.
+        Returns the raw response, and whether it was shared.
+        """
+        while True:
+            flight = self._flights.get(key)
+            if flight is None:
+                return await self._lead(key, call), False
+
+            self._followers[key] += 1
+            try:
+                encoded = await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if flight.cancelled():  # the leader was cancelled, take over
+                    continue
+                raise
+            except Exception:
+                self.saved += 1
+                raise
+            self.saved += 1
+            return json.loads(encoded), True
+
+    async def _lead(self, key: str, call: Callable[[], Awaitable[dict]]) -> dict:
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        self._followers[key] = 0
+        try:
+            raw = await call()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            if not self._followers[key]:
+                flight.exception()  # retrieved, avoid "exception never retrieved" warnings
+            raise
+        else:
+            # followers get an encoded copy, since building the output modifies the raw response
+            flight.set_result(json.dumps(raw) if self._followers[key] else None)
+            return raw
+        finally:
+            del self._flights[key]
+            del self._followers[key]
+
+    def __repr__(self) -> str:
+        return f"oneai.SingleFlight(saved={self.saved}, in_flight={len(self._flights)})"
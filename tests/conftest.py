@@ -0,0 +1,41 @@
+import asyncio
+from typing import Callable, Dict, List, Union
+
+import oneai
+import pytest
+
+
+class FakeAPI:
+    """
+    Stands in for `_run_internal` in offline batch tests. Records the texts sent,
+    and responds with an `Output` of the input text after `latency` seconds, or
+    raises the error set for the text in `errors`.
+    """
+
+    def __init__(self):
+        self.sent: List = []
+        self.latency: Union[float, Callable[[str], float]] = 0.01
+        self.errors: Dict[str, Exception] = {}
+
+    async def run_internal(self, session, input, *args, **kwargs):
+        self.sent.append(input.text)
+        text = input.text if isinstance(input.text, str) else None
+        await asyncio.sleep(
+            self.latency(text) if callable(self.latency) else self.latency
+        )
+        if text in self.errors:
+            raise self.errors[text]
+        return oneai.Output(input.text)
+
+
+@pytest.fixture
+def fake_api(monkeypatch) -> FakeAPI:
+    api = FakeAPI()
+    monkeypatch.setattr(oneai.process_scheduler, "_run_internal", api.run_internal)
+    return api
+
+
+@pytest.fixture
+def pipeline(fake_api) -> oneai.Pipeline:
+    # a pipeline whose requests are answered by `fake_api`
+    return oneai.Pipeline([oneai.skills.Summarize()])
@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+import oneai
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_queue_sentinel(pipeline):
+    queue = asyncio.Queue()
+    outputs = []
+
+    async def produce():
+        for i in range(5):
+            await asyncio.sleep(0.005)
+            await queue.put(str(i))
+        await queue.put(None)
+        await queue.put("after the end")
+
+    producer = asyncio.ensure_future(produce())
+    await pipeline.run_batch_async(
+        queue, on_output=lambda i, o: outputs.append(i.text), concurrency=2
+    )
+    await producer
+    assert sorted(outputs) == ["0", "1", "2", "3", "4"]
+    assert queue.get_nowait() == "after the end"  # not read past the sentinel
+
+
+@pytest.mark.asyncio
+async def test_async_iterable(pipeline):
+    pulled = []
+    outputs = []
+    pulled_at_first_output = []
+
+    def on_output(input, output):
+        if not outputs:
+            pulled_at_first_output.append(len(pulled))
+        outputs.append(input.text)
+
+    async def inputs():
+        for i in range(20):
+            pulled.append(i)
+            yield str(i)
+
+    await pipeline.run_batch_async(inputs(), on_output=on_output, concurrency=4)
+    assert sorted(outputs, key=int) == [str(i) for i in range(20)]
+    assert pulled == list(range(20))
+    assert pulled_at_first_output[0] <= 5  # pulled as workers become available
+
+
+@pytest.mark.asyncio
+async def test_prefetch_does_not_block_loop(pipeline):
+    gaps = []
+    done = asyncio.Event()
+
+    def inputs():
+        for i in range(4):
+            time.sleep(0.1)  # a blocking read, e.g. a DB cursor
+            yield str(i)
+
+    async def heartbeat():
+        loop = asyncio.get_running_loop()
+        last = loop.time()
+        while not done.is_set():
+            await asyncio.sleep(0.01)
+            gaps.append(loop.time() - last)
+            last = loop.time()
+
+    beat = asyncio.ensure_future(heartbeat())
+    outputs = []
+    await pipeline.run_batch_async(
+        inputs(), on_output=lambda i, o: outputs.append(i.text), prefetch=2
+    )
+    done.set()
+    await beat
+    assert sorted(outputs) == ["0", "1", "2", "3"]
+    assert max(gaps) < 0.08
+
+
+@pytest.mark.asyncio
+async def test_prefetch_error(pipeline):
+    outputs = []
+
+    def inputs():
+        yield "0"
+        yield "1"
+        time.sleep(0.05)  # the inputs read before the error complete
+        raise ValueError("cursor closed")
+
+    with pytest.raises(ValueError, match="cursor closed"):
+        await pipeline.run_batch_async(
+            inputs(), on_output=lambda i, o: outputs.append(i.text), prefetch=2
+        )
+    assert sorted(outputs) == ["0", "1"]
+
+
+@pytest.mark.asyncio
+async def test_stream_backpressure(pipeline):
+    pulled = []
+
+    def inputs():
+        for i in range(100):
+            pulled.append(i)
+            yield str(i)
+
+    stream = pipeline.stream_batch(inputs(), max_pending=2, concurrency=2)
+    results = []
+    async for input, output in stream:
+        results.append(output.text)
+        if len(results) == 1:
+            await asyncio.sleep(0.1)  # a slow consumer
+            # workers stop pulling once max_pending results wait to be consumed
+            assert len(pulled) <= 1 + 2 + 2 + 1
+    assert sorted(results, key=int) == [str(i) for i in range(100)]
@@ -0,0 +1,197 @@
+import json
+import threading
+import time
+
+import oneai
+import pytest
+
+RAW_OUTPUT = {"input": [{"utterance": "text"}], "output": [{"labels": []}]}
+
+
+def test_memory_lru():
+    cache = oneai.ResponseCache(max_entries=2)
+    for key in "abc":
+        cache.put(key, RAW_OUTPUT)
+    assert cache.get("a") is None
+    assert cache.get("c") == RAW_OUTPUT
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 1, 1)
+
+
+def test_disk_tier(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = oneai.ResponseCache(max_entries=1, path=path)
+    cache.put("a", RAW_OUTPUT)
+    cache.put("b", RAW_OUTPUT)
+    assert cache.get("a") == RAW_OUTPUT  # evicted from memory, found on disk
+    cache.close()
+
+    assert oneai.ResponseCache(path=path).get("b") == RAW_OUTPUT
+
+
+def test_disk_max_bytes_and_ttl(tmp_path):
+    cache = oneai.ResponseCache(
+        max_entries=1, path=str(tmp_path / "cache.db"), max_bytes=150
+    )
+    for key in "abc":
+        cache.put(key, RAW_OUTPUT)
+    assert cache.get("a") is None
+    assert cache.get("c") == RAW_OUTPUT
+
+    cache = oneai.ResponseCache(path=str(tmp_path / "ttl.db"), ttl=0.01)
+    cache.put("a", RAW_OUTPUT)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.evictions == 2
+
+
+def test_disk_replace_and_access_order(tmp_path):
+    cache = oneai.ResponseCache(path=str(tmp_path / "replace.db"))
+    for _ in range(3):
+        cache.put("a", RAW_OUTPUT)  # replaced, counted once
+    assert cache._disk_bytes == len(json.dumps(RAW_OUTPUT, separators=(",", ":")))
+
+    cache = oneai.ResponseCache(
+        max_entries=1, path=str(tmp_path / "cache.db"), max_bytes=150
+    )
+    cache.put("a", RAW_OUTPUT)
+    cache.put("b", RAW_OUTPUT)
+    assert cache.get("a") == RAW_OUTPUT  # a disk hit, a is now more recent than b
+    cache.put("c", RAW_OUTPUT)
+    cache.close()
+    cache = oneai.ResponseCache(path=str(tmp_path / "cache.db"))
+    assert cache.get("a") == RAW_OUTPUT and cache.get("b") is None
+
+
+def test_key():
+    assert oneai.ResponseCache.key('{"text": "a"}') == oneai.ResponseCache.key(
+        '{"text": "a"}'
+    )
+
+
+def test_join_prefix_outputs():
+    from oneai.api.output import build_output, generated_input, join_outputs
+
+    label = {"type": "names", "skill": "names", "span_text": "x", "value": "v"}
+    transcription = [{"speaker": "a", "utterance": "hi"}]
+    prefix = {
+        "input": [{"utterance": "audio"}],
+        "output": [
+            {"contents": transcription, "labels": [], "text_generated_by_step_id": 1}
+        ],
+    }
+    suffix = {
+        "input": transcription,
+        "output": [
+            {"contents": transcription, "labels": [label]},
+            {
+                "contents": [{"utterance": "summary"}],
+                "labels": [],
+                "text_generated_by_step_id": 2,
+            },
+        ],
+    }
+    assert generated_input(prefix).type == "conversation"
+
+    steps = [oneai.skills.Transcribe(), oneai.skills.Names(), oneai.skills.Summarize()]
+    output = build_output(steps, join_outputs(prefix, suffix, 1))
+    assert output.transcription.names[0].value == "v"
+    assert output.transcription.summary.text == "summary"
+
+
+TRANSCRIPTION = [{"speaker": "a", "utterance": "hi"}]
+SUMMARY = [{"utterance": "summary"}]
+# responses of the fake API, by the steps of the request
+RESPONSES = {
+    ("transcribe",): {
+        "input": [{"utterance": "audio"}],
+        "output": [
+            {"contents": TRANSCRIPTION, "labels": [], "text_generated_by_step_id": 1}
+        ],
+    },
+    ("summarize",): {
+        "input": TRANSCRIPTION,
+        "output": [
+            {"contents": SUMMARY, "labels": [], "text_generated_by_step_id": 1}
+        ],
+    },
+    ("transcribe", "summarize"): {
+        "input": [{"utterance": "audio"}],
+        "output": [
+            {"contents": TRANSCRIPTION, "labels": [], "text_generated_by_step_id": 1},
+            {"contents": SUMMARY, "labels": [], "text_generated_by_step_id": 2},
+        ],
+    },
+}
+
+
+class FakeResponse:
+    def __init__(self, raw: dict):
+        self.status = 200
+        self.raw = raw
+
+    async def json(self):
+        return self.raw
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+
+class FakeSession:
+    def __init__(self):
+        self.sent = []
+
+    def post(self, url, data, **kwargs):
+        steps = tuple(step["skill"] for step in json.loads(data)["steps"])
+        self.sent.append(steps)
+        return FakeResponse(RESPONSES[steps])
+
+
+@pytest.mark.asyncio
+async def test_prefix_cache(monkeypatch):
+    from oneai.api.pipeline import post_pipeline
+
+    steps = [oneai.skills.Transcribe(), oneai.skills.Summarize()]
+    input = oneai.Input.wrap("audio")
+    session = FakeSession()
+    uncached = await post_pipeline(session, input, steps, "key", False)
+
+    monkeypatch.setattr(oneai, "cache", oneai.ResponseCache(prefixes=True))
+    session = FakeSession()
+    await post_pipeline(session, input, steps[:1], "key", False)
+    output = await post_pipeline(session, input, steps, "key", False)
+    # the cached transcription is reused, only the summary is requested
+    assert session.sent == [("transcribe",), ("summarize",)]
+    assert output.transcription.text == uncached.transcription.text
+    assert output.transcription.summary.text == uncached.transcription.summary.text
+    assert oneai.cache.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_pipeline_disk_cache(monkeypatch, tmp_path):
+    from oneai.api.pipeline import post_pipeline
+
+    steps = [oneai.skills.Transcribe(), oneai.skills.Summarize()]
+    input = oneai.Input.wrap("audio")
+    path = str(tmp_path / "cache.db")
+    monkeypatch.setattr(oneai, "cache", oneai.ResponseCache(path=path))
+    session = FakeSession()
+    await post_pipeline(session, input, steps, "key", False)
+    oneai.cache.close()
+
+    # a new process, served from the persistent tier off the event loop
+    monkeypatch.setattr(oneai, "cache", oneai.ResponseCache(path=path))
+    threads = []
+    get = oneai.cache.get
+    monkeypatch.setattr(
+        oneai.cache,
+        "get",
+        lambda key: threads.append(threading.current_thread()) or get(key),
+    )
+    output = await post_pipeline(session, input, steps, "key", False)
+    assert session.sent == [("transcribe", "summarize")]
+    assert output.transcription.summary.text == "summary"
+    assert threads and threading.main_thread() not in threads
+    assert oneai.cache.hits == 1
@@ -0,0 +1,141 @@
+import asyncio
+import time
+
+import oneai
+import pytest
+from oneai.exceptions import APIKeyError, CircuitOpenError, InputError, ServerError
+
+
+def send(breaker: oneai.CircuitBreaker, error: Exception = None):
+    with breaker.request():
+        if error is not None:
+            raise error
+
+
+def test_breaker_states():
+    states = []
+    breaker = oneai.CircuitBreaker(
+        window=4, min_requests=4, cooldown=0.05, on_state_change=states.append
+    )
+    send(breaker)
+    with pytest.raises(InputError):
+        send(breaker, InputError(400))
+    with pytest.raises(ServerError):
+        send(breaker, ServerError(500))
+    assert breaker.state == "closed"  # input errors are not failures
+    with pytest.raises(ServerError):
+        send(breaker, ServerError(503))
+    assert breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError) as e:
+        send(breaker)
+    assert e.value.retry_after <= 0.05 and breaker.rejected == 1
+
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    with breaker.request():  # a single probe at a time
+        with pytest.raises(CircuitOpenError):
+            send(breaker)
+    assert breaker.state == "closed"
+    assert states == ["open", "half_open", "closed"]
+
+
+def test_failed_probe_reopens():
+    breaker = oneai.CircuitBreaker(window=2, min_requests=2, cooldown=0.01)
+    for _ in range(2):
+        with pytest.raises(asyncio.TimeoutError):
+            send(breaker, asyncio.TimeoutError())
+    time.sleep(0.02)
+    with pytest.raises(ServerError):
+        send(breaker, ServerError(500))
+    assert breaker.state == "open" and breaker.opened == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_abort(pipeline, fake_api):
+    fake_api.errors["3"] = APIKeyError(401, "quota exceeded")
+    inputs = [str(i) for i in range(100)]
+    with pytest.raises(APIKeyError):
+        await pipeline.run_batch_async(inputs, concurrency=2)
+    assert len(fake_api.sent) < 10
+
+    errors = []
+    fake_api.sent.clear()
+    await pipeline.run_batch_async(
+        inputs, concurrency=2, abort_on=(), on_error=lambda i, e: errors.append(e)
+    )
+    assert len(fake_api.sent) == 100 and len(errors) == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("ordered", [False, True])
+async def test_batch_abort_delivers_results(pipeline, fake_api, ordered):
+    fake_api.latency = lambda text: 0.05 if text == "0" else 0.01
+    fake_api.errors["3"] = APIKeyError(401, "quota exceeded")
+    outputs, errors = [], []
+
+    async def on_output(input, output):
+        await asyncio.sleep(0.02)  # a slow sink, still writing when the batch aborts
+        outputs.append(input.text)
+
+    async def on_error(input, error):
+        await asyncio.sleep(0.02)
+        errors.append(error)
+
+    inputs = [str(i) for i in range(100)]
+    with pytest.raises(APIKeyError):
+        await pipeline.run_batch_async(
+            inputs,
+            on_output=on_output,
+            on_error=on_error,
+            concurrency=2,
+            ordered=ordered,
+        )
+    # the inputs completed before the abort, including "1" and "2" held back behind "0" in ordered mode
+    assert sorted(outputs) == ["1", "2"]
+    assert len(errors) == 1 and isinstance(errors[0], APIKeyError)
+
+
+@pytest.mark.asyncio
+async def test_batch_abort_file_task(monkeypatch, tmp_path):
+    uploaded = []
+
+    async def post_pipeline_async_file(session, input, *args, **kwargs):
+        uploaded.append(input.text.name)
+        await asyncio.sleep(0.01)  # still uploading when a task fails
+        return {"task_id": input.text.name}
+
+    async def get_task_status(session, task_id, api_key):
+        await asyncio.sleep(0.01)
+        if task_id.endswith("3.wav"):
+            raise APIKeyError(401, "quota exceeded")
+        return {
+            "status": "COMPLETED",
+            "result": {
+                "input": [{"utterance": "hi"}],
+                "output": [{"contents": [{"utterance": "hi"}], "labels": []}] * 2,
+            },
+        }
+
+    monkeypatch.setattr(
+        oneai.process_scheduler, "post_pipeline_async_file", post_pipeline_async_file
+    )
+    monkeypatch.setattr(oneai.process_scheduler, "get_task_status", get_task_status)
+    files = []
+    for i in range(20):
+        (tmp_path / f"{i}.wav").write_bytes(b"RIFF")
+        files.append(open(tmp_path / f"{i}.wav", "rb"))
+    errors = []
+    pipeline = oneai.Pipeline([oneai.skills.Transcribe()])
+    poller = oneai.TaskPoller(min_interval=0.01)
+    with pytest.raises(APIKeyError):
+        await pipeline.run_batch_async(
+            files,
+            on_error=lambda input, error: errors.append(error),
+            concurrency=2,
+            async_files=poller,
+        )
+    assert len(errors) == 1
+    assert len(uploaded) < 20  # no more files are uploaded after the abort
+    for file in files:
+        file.close()
@@ -0,0 +1,19 @@
+import oneai
+import pytest
+
+from tests.constants import DOCUMENT
+
+pipeline = oneai.Pipeline([oneai.skills.Keywords()])
+
+
+@pytest.mark.asyncio
+async def test_client_reuse():
+    async with oneai.Client(limit=4) as client:
+        await pipeline.run_async(DOCUMENT, client=client)
+        # distinct inputs, identical requests in flight are coalesced by the client
+        inputs = [f"{DOCUMENT} {i}" for i in range(4)]
+        outputs = await pipeline.run_batch_async(inputs, client=client)
+        assert all(isinstance(outputs[input], oneai.Output) for input in inputs)
+        assert client.requests == 5
+        assert client.connections_reused > 0
+    assert client.closed
@@ -0,0 +1,164 @@
+import asyncio
+import time
+
+import oneai
+import pytest
+from oneai.exceptions import APIKeyError, RateLimitError
+
+
+@pytest.mark.asyncio
+async def test_limiter_grows_and_backs_off():
+    changes = []
+    limiter = oneai.ConcurrencyLimiter(
+        min_limit=1, max_limit=8, tolerance=1000, on_limit_change=changes.append
+    )
+    for _ in range(100):
+        limiter.release(await limiter.acquire())
+    assert limiter.limit == 8
+    assert changes[0] == 2
+
+    limiter.release(await limiter.acquire(), RateLimitError(429, retry_after=0.1))
+    assert limiter.limit < 8
+    assert changes[-1] == limiter.limit
+
+
+@pytest.mark.asyncio
+async def test_limiter_blocks_at_limit():
+    limiter = oneai.ConcurrencyLimiter.fixed(2)
+    slots = [await limiter.acquire(), await limiter.acquire()]
+    waiter = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+    limiter.release(slots[0])
+    await asyncio.wait_for(waiter, 1)
+    assert limiter.in_flight == 2
+
+
+def test_split_concurrency():
+    from oneai.sharding import split_concurrency
+
+    assert split_concurrency(10, 3) == [4, 3, 3]
+    assert split_concurrency(2, 4) == [1, 1]
+    limiters = split_concurrency(oneai.ConcurrencyLimiter(min_limit=2, max_limit=9), 2)
+    assert [l.max_limit for l in limiters] == [5, 4]
+    assert all(l.min_limit == 1 for l in limiters)
+
+
+@pytest.mark.asyncio
+async def test_task_poller_backoff(monkeypatch):
+    polls = {"short": 0, "long": 0}
+
+    async def get_task_status(session, task_id, api_key):
+        polls[task_id] += 1
+        if polls[task_id] < (2 if task_id == "short" else 5):
+            return {"status": "RUNNING"}
+        return {"status": "COMPLETED", "result": task_id}
+
+    monkeypatch.setattr(oneai.process_scheduler, "get_task_status", get_task_status)
+    poller = oneai.TaskPoller(min_interval=0.01, max_interval=0.04, backoff=2)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    long = asyncio.ensure_future(poller.wait(None, "long", "key"))
+    assert await poller.wait(None, "short", "key") == "short"
+    assert not long.done()
+    assert await long == "long"
+    # 0.01 + 0.02 + 0.04 + 0.04 + 0.04, intervals are capped
+    assert loop.time() - start >= 0.15
+    assert poller.polls == 7 and poller.pending == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("ordered", [False, True])
+async def test_batch_deadline(pipeline, fake_api, ordered):
+    fake_api.latency = lambda text: 0.1 if text != "slow" else 10
+    inputs = ["a", "slow", "b", "c", "d", "e", "f", "g"]
+    outputs = []
+    response = await pipeline.run_batch_async(
+        inputs,
+        on_output=lambda input, output: outputs.append(input.text),
+        concurrency=2,
+        ordered=ordered,
+        deadline=0.15,
+    )
+    assert outputs == ["a"]
+    unprocessed = [input.text for input in response.unprocessed]
+    assert unprocessed == ["slow", "b", "c", "d", "e", "f", "g"]
+
+
+@pytest.mark.asyncio
+async def test_batch_stats(pipeline, fake_api):
+    fake_api.latency = lambda text: 0.1 if text == "slow" else 0.01
+    response = await pipeline.run_batch_async(
+        ["slow", "a", "b", "c"], concurrency=2, ordered=True, window=2
+    )
+    assert (response.stats.successful, response.stats.failed) == (4, 0)
+    # the window is full until the first input completes
+    assert response.stats.hol_blocking.total_seconds() > 0.05
+
+
+@pytest.mark.asyncio
+async def test_batch_deadline_prefetch(pipeline):
+    inputs = (str(i) for i in range(200))
+    outputs = []
+    response = await pipeline.run_batch_async(
+        inputs,
+        on_output=lambda input, output: outputs.append(input.text),
+        concurrency=2,
+        prefetch=10,
+        deadline=0.1,
+    )
+    # inputs read ahead are listed, the generator resumes after them
+    unprocessed = [input.text for input in response.unprocessed]
+    assert 0 < len(outputs) < 200
+    assert sorted(outputs + unprocessed + list(inputs), key=int) == [
+        str(i) for i in range(200)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_batch_deadline_blocked_source(pipeline, fake_api):
+    fake_api.latency = 0
+
+    def inputs():
+        yield "a"
+        time.sleep(3)  # a stalled read, still running at the deadline
+        yield "b"
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    response = await pipeline.run_batch_async(inputs(), prefetch=10, deadline=0.2)
+    assert loop.time() - start < 1
+    assert "a" in response and response.unprocessed == []
+
+
+@pytest.mark.asyncio
+async def test_output_callback_error(pipeline, fake_api):
+    fake_api.latency = 0
+
+    def on_output(input, output):
+        if int(input.text) % 2:
+            raise RuntimeError("sink unavailable")
+
+    errors = []
+    await pipeline.run_batch_async(
+        [str(i) for i in range(8)],
+        on_output=on_output,
+        on_error=lambda input, error: errors.append(error),
+    )
+    # handed to on_error, the batch goes on
+    assert len(errors) == 4 and all(isinstance(e, RuntimeError) for e in errors)
+
+
+@pytest.mark.asyncio
+async def test_limiter_released_on_abort(pipeline, fake_api):
+    fake_api.latency = lambda text: 0.01 if text != "fatal" else 0
+    fake_api.errors["fatal"] = APIKeyError(401)
+    limiter = oneai.ConcurrencyLimiter.fixed(3)
+    with pytest.raises(APIKeyError):
+        await pipeline.run_batch_async(["a", "b", "fatal", "c"], concurrency=limiter)
+    # the slots of the cancelled workers are released, the limiter can be reused
+    assert limiter.in_flight == 0
+    outputs = await asyncio.wait_for(
+        pipeline.run_batch_async(["a", "b"], concurrency=limiter), 1
+    )
+    assert len(outputs._data) == 2
@@ -0,0 +1,116 @@
+import io
+import os
+from base64 import b64encode
+from datetime import timedelta
+
+import oneai
+from oneai.classes import Utterance
+from oneai.dead_letter import read_dead_letters
+from oneai.exceptions import ServerError
+
+
+def test_dead_letter_store(tmp_path):
+    path = str(tmp_path / "failed.jsonl")
+    conversation = [
+        Utterance("a", "hello", timedelta(seconds=1)),
+        Utterance("b", "hi"),
+    ]
+    error = ServerError(50300, "unavailable", request_id="abc")
+    error.attempts = [error, error]
+
+    with oneai.DeadLetterStore(path) as store:
+        store.record(oneai.Input.wrap("text"), error)
+        store.record(oneai.Input.wrap(conversation), ValueError("invalid"))
+        assert store.count == 2
+
+    letters = list(read_dead_letters(path))
+    assert letters[0].input.text == "text"
+    assert letters[0].input.content_type == "text/plain"
+    assert (letters[0].error, letters[0].status_code) == ("ServerError", 50300)
+    assert (letters[0].request_id, letters[0].attempts) == ("abc", 2)
+    assert letters[1].input.text == conversation
+    assert letters[1].input.type == "conversation"
+    assert (letters[1].error, letters[1].message) == ("ValueError", "invalid")
+
+
+class Pipe(io.RawIOBase):
+    # a file without a path that can't be read again
+    def readable(self):
+        return True
+
+
+def test_dead_letter_files(tmp_path):
+    path = str(tmp_path / "failed.jsonl")
+    audio = tmp_path / "audio.wav"
+    audio.write_bytes(b"RIFF")
+    error = ServerError(50000, "failed")
+    with oneai.DeadLetterStore(path) as store:
+        store.record(oneai.Input.wrap(open(audio, "rb")), error)
+        # files without a path are recorded by their content, unless they can't be read again
+        store.record(oneai.Input(io.BytesIO(b"data"), encoding="base64"), error)
+        store.record(oneai.Input(Pipe(), encoding="base64"), error)
+        assert store.count == 2
+
+    letters = list(read_dead_letters(path))
+    assert letters[0].input.text.read() == b"RIFF"
+    letters[0].input.text.close()
+    assert letters[1].input.text == b64encode(b"data").decode("ascii")
+    assert letters[1].input.encoding == "base64"
+
+
+def test_redrive_files(monkeypatch, tmp_path):
+    sent = []
+
+    async def run_internal(session, input, *args, **kwargs):
+        sent.append(input.text)
+        return oneai.Output("transcript")
+
+    monkeypatch.setattr(oneai.process_scheduler, "_run_internal", run_internal)
+    path = str(tmp_path / "failed.jsonl")
+    with oneai.DeadLetterStore(path) as store:
+        for name in ["a.wav", "missing.wav", "b.wav"]:
+            (tmp_path / name).write_bytes(b"RIFF")
+            with open(tmp_path / name, "rb") as file:
+                store.record(oneai.Input.wrap(file), ServerError(50000, "failed"))
+    (tmp_path / "missing.wav").unlink()
+
+    pipeline = oneai.Pipeline([oneai.skills.Transcribe()])
+    pipeline.redrive(path)
+    # files are reopened to be sent, and closed once delivered
+    assert sorted(os.path.basename(file.name) for file in sent) == ["a.wav", "b.wav"]
+    assert all(file.closed for file in sent)
+    assert list(read_dead_letters(path)) == []  # the missing file is dropped
+
+
+def test_redrive(monkeypatch, tmp_path):
+    sent, failing = [], {"b", "c.wav"}
+
+    async def run_internal(session, input, *args, **kwargs):
+        name = os.path.basename(getattr(input.text, "name", input.text))
+        sent.append(name)
+        if name in failing:
+            raise ServerError(50300, "unavailable")
+        return oneai.Output(name)
+
+    monkeypatch.setattr(oneai.process_scheduler, "_run_internal", run_internal)
+    (tmp_path / "c.wav").write_bytes(b"RIFF")
+    path = str(tmp_path / "failed.jsonl")
+    pipeline = oneai.Pipeline([oneai.skills.Transcribe()])
+    with open(tmp_path / "c.wav", "rb") as audio:
+        pipeline.run_batch(["a", "b", audio, "d"], dead_letter=path)
+    assert [letter.input.text for letter in read_dead_letters(path)][0] == "b"
+
+    # a redrive sends the failed inputs only, and keeps those that fail again
+    sent.clear()
+    failing.remove("b")
+    outputs = pipeline.redrive(path)
+    assert sorted(sent) == ["b", "c.wav"]
+    assert outputs["b"].text == "b"
+    letters = list(read_dead_letters(path))
+    assert len(letters) == 1 and letters[0].input.text.name.endswith("c.wav")
+    letters[0].input.text.close()
+
+    sent.clear()
+    failing.clear()
+    pipeline.redrive(path)
+    assert sent == ["c.wav"] and list(read_dead_letters(path)) == []
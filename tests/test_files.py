@@ -29,3 +29,16 @@ async def test_file(path: str, sync: bool):
         assert hasattr(output.transcription.proofread, "replacements")
         assert hasattr(output.transcription.proofread, "numbers")
         assert hasattr(output.transcription.proofread, "sentiments")
+
+
+def test_file_batch():
+    poller = oneai.TaskPoller(min_interval=1)
+    files = [open(MP3_PATH, "rb"), open(WAV_PATH, "rb")]
+    try:
+        outputs = pipeline.run_batch(files, async_files=poller)
+    finally:
+        for f in files:
+            f.close()
+    for f in files:
+        assert hasattr(outputs[f], "transcription")
+    assert poller.pending == 0
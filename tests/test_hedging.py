@@ -0,0 +1,67 @@
+import asyncio
+
+import oneai
+import pytest
+
+
+def fake_call(latencies: dict, calls: list, cancelled: list):
+    async def call(hedged: bool):
+        calls.append(hedged)
+        try:
+            await asyncio.sleep(latencies[hedged])
+        except asyncio.CancelledError:
+            cancelled.append(hedged)
+            raise
+        if isinstance(latencies.get("error"), Exception) and not hedged:
+            raise latencies["error"]
+        return "hedge" if hedged else "primary"
+
+    return call
+
+
+@pytest.mark.asyncio
+async def test_hedge_wins():
+    policy = oneai.HedgePolicy(percentile=50, budget=0.5, min_delay=0, min_samples=4)
+    calls, cancelled = [], []
+    for _ in range(4):  # no hedging before min_samples
+        call = fake_call({False: 0.01, True: 0.01}, calls, cancelled)
+        assert await policy.run(call) == "primary"
+    assert calls == [False] * 4 and policy.hedged == 0
+
+    slow = fake_call({False: 1, True: 0.01}, calls, cancelled)
+    assert await policy.run(slow) == "hedge"
+    assert policy.hedged == 1 and policy.wins == 1
+    await asyncio.sleep(0)
+    assert cancelled == [False]  # the slow primary is cancelled
+
+
+@pytest.mark.asyncio
+async def test_hedge_budget():
+    policy = oneai.HedgePolicy(percentile=50, budget=0.1, min_delay=0, min_samples=1)
+    calls, cancelled = [], []
+    await policy.run(fake_call({False: 0.001, True: 0}, calls, cancelled))
+    slow = {False: 0.05, True: 0.001}
+    results = await asyncio.gather(
+        *(policy.run(fake_call(slow, calls, cancelled)) for _ in range(19))
+    )
+    # at most 10% of 20 requests are hedged
+    assert policy.requests == 20 and policy.hedged <= 2
+    assert results.count("hedge") == policy.wins
+
+
+@pytest.mark.asyncio
+async def test_hedge_primary_error():
+    policy = oneai.HedgePolicy(percentile=50, budget=1, min_delay=0, min_samples=1)
+    calls, cancelled = [], []
+    await policy.run(fake_call({False: 0.001, True: 0}, calls, cancelled))
+    # the primary fails after the hedge was sent, the hedge still answers
+    failing = {False: 0.02, True: 0.05, "error": ValueError()}
+    assert await policy.run(fake_call(failing, calls, cancelled)) == "hedge"
+
+    async def both_fail(hedged: bool):
+        await asyncio.sleep(0.02)
+        raise ValueError(hedged)
+
+    # both fail: the error of the primary is raised
+    with pytest.raises(ValueError, match="False"):
+        await policy.run(both_fail)
@@ -0,0 +1,71 @@
+import oneai
+from oneai.incremental import chunk_text, merge_labels, shift_labels
+
+
+def test_chunk_text():
+    sentences = [f"Sentence number {i} of the document." for i in range(200)]
+    text = " ".join(sentences)
+    chunks = chunk_text(text, 300)
+    assert "".join(chunk for _, chunk in chunks) == text
+    assert all(text[offset:].startswith(chunk) for offset, chunk in chunks)
+
+    # an edit only changes the chunks around it
+    edited = " ".join(sentences[:100] + ["An inserted sentence."] + sentences[100:])
+    changed = {c for _, c in chunk_text(edited, 300)} - {c for _, c in chunks}
+    assert 1 <= len(changed) <= 2 < len(chunks)
+
+
+def test_merge_labels():
+    chunk = lambda: {
+        "output": [
+            {
+                "labels": [
+                    {"skill": "names", "output_spans": [{"start": 1, "end": 3}]},
+                    {"skill": "topics", "value": "a"},
+                ]
+            }
+        ]
+    }
+    labels = merge_labels([shift_labels(chunk(), 0), shift_labels(chunk(), 10)])
+    assert [label["skill"] for label in labels] == ["names", "topics", "names"]
+    assert labels[2]["output_spans"][0] == {"start": 11, "end": 13}
+
+
+def test_run_incremental(monkeypatch):
+    sent = []
+
+    async def run_internal(session, input, *args, **kwargs):
+        # a name label on the first word of each chunk
+        sent.append(input.text)
+        end = input.text.index(" ")
+        label = {
+            "type": "name",
+            "skill": "names",
+            "span_text": input.text[:end],
+            "output_spans": [{"start": 0, "end": end}],
+        }
+        return {"input": [{"utterance": input.text}], "output": [{"labels": [label]}]}
+
+    monkeypatch.setattr(oneai.incremental, "_run_internal", run_internal)
+    pipeline = oneai.Pipeline([oneai.skills.Names()])
+    cache = oneai.ResponseCache()
+    sentences = [f"Sentence number {i} of the document." for i in range(200)]
+    text = " ".join(sentences)
+    output = pipeline.run_incremental(text, cache=cache, chunk_size=300)
+    chunks = len(sent)
+    assert chunks > 5 and output.text == text
+    # labels of every chunk, shifted to their offset in the whole text
+    spans = [label.output_spans[0] for label in output.names]
+    assert len(spans) == chunks
+    assert all(text[span.start : span.end] == "Sentence" for span in spans)
+
+    sent.clear()
+    edited = " ".join(sentences[:100] + ["An inserted sentence."] + sentences[100:])
+    output = pipeline.run_incremental(edited, cache=cache, chunk_size=300)
+    # only the changed chunks are sent again
+    assert 1 <= len(sent) <= 2
+    assert all(
+        edited[label.output_spans[0].start : label.output_spans[0].end]
+        == label.span_text
+        for label in output.names
+    )
@@ -0,0 +1,67 @@
+import oneai
+import pytest
+from oneai.api.output import build_output
+from oneai.api.pipeline import request_fingerprint
+from oneai.exceptions import ServerError
+
+RAW_OUTPUT = {"input": [{"utterance": "text"}], "output": [{"labels": []}]}
+
+
+def test_journal_resume(tmp_path):
+    path = str(tmp_path / "batch.journal")
+    with oneai.Journal(path) as journal:
+        journal.record("a", RAW_OUTPUT)
+        journal.record("b", RAW_OUTPUT)
+        assert journal.get("b") == RAW_OUTPUT
+
+    with open(path, "ab") as file:  # partial record left by a crash
+        file.write(b'{"key":"c","out')
+
+    with oneai.Journal(path) as journal:
+        assert "a" in journal and "b" in journal and "c" not in journal
+        journal.record("c", RAW_OUTPUT)
+        assert journal.get("c") == RAW_OUTPUT
+    with oneai.Journal(path) as journal:
+        assert len(journal) == 3
+
+
+def test_fingerprint():
+    steps = [oneai.skills.Keywords()]
+    input = oneai.Input.wrap("text")
+    assert request_fingerprint(input, steps, False) == request_fingerprint(
+        oneai.Input.wrap("text"), steps, False
+    )
+    assert request_fingerprint(input, steps, False) != request_fingerprint(
+        input, steps, True
+    )
+
+
+@pytest.mark.asyncio
+async def test_batch_journal(monkeypatch, tmp_path):
+    sent, failing = [], ["b"]
+
+    async def run_internal(session, input, steps, *args, raw_output=False, **kwargs):
+        sent.append(input.text)
+        if input.text in failing:
+            raise ServerError(50000, "failed")
+        raw = {"input": [{"utterance": input.text}], "output": [{"labels": []}]}
+        return raw if raw_output else build_output(steps, raw)
+
+    monkeypatch.setattr(oneai.process_scheduler, "_run_internal", run_internal)
+    pipeline = oneai.Pipeline([oneai.skills.Keywords()])
+    path = str(tmp_path / "batch.journal")
+    first = await pipeline.run_batch_async(["a", "b", "c"], journal=path)
+    assert sorted(sent) == ["a", "b", "c"] and isinstance(first["b"], ServerError)
+
+    sent.clear()
+    failing.clear()
+    outputs = []
+    response = await pipeline.run_batch_async(
+        ["a", "b", "c"],
+        journal=path,
+        on_output=lambda input, output: outputs.append(output.text),
+    )
+    # only the failed input is sent again, the others are replayed from the journal
+    assert sent == ["b"]
+    assert sorted(outputs) == ["a", "b", "c"]
+    assert response.stats.replayed == 2
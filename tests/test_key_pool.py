@@ -0,0 +1,70 @@
+import asyncio
+
+import oneai
+import pytest
+from oneai.exceptions import APIKeyError
+
+
+@pytest.mark.asyncio
+async def test_round_robin_and_limits():
+    pool = oneai.KeyPool(["a", "b", "c"], max_concurrent={"a": 1})
+    keys = [await pool.acquire() for _ in range(5)]
+    assert keys == ["a", "b", "c", "b", "c"]  # "a" is at its limit
+    assert pool.usage["a"].in_flight == 1 and pool.usage["b"].requests == 2
+
+    single = oneai.KeyPool(["a"], max_concurrent=1)
+    key = await single.acquire()
+    waiter = asyncio.ensure_future(single.acquire())
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+    single.release(key)
+    assert await asyncio.wait_for(waiter, 1) == "a"
+
+
+@pytest.mark.asyncio
+async def test_least_loaded():
+    pool = oneai.KeyPool(["a", "b"], strategy="least_loaded", max_concurrent=4)
+    first = await pool.acquire()
+    keys = [await pool.acquire() for _ in range(3)]
+    assert sorted([first] + keys) == ["a", "a", "b", "b"]
+    pool.release("a")
+    pool.release("a")
+    assert await pool.acquire() == "a"
+
+
+@pytest.mark.asyncio
+async def test_eviction():
+    pool = oneai.KeyPool(["bad", "good"])
+
+    async def call(key):
+        if key == "bad":
+            raise APIKeyError(401, "quota exceeded")
+        return key
+
+    assert [await pool.run(call) for _ in range(3)] == ["good"] * 3
+    assert pool.active == ["good"]
+    assert isinstance(pool.usage["bad"].evicted, APIKeyError)
+    assert pool.usage["bad"].failed == 1 and pool.usage["good"].successful == 3
+
+    with pytest.raises(APIKeyError):
+        await oneai.KeyPool(["bad"]).run(call)
+
+
+@pytest.mark.asyncio
+async def test_batch_key_pool(monkeypatch):
+    async def post_pipeline(session, input, steps, api_key, *args):
+        if api_key == "expired":
+            raise APIKeyError(401, "quota exceeded")
+        await asyncio.sleep(0.01)
+        contents = [{"utterance": input.text}]
+        return {"input": contents, "output": [{"contents": contents, "labels": []}]}
+
+    monkeypatch.setattr(oneai.process_scheduler, "post_pipeline", post_pipeline)
+    pool = oneai.KeyPool(["k1", "expired", "k2"], max_concurrent=2)
+    pipeline = oneai.Pipeline([oneai.skills.Keywords()], api_key=pool)
+    inputs = [str(i) for i in range(20)]
+    response = await pipeline.run_batch_async(inputs, concurrency=8)
+    assert sorted(output.text for output in response._data.values()) == sorted(inputs)
+    assert pool.active == ["k1", "k2"]
+    assert pool.usage["k1"].successful + pool.usage["k2"].successful == 20
+    assert pool.usage["k1"].in_flight == pool.usage["k2"].in_flight == 0
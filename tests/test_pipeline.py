@@ -122,3 +122,41 @@ def test_batch():
         assert isinstance(
             outputs[input], Exception if input == URL_INPUT else oneai.Output
         )
+
+
+@pytest.mark.asyncio
+async def test_stream_batch():
+    inputs = [DOCUMENT, CONVERSATION, DOCUMENT, URL_INPUT]
+    stream = oneai.Pipeline([oneai.skills.Keywords()]).stream_batch(
+        inputs, max_pending=1
+    )
+    results = [result async for _, result in stream]
+
+    assert len(results) == len(inputs)
+    assert sum(isinstance(result, Exception) for result in results) == 1
+    assert stream.stats.processed == len(inputs)
+
+
+def test_batch_ordered():
+    inputs = [f"{DOCUMENT} ({i})" for i in range(6)]
+    results = []
+    oneai.Pipeline([oneai.skills.Keywords()]).run_batch(
+        inputs,
+        on_output=lambda input, output: results.append(input.text),
+        ordered=True,
+        window=2,
+    )
+    assert results == inputs
+
+
+def test_batch_processes():
+    inputs = [f"{DOCUMENT} ({i})" for i in range(6)]
+    results = []
+    oneai.Pipeline([oneai.skills.Keywords()]).run_batch(
+        inputs,
+        on_output=lambda input, output: results.append(input.text),
+        ordered=True,
+        processes=2,
+        concurrency=4,
+    )
+    assert results == inputs
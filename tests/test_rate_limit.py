@@ -0,0 +1,28 @@
+import time
+
+import oneai
+import pytest
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_rate_limit(shared: bool, tmp_path):
+    limiter = oneai.RateLimiter(
+        requests_per_second=50, burst=0.1, shared=shared, path=str(tmp_path)
+    )
+    start = time.time()
+    for _ in range(20):
+        limiter.acquire_sync("test-key")
+    assert time.time() - start >= 0.3
+    # buckets are per API key
+    start = time.time()
+    limiter.acquire_sync("other-key")
+    assert time.time() - start < 0.05
+
+
+@pytest.mark.asyncio
+async def test_chars_limit():
+    limiter = oneai.RateLimiter(chars_per_second=1000, burst=0.1)
+    start = time.time()
+    for _ in range(3):
+        await limiter.acquire("test-key", 100)
+    assert time.time() - start >= 0.15
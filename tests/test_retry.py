@@ -0,0 +1,45 @@
+import oneai
+import pytest
+from oneai.exceptions import APIKeyError, ServerError
+from oneai.retry import RetryBudget, with_retries
+
+policy = oneai.RetryPolicy(max_attempts=3, base_delay=0.001)
+
+
+def failing(errors):
+    errors = list(errors)
+
+    async def call():
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    return call
+
+
+@pytest.mark.asyncio
+async def test_retry_transient():
+    assert await with_retries(failing([ServerError(500), ServerError(503)]), policy) == "ok"
+
+
+@pytest.mark.asyncio
+async def test_retry_exhausted():
+    with pytest.raises(ServerError) as e:
+        await with_retries(failing([ServerError(500)] * 3), policy)
+    assert len(e.value.attempts) == 3
+
+
+@pytest.mark.asyncio
+async def test_no_retry_terminal():
+    with pytest.raises(APIKeyError) as e:
+        await with_retries(failing([APIKeyError(401), ServerError(500)]), policy)
+    assert len(e.value.attempts) == 1
+
+
+@pytest.mark.asyncio
+async def test_retry_budget():
+    budget = RetryBudget(oneai.RetryPolicy(budget=0, min_budget=1, base_delay=0.001))
+    assert await with_retries(failing([ServerError(500)]), budget.policy, budget) == "ok"
+    with pytest.raises(ServerError):
+        await with_retries(failing([ServerError(500)]), budget.policy, budget)
+    assert budget.retries == 1
@@ -0,0 +1,29 @@
+import threading
+
+import oneai
+
+from tests.constants import DOCUMENT
+
+pipeline = oneai.Pipeline([oneai.skills.Keywords()])
+
+
+def test_runtime_threads():
+    runtime = oneai.runtime.enable()
+    outputs = []
+
+    def work(i: int):
+        # distinct inputs, identical requests in flight are coalesced by the runtime client
+        outputs.append(pipeline.run(f"{DOCUMENT} {i}"))
+
+    try:
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(outputs) == 4
+        assert all(isinstance(output, oneai.Output) for output in outputs)
+        assert runtime.client.requests == 4
+    finally:
+        oneai.runtime.disable()
+    assert not runtime.running
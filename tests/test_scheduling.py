@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+import oneai
+import pytest
+from oneai.classes import Input
+from oneai.scheduling import ScheduleBuffer
+
+
+def dispatch_order(scheduler: oneai.Scheduler, inputs) -> list:
+    buffer = ScheduleBuffer(scheduler)
+    order = []
+    for index, input in enumerate(inputs):
+        if buffer.full:
+            order.append(buffer.pop()[0])
+        buffer.push(index, Input.wrap(input))
+    while len(buffer):
+        order.append(buffer.pop()[0])
+    return order
+
+
+def test_shortest_first():
+    texts = ["a" * 1000, "a", "a" * 10, "a" * 100]
+    assert dispatch_order(oneai.ShortestFirstScheduler(), texts) == [1, 2, 3, 0]
+    assert dispatch_order(oneai.FIFOScheduler(), texts) == [0, 1, 2, 3]
+
+
+def test_priority_and_deadline():
+    now = datetime.now()
+    inputs = [
+        Input("a", metadata={"priority": 1, "deadline": now + timedelta(hours=1)}),
+        Input("b"),
+        Input("c", metadata={"priority": 5, "deadline": now}),
+    ]
+    assert dispatch_order(oneai.PriorityScheduler(), inputs) == [2, 0, 1]
+    assert dispatch_order(oneai.DeadlineScheduler(), inputs) == [2, 0, 1]
+
+
+def test_no_starvation():
+    # a long input is dispatched once passed over by `lookahead` shorter ones
+    texts = ["a" * 1000] + ["a"] * 20
+    order = dispatch_order(oneai.ShortestFirstScheduler(lookahead=4), texts)
+    assert order.index(0) == 4
+
+
+@pytest.mark.asyncio
+async def test_batch_scheduler(pipeline, fake_api):
+    texts = ["long " * 100, "short", "medium " * 10]
+    await pipeline.run_batch_async(
+        texts, concurrency=1, scheduler=oneai.ShortestFirstScheduler()
+    )
+    assert fake_api.sent == [texts[1], texts[2], texts[0]]
+
+    with pytest.raises(ValueError):
+        await pipeline.run_batch_async(
+            texts, ordered=True, scheduler=oneai.ShortestFirstScheduler()
+        )
@@ -0,0 +1,57 @@
+import multiprocessing
+
+import oneai
+import pytest
+from oneai.exceptions import APIKeyError
+from oneai.sharding import _shard_rate_limit
+
+# shards inherit the patched sender when forked
+pytestmark = pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork", reason="needs forked shards"
+)
+
+
+@pytest.fixture(autouse=True)
+def shard_api(fake_api):
+    fake_api.latency = lambda text: 0.05 if text == "0" else 0.001
+    fake_api.errors["fail"] = APIKeyError(401, "quota exceeded")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("ordered", [False, True])
+async def test_sharded_batch(pipeline, ordered):
+    inputs = [str(i) for i in range(20)] + ["a", "b"]
+    results = []
+    await pipeline.run_batch_async(
+        inputs,
+        on_output=lambda input, output: results.append((input.text, output.text)),
+        processes=2,
+        concurrency=4,
+        ordered=ordered,
+    )
+    # results of all shards are merged in the parent, in input order if ordered
+    assert sorted(results) == sorted((i, i) for i in inputs)
+    if ordered:
+        assert [text for text, _ in results] == inputs
+
+
+@pytest.mark.asyncio
+async def test_sharded_batch_abort(pipeline):
+    errors = []
+    with pytest.raises(APIKeyError):
+        await pipeline.run_batch_async(
+            ["a", "fail"] + [str(i) for i in range(1, 200)],
+            on_error=lambda input, error: errors.append(input.text),
+            processes=2,
+            concurrency=2,
+        )
+    assert errors == ["fail"]
+
+
+def test_shard_rate_limit(tmp_path):
+    limiter = oneai.RateLimiter(requests_per_second=10, path=str(tmp_path))
+    rate_limit = _shard_rate_limit(limiter)
+    # in-memory buckets are shared by the shards through files
+    assert rate_limit["shared"] and rate_limit["path"] == str(tmp_path)
+    assert oneai.RateLimiter(**rate_limit).requests_per_second == 10
+    assert _shard_rate_limit(None) is None
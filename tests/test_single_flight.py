@@ -0,0 +1,73 @@
+import asyncio
+
+import oneai
+import pytest
+from oneai.process_scheduler import _run_internal
+from oneai.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_coalesces_identical_calls():
+    flight = SingleFlight()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"output": []}
+
+    results = await asyncio.gather(*[flight.do("key", call) for _ in range(5)])
+    assert len(calls) == 1
+    assert flight.saved == 4
+    assert [shared for _, shared in results].count(False) == 1
+    assert all(raw == {"output": []} for raw, _ in results)
+    assert results[0][0] is not results[1][0]
+
+
+@pytest.mark.asyncio
+async def test_shares_errors_and_survives_leader_cancellation():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError()
+
+    results = await asyncio.gather(
+        *[flight.do("key", fail) for _ in range(3)], return_exceptions=True
+    )
+    assert all(isinstance(result, ValueError) for result in results)
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return {}
+
+    leader = asyncio.ensure_future(flight.do("key", slow))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flight.do("key", slow))
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await follower == ({}, False)
+
+
+@pytest.mark.asyncio
+async def test_coalesces_per_api_key(monkeypatch):
+    keys = []
+
+    async def post_pipeline(session, input, steps, api_key, *args):
+        keys.append(api_key)
+        await asyncio.sleep(0.01)
+        contents = [{"utterance": input.text}]
+        return {"input": contents, "output": [{"contents": contents, "labels": []}]}
+
+    monkeypatch.setattr(oneai.process_scheduler, "post_pipeline", post_pipeline)
+    flight = SingleFlight()
+    steps = [oneai.skills.Keywords()]
+    await asyncio.gather(
+        *[
+            _run_internal(
+                None, oneai.Input("text"), steps, key, False, single_flight=flight
+            )
+            for key in ["good", "bad", "good"]
+        ]
+    )
+    assert sorted(keys) == ["bad", "good"] and flight.saved == 1
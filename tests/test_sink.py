@@ -0,0 +1,58 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+import oneai
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_async_callbacks_serialized(pipeline):
+    active, max_active, outputs = [0], [0], []
+
+    async def on_output(input, output):
+        active[0] += 1
+        max_active[0] = max(max_active[0], active[0])
+        await asyncio.sleep(0.002)
+        outputs.append(input.text)
+        active[0] -= 1
+
+    inputs = [str(i) for i in range(50)]
+    await pipeline.run_batch_async(inputs, on_output=on_output, concurrency=8)
+    assert sorted(outputs, key=int) == inputs
+    assert max_active[0] == 1
+
+
+@pytest.mark.asyncio
+async def test_executor_callbacks_serialized(pipeline):
+    lock = threading.Lock()
+    threads, outputs = set(), []
+
+    def on_output(input, output):
+        assert lock.acquire(blocking=False), "callbacks called concurrently"
+        threads.add(threading.get_ident())
+        time.sleep(0.002)  # a blocking write
+        outputs.append(input.text)
+        lock.release()
+
+    inputs = [str(i) for i in range(50)]
+    with concurrent.futures.ThreadPoolExecutor(4) as executor:
+        await pipeline.run_batch_async(
+            inputs, on_output=on_output, concurrency=8, sink_executor=executor
+        )
+    assert sorted(outputs, key=int) == inputs
+    assert threading.get_ident() not in threads  # not called on the event loop
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("failing", ["7", "49"])  # while running, and on the last flush
+async def test_callback_error(pipeline, failing):
+    async def on_output(input, output):
+        if input.text == failing:
+            raise RuntimeError("disk full")
+
+    with pytest.raises(RuntimeError, match="disk full"):
+        await pipeline.run_batch_async(
+            [str(i) for i in range(50)], on_output=on_output, concurrency=4
+        )
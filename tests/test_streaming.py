@@ -0,0 +1,151 @@
+import io
+import json
+from base64 import b64encode
+
+import oneai
+import pytest
+from oneai.api.pipeline import (
+    build_request,
+    iter_request,
+    request_digest,
+    request_fingerprint,
+    request_length,
+)
+from oneai.classes import Input
+from oneai.exceptions import ServerError
+from oneai.process_scheduler import _run_internal
+
+steps = [oneai.skills.Transcribe(), oneai.skills.Summarize()]
+
+
+class ShortReads(io.RawIOBase):
+    # returns at most 1000 bytes per read, like pipes and sockets
+    def __init__(self, data: bytes):
+        self.data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk = self.data.read(min(len(buffer), 1000))
+        buffer[: len(chunk)] = chunk
+        return len(chunk)
+
+
+def file_input(file) -> Input:
+    return Input(file, type="conversation", content_type="audio/wav", encoding="base64")
+
+
+def test_streamed_request():
+    data = bytes(range(256)) * 40 + b"x"
+    for file in (io.BytesIO(data), ShortReads(data)):
+        input = file_input(file)
+        request = build_request(input, steps, False, True)
+        body = b"".join(iter_request(request, file))
+        assert json.loads(body)["text"] == b64encode(data).decode("ascii")
+        if file.seekable():
+            assert request_length(request, file) == len(body)
+            # read from the start again, e.g. when retried
+            assert b"".join(iter_request(request, file)) == body
+        else:
+            assert request_length(request, file) is None
+
+
+def test_streamed_fingerprint():
+    data = b"audio" * 1000
+    eager = Input(
+        b64encode(data).decode("ascii"),
+        type="conversation",
+        content_type="audio/wav",
+        encoding="base64",
+    )
+    streamed = file_input(io.BytesIO(data))
+    assert request_fingerprint(streamed, steps, False) == request_fingerprint(
+        eager, steps, False
+    )
+    request = build_request(eager, steps, False, True)
+    assert request_digest(request) == oneai.ResponseCache.key(request)
+
+    # pipes can't be read again to be sent, so they aren't hashed
+    pipe = ShortReads(data)
+    assert request_fingerprint(file_input(pipe), steps, False) is None
+    assert pipe.read() == data
+
+
+def test_route_files(monkeypatch):
+    from oneai.process_scheduler import send_as_file
+
+    def text_file(data: bytes) -> Input:
+        return Input(io.BytesIO(data), content_type="text/plain", encoding="base64")
+
+    # without a threshold, files are uploaded only by default (run_async)
+    assert not send_as_file(file_input(io.BytesIO(b"x")))
+    assert send_as_file(file_input(io.BytesIO(b"x")), default=True)
+    assert not send_as_file(Input.wrap("a" * 5000), default=True)
+
+    monkeypatch.setattr(oneai, "ASYNC_FILE_THRESHOLD", 1000)
+    # binary files are always uploaded, text files and texts by size
+    assert send_as_file(file_input(io.BytesIO(b"x")))
+    assert not send_as_file(text_file(b"x" * 999))
+    assert send_as_file(text_file(b"x" * 1000))
+    pipe = Input(ShortReads(b"x"), content_type="text/plain", encoding="base64")
+    assert send_as_file(pipe)  # unknown size
+    assert not send_as_file(Input.wrap("a" * 999))
+    assert send_as_file(Input.wrap("a" * 1000))
+    # wrapped for the async endpoint
+    assert send_as_file(Input(io.BytesIO(b"x"), content_type="audio/wav"))
+
+
+@pytest.mark.asyncio
+async def test_streamed_retries(monkeypatch):
+    sent = []
+
+    async def post_pipeline(session, input, *args):
+        if input.text.seekable():  # like iter_request
+            input.text.seek(0)
+        sent.append(input.text.read())
+        raise ServerError(50300, "unavailable")
+
+    monkeypatch.setattr(oneai.process_scheduler, "post_pipeline", post_pipeline)
+    retry = oneai.RetryPolicy(max_attempts=3, base_delay=0.001)
+    data = b"audio" * 1000
+    for file, attempts in ((io.BytesIO(data), 3), (ShortReads(data), 1)):
+        sent.clear()
+        with pytest.raises(ServerError):
+            await _run_internal(None, file_input(file), steps, "key", False, retry)
+        # seekable files are sent again from the start, pipes are not retried
+        assert sent == [data] * attempts
+
+
+@pytest.mark.asyncio
+async def test_route_batch(monkeypatch):
+    inline, uploaded = [], []
+
+    async def run_internal(session, input, *args, **kwargs):
+        inline.append(input.text)
+        return oneai.Output(input.text)
+
+    async def post_pipeline_async_file(session, input, *args, **kwargs):
+        uploaded.append(input.text)
+        return {"task_id": str(len(uploaded))}
+
+    async def get_task_status(session, task_id, api_key):
+        output = {"contents": [{"utterance": "summary"}], "labels": []}
+        return {"status": "COMPLETED", "result": {"input": [], "output": [output] * 2}}
+
+    monkeypatch.setattr(oneai.process_scheduler, "_run_internal", run_internal)
+    monkeypatch.setattr(
+        oneai.process_scheduler, "post_pipeline_async_file", post_pipeline_async_file
+    )
+    monkeypatch.setattr(oneai.process_scheduler, "get_task_status", get_task_status)
+    monkeypatch.setattr(oneai, "ASYNC_FILE_THRESHOLD", 1000)
+    audio = file_input(io.BytesIO(b"RIFF"))
+    outputs = []
+    await oneai.Pipeline([oneai.skills.Summarize()]).run_batch_async(
+        ["short", "long " * 200, audio],
+        on_output=lambda input, output: outputs.append(output),
+        async_files=oneai.TaskPoller(min_interval=0.01),
+    )
+    assert inline == ["short"]
+    assert uploaded == ["long " * 200, audio.text]
+    assert len(outputs) == 3